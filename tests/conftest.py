@@ -0,0 +1,158 @@
+"""Shared test fixtures"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from triton.cache import mech_counters, metadata_cache
+from triton.chain import invalidate_slots, invalidate_staking_program, slot_capacity
+from triton.history import balance_history, burn_rates
+from triton.indexer import event_indexer
+
+
+@pytest.fixture(autouse=True)
+def isolated_metadata_cache(tmp_path):
+    """Keep the IPFS metadata cache in a temporary directory"""
+    metadata_cache.clear()
+    with patch.object(metadata_cache, 'directory', tmp_path / "ipfs"):
+        yield metadata_cache
+    metadata_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_staking_program_cache():
+    """Start every test without cached staking programs"""
+    invalidate_staking_program()
+    yield
+    invalidate_staking_program()
+
+
+@pytest.fixture(autouse=True)
+def isolated_mech_counters(tmp_path):
+    """Keep the mech request counter record in a temporary directory"""
+    mech_counters.reset()
+    with patch.object(mech_counters, 'path', tmp_path / "mech_counters.json"):
+        yield mech_counters
+    mech_counters.reset()
+
+
+@pytest.fixture(autouse=True)
+def empty_slot_cache():
+    """Start every test without cached slot counts and capacities"""
+    invalidate_slots()
+    slot_capacity.clear()
+    yield
+    invalidate_slots()
+    slot_capacity.clear()
+
+
+@pytest.fixture(autouse=True)
+def isolated_event_indexer(tmp_path):
+    """Keep the event index in a temporary directory"""
+    with (
+        patch.object(event_indexer, 'path', tmp_path / "events.db"),
+        patch.object(event_indexer, '_schema_ready', False),
+    ):
+        yield event_indexer
+
+
+@pytest.fixture(autouse=True)
+def isolated_balance_history(tmp_path):
+    """Keep the balance history in a temporary directory"""
+    with (
+        patch.object(balance_history, 'path', tmp_path / "balances.db"),
+        patch.object(balance_history, '_schema_ready', False),
+        patch.object(balance_history, '_compacted_at', None),
+    ):
+        yield balance_history
+
+
+@pytest.fixture(autouse=True)
+def isolated_burn_rates(tmp_path):
+    """Keep the burn rate estimates in a temporary directory"""
+    burn_rates.record.reset()
+    with patch.object(burn_rates.record, 'path', tmp_path / "burn_rates.json"):
+        yield burn_rates
+    burn_rates.record.reset()
+
+
+class MockRpcServer:
+    """Local JSON-RPC server, whose latency and HTTP status can be changed while it runs"""
+
+    def __init__(self, delay=0.0, status=200):
+        self.delay = delay
+        self.status = status
+        # Number of the next requests rejected with HTTP 429
+        self.throttle = 0
+        self.results = {
+            "eth_chainId": "0x64",
+            "eth_blockNumber": "0x10",
+            "eth_sendRawTransaction": "0x" + "ab" * 32,
+        }
+        # Methods of the requests received, batches included
+        self.methods = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answer every request with the result of its method"""
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Handle a JSON-RPC request or batch"""
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                requests = body if isinstance(body, list) else [body]
+                server.methods.extend(request["method"] for request in requests)
+                if server.delay:
+                    time.sleep(server.delay)
+                status = server.status
+                if server.throttle:
+                    server.throttle -= 1
+                    status = 429
+                if status != 200:
+                    self.send_response(status)
+                    self.end_headers()
+                    return
+
+                responses = [
+                    {"jsonrpc": "2.0", "id": request["id"], "result": server.results.get(request["method"])}
+                    for request in requests
+                ]
+                payload = json.dumps(responses if isinstance(body, list) else responses[0]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                """Keep the test output quiet"""
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def mock_rpc_server():
+    """Start local JSON-RPC servers, stopped at the end of the test"""
+    servers = []
+
+    def _start(**kwargs):
+        server = MockRpcServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.stop()
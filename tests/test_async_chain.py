@@ -0,0 +1,240 @@
+"""Tests for triton.async_chain module"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+
+from triton import async_chain
+from triton.cache import LruCache
+from triton.chain import clear_contract_cache, load_contract
+from triton.async_chain import (
+    close_session,
+    get_balances,
+    get_mech_request_count,
+    get_mech_request_count_method,
+    get_native_balance,
+    get_session,
+    get_slots,
+    get_staking_statuses,
+)
+
+
+STAKING_PARAMS = {
+    "mech_contract_address": "0x77af31De935740567Cf4fF1986D04B2c964A786a",
+    "staking_token_address": "0x389b46c259631acd6a69bde8b6cee218230bae8c",
+    "service_id": 1259,
+    "safe_address": "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f",
+}
+
+
+class TestGetSession:
+    """Tests for the shared HTTP session"""
+
+    @patch.object(async_chain.provider, 'cache_async_session', new_callable=AsyncMock)
+    def test_get_session_reused_within_loop(self, mock_cache_async_session):
+        """Test that a single pooled session is shared and handed to the provider"""
+        async def run():
+            first = await get_session()
+            second = await get_session()
+            await close_session()
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first is second
+        assert first.closed
+        mock_cache_async_session.assert_awaited_once_with(first)
+
+    @patch.object(async_chain.provider, 'cache_async_session', new_callable=AsyncMock)
+    def test_get_session_per_loop(self, mock_cache_async_session):
+        """Test that every event loop gets its own session"""
+        async def run():
+            session = await get_session()
+            await close_session()
+            return session
+
+        assert asyncio.run(run()) is not asyncio.run(run())
+        assert mock_cache_async_session.await_count == 2
+
+
+class TestLoadContract:
+    """Tests for the async load_contract function"""
+
+    def teardown_method(self):
+        """Do not leak contracts into other tests"""
+        clear_contract_cache()
+
+    @patch('triton.chain._contracts', LruCache(1))
+    def test_load_contract_shares_the_bounded_cache(self):
+        """Test that async contracts count towards the same bounded cache as sync ones"""
+        address = "0x77af31De935740567Cf4fF1986D04B2c964A786a"
+        contract = async_chain.load_contract(address, "mech", False)
+
+        assert async_chain.load_contract(address, "mech", False) is contract
+        assert load_contract(address, "mech", False) is not contract
+        # The sync contract evicted the async one
+        assert async_chain.load_contract(address, "mech", False) is not contract
+
+
+@patch('triton.async_chain.get_session', new_callable=AsyncMock)
+class TestAsyncReads:
+    """Tests for the async contract reads"""
+
+    @patch('triton.async_chain.async_web3')
+    def test_get_native_balance(self, mock_web3, mock_get_session):
+        """Test native balance retrieval"""
+        mock_web3.eth.get_balance = AsyncMock(return_value=10**18)
+        mock_web3.to_checksum_address = lambda x: x
+        mock_web3.from_wei.return_value = 1.0
+
+        result = asyncio.run(get_native_balance("0x1234567890abcdef1234567890abcdef12345678"))
+
+        assert result == 1.0
+        mock_web3.eth.get_balance.assert_awaited_once_with("0x1234567890abcdef1234567890abcdef12345678")
+        mock_get_session.assert_awaited()
+
+    @patch('triton.async_chain.get_olas_balance', new_callable=AsyncMock, return_value=7)
+    @patch('triton.async_chain.multicall', new_callable=AsyncMock)
+    def test_get_balances(self, mock_multicall, mock_get_olas_balance, mock_get_session):
+        """Test batched balances with a direct read for a failed call"""
+        agent = "0x1111111111111111111111111111111111111111"
+        safe = "0x2222222222222222222222222222222222222222"
+        mock_multicall.return_value = [10**18, 2 * 10**18, None]
+
+        native, olas = asyncio.run(get_balances([agent, safe, agent], [safe]))
+
+        mock_multicall.assert_awaited_once()
+        assert native == {agent: 1, safe: 2}
+        assert olas == {safe: 7}
+        mock_get_olas_balance.assert_awaited_once_with(safe)
+
+    @patch('triton.async_chain.async_web3')
+    @patch('triton.async_chain.load_contract')
+    def test_get_mech_request_count_fallback(self, mock_load_contract, mock_web3, mock_get_session):
+        """Test fallback to mapRequestCounts when the bytecode does not tell"""
+        mock_web3.to_checksum_address = lambda x: x
+        mock_web3.eth.get_code = AsyncMock(return_value=b"\x60\x80")
+        mock_contract = MagicMock()
+        mock_contract.functions.mapRequestsCounts.return_value.call = AsyncMock(
+            side_effect=ContractLogicError("execution reverted")
+        )
+        mock_contract.get_function_by_name.return_value.return_value.call = AsyncMock(return_value=3)
+        mock_load_contract.return_value = mock_contract
+
+        async def run():
+            return [
+                await get_mech_request_count(
+                    "0x1234567890abcdef1234567890abcdef12345678",
+                    "0xabcdef1234567890abcdef1234567890abcdef12",
+                )
+                for _ in range(2)
+            ]
+
+        assert asyncio.run(run()) == [3, 3]
+        mock_contract.get_function_by_name.assert_called_with("mapRequestCounts")
+        mock_web3.eth.get_code.assert_awaited_once()
+
+    @patch('triton.async_chain.async_web3')
+    @patch('triton.async_chain.load_contract')
+    def test_get_mech_request_count_method_rpc_error(self, mock_load_contract, mock_web3, mock_get_session, isolated_mech_counters):
+        """Test that an RPC error while probing is raised, and not recorded"""
+        mech = "0x1234567890abcdef1234567890abcdef12345678"
+        mock_web3.to_checksum_address = lambda x: x
+        mock_web3.eth.get_code = AsyncMock(return_value=b"\x60\x80")
+        mock_load_contract.return_value.functions.mapRequestsCounts.return_value.call = AsyncMock(
+            side_effect=ValueError({"code": 429})
+        )
+
+        with pytest.raises(ValueError):
+            asyncio.run(get_mech_request_count_method(mech, "0xabcdef1234567890abcdef1234567890abcdef12"))
+
+        assert isolated_mech_counters.get(mech) is None
+
+    @patch('triton.async_chain.async_web3')
+    @patch('triton.async_chain.load_contract')
+    def test_get_mech_request_count_reverted_method_forgotten(self, mock_load_contract, mock_web3, mock_get_session, isolated_mech_counters):
+        """Test that a recorded counter that reverts is dropped, to be probed again"""
+        mech = "0x1234567890abcdef1234567890abcdef12345678"
+        mock_web3.to_checksum_address = lambda x: x
+        isolated_mech_counters.set(mech, "mapRequestsCounts")
+        mock_load_contract.return_value.get_function_by_name.return_value.return_value.call = AsyncMock(
+            side_effect=ContractLogicError("execution reverted")
+        )
+
+        with pytest.raises(ContractLogicError):
+            asyncio.run(get_mech_request_count(mech, "0xabcdef1234567890abcdef1234567890abcdef12"))
+
+        assert isolated_mech_counters.get(mech) is None
+
+    @patch('triton.async_chain.get_staking_metadata', new_callable=AsyncMock)
+    @patch('triton.async_chain.multicall', new_callable=AsyncMock)
+    def test_get_staking_statuses_multicall(self, mock_multicall, mock_get_staking_metadata, mock_get_session):
+        """Test that the statuses are read through a single multicall"""
+        values = {
+            "mapServiceInfo": ("0x0", "0x0", 1752808320, 2 * 10**18, 0),
+            "getServiceInfo": ("0x0", "0x0", (7240, 93), 1752808320, 2 * 10**18, 0),
+            "mapRequestsCounts": None,
+            "mapRequestCounts": 126,
+            "activityChecker": "0x29e3f37CB7a4f4F00a07Ea7BE956006163809298",
+            "livenessRatio": 462962962962960,
+            "livenessPeriod": 86400,
+            "tsCheckpoint": 1753007240,
+            "metadataHash": bytes.fromhex("ab" * 32),
+        }
+        mock_multicall.side_effect = lambda calls: [values[call.fn_name] for call in calls]
+        mock_get_staking_metadata.return_value = {"name": "Staking Program 1"}
+
+        result = asyncio.run(get_staking_statuses([STAKING_PARAMS, STAKING_PARAMS]))
+
+        # Staking program parameters, the activity checker's ratio, then the services
+        assert sorted(len(call[0][0]) for call in mock_multicall.await_args_list) == [1, 4, 4]
+        mock_get_staking_metadata.assert_awaited_with("ab" * 32)
+        assert len(result) == 2
+        assert result[0]["mech_requests_this_epoch"] == 33
+        assert result[0]["required_mech_requests"] == 40
+        assert result[0]["metadata"] == {"name": "Staking Program 1"}
+
+    @patch('triton.async_chain.get_staking_status', new_callable=AsyncMock)
+    @patch('triton.async_chain._read_staking_program', new_callable=AsyncMock)
+    @patch('triton.async_chain.multicall', new_callable=AsyncMock, side_effect=BadFunctionCallOutput("No code"))
+    def test_get_staking_statuses_multicall_unavailable(self, mock_multicall, mock_read_staking_program, mock_get_staking_status, mock_get_session):
+        """Test fallback to direct reads when Multicall3 is unavailable"""
+        mock_get_staking_status.return_value = {"service": 1}
+
+        result = asyncio.run(get_staking_statuses([STAKING_PARAMS]))
+
+        assert result == [{"service": 1}]
+        mock_get_staking_status.assert_awaited_once_with(**STAKING_PARAMS)
+
+    @patch('triton.async_chain.get_staking_status', new_callable=AsyncMock)
+    @patch('triton.async_chain._read_staking_program', new_callable=AsyncMock)
+    @patch('triton.async_chain.multicall', new_callable=AsyncMock, side_effect=BadFunctionCallOutput("No code"))
+    def test_get_staking_statuses_failures_are_isolated(self, mock_multicall, mock_read_staking_program, mock_get_staking_status, mock_get_session):
+        """Test that a failing service gets its error, without failing the others"""
+        error = ValueError("rate limited")
+        mock_get_staking_status.side_effect = [error, {"service": 2}]
+
+        result = asyncio.run(get_staking_statuses([STAKING_PARAMS, STAKING_PARAMS]))
+
+        assert result == [error, {"service": 2}]
+
+    @patch('triton.chain.STAKING_CONTRACTS', {
+        "Test Contract 1": {"address": "0x1234567890abcdef1234567890abcdef12345678"},
+        "Test Contract 2": {"address": "0xabcdef1234567890abcdef1234567890abcdef12"}
+    })
+    @patch('triton.async_chain.async_web3')
+    @patch('triton.async_chain.multicall', new_callable=AsyncMock)
+    def test_get_slots(self, mock_multicall, mock_web3, mock_get_session):
+        """Test slots retrieval, cached until a staking event"""
+        mock_multicall.return_value = [100, [1, 2, 3], 10, [1, 2, 3, 4, 5], 20]
+        mock_web3.eth.get_logs = AsyncMock(return_value=[])
+
+        async def run():
+            return [await get_slots() for _ in range(2)]
+
+        result = asyncio.run(run())
+
+        assert result == [{"Test Contract 1": 7, "Test Contract 2": 15}] * 2
+        mock_multicall.assert_awaited_once()
+        mock_web3.eth.get_logs.assert_awaited_once()
@@ -0,0 +1,190 @@
+"""Tests for triton.cache module"""
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from triton.cache import ContentCache, JsonRecord, LruCache, RefreshingValue, write_json
+
+
+CONTENT_HASH = "ab" * 32
+
+
+class TestContentCache:
+    """Tests for ContentCache class"""
+
+    def test_get_fetches_once_and_persists(self, tmp_path):
+        """Test that content is fetched once and written to disk"""
+        cache = ContentCache(tmp_path)
+        fetch = MagicMock(return_value={"name": "Staking Program 1"})
+
+        assert cache.get(CONTENT_HASH, fetch) == {"name": "Staking Program 1"}
+        assert cache.get("0x" + CONTENT_HASH.upper(), fetch) == {"name": "Staking Program 1"}
+
+        fetch.assert_called_once_with(CONTENT_HASH)
+        assert json.loads((tmp_path / f"{CONTENT_HASH}.json").read_text()) == {"name": "Staking Program 1"}
+
+    def test_get_warm_from_disk(self, tmp_path):
+        """Test that a new cache instance reads persisted entries without fetching"""
+        ContentCache(tmp_path).store(CONTENT_HASH, {"name": "Staking Program 1"})
+        fetch = MagicMock()
+
+        assert ContentCache(tmp_path).get(CONTENT_HASH, fetch) == {"name": "Staking Program 1"}
+        fetch.assert_not_called()
+
+    def test_get_ignores_corrupt_entry(self, tmp_path):
+        """Test that an unreadable entry is fetched again"""
+        (tmp_path / f"{CONTENT_HASH}.json").write_text("{not json")
+        fetch = MagicMock(return_value={"name": "Staking Program 1"})
+
+        assert ContentCache(tmp_path).get(CONTENT_HASH, fetch) == {"name": "Staking Program 1"}
+        fetch.assert_called_once()
+
+    def test_get_invalid_hash(self, tmp_path):
+        """Test that only content hashes are accepted as keys"""
+        with pytest.raises(ValueError, match="Invalid content hash"):
+            ContentCache(tmp_path).get("../../etc/passwd", MagicMock())
+
+    def test_get_single_flight(self, tmp_path):
+        """Test that concurrent callers share a single fetch"""
+        cache = ContentCache(tmp_path)
+        calls = []
+
+        def fetch(content_hash):
+            calls.append(content_hash)
+            time.sleep(0.05)
+            return {"name": "Staking Program 1"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get(CONTENT_HASH, fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{"name": "Staking Program 1"}] * 5
+
+    def test_get_failure_not_cached(self, tmp_path):
+        """Test that a failed fetch is retried on the next call"""
+        cache = ContentCache(tmp_path)
+        fetch = MagicMock(side_effect=[ValueError("Gateway timeout"), {"name": "Staking Program 1"}])
+
+        with pytest.raises(ValueError):
+            cache.get(CONTENT_HASH, fetch)
+
+        assert cache.get(CONTENT_HASH, fetch) == {"name": "Staking Program 1"}
+
+    def test_get_async_single_flight(self, tmp_path):
+        """Test that concurrent coroutines share a single fetch"""
+        cache = ContentCache(tmp_path)
+
+        async def slow_fetch(content_hash):
+            await asyncio.sleep(0.05)
+            return {"name": "Staking Program 1"}
+
+        fetch = AsyncMock(side_effect=slow_fetch)
+
+        async def run():
+            return await asyncio.gather(*(cache.get_async(CONTENT_HASH, fetch) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        assert results == [{"name": "Staking Program 1"}] * 5
+        fetch.assert_awaited_once_with(CONTENT_HASH)
+        assert (tmp_path / f"{CONTENT_HASH}.json").exists()
+
+
+class TestLruCache:
+    """Tests for LruCache class"""
+
+    def test_get_creates_once(self):
+        """Test that an entry is only created on the first get"""
+        cache = LruCache()
+        create = MagicMock(side_effect=lambda: object())
+
+        first = cache.get("key", create)
+
+        assert cache.get("key", create) is first
+        create.assert_called_once()
+
+    def test_least_recently_used_dropped(self):
+        """Test that the least recently used entry is dropped beyond the size"""
+        cache = LruCache(2)
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        cache.get("a", lambda: 0)
+        cache.get("c", lambda: 3)
+
+        assert cache.get("a", lambda: 0) == 1
+        assert cache.get("b", lambda: 0) == 0
+
+
+class TestJsonRecord:
+    """Tests for JsonRecord class"""
+
+    def test_update_persists_once(self, tmp_path):
+        """Test that several values are written with a single write, and only when changed"""
+        record = JsonRecord(tmp_path / "record.json")
+        record.set("a", 1)
+
+        with patch('triton.cache.write_json', wraps=write_json) as mock_write_json:
+            record.update({"a": 1, "b": 2, "c": 3})
+            record.update({"a": 1, "b": 2})
+
+        mock_write_json.assert_called_once()
+        assert json.loads((tmp_path / "record.json").read_text()) == {"a": 1, "b": 2, "c": 3}
+
+
+class TestRefreshingValue:
+    """Tests for RefreshingValue class"""
+
+    def test_get_fetches_when_empty(self):
+        """Test that the first read waits for the value"""
+        fetch = MagicMock(return_value=1.5)
+        value = RefreshingValue(fetch, ttl=60)
+
+        assert value.age is None
+        assert value.get() == 1.5
+        assert value.get() == 1.5
+        fetch.assert_called_once()
+        assert value.age < 1
+
+    def test_get_serves_stale_while_revalidating(self):
+        """Test that an expired value is returned while it is refreshed in the background"""
+        release = threading.Event()
+        prices = iter([1.5, 2.0])
+
+        def fetch():
+            price = next(prices)
+            if price == 2.0:
+                release.wait(1)
+            return price
+
+        value = RefreshingValue(fetch, ttl=60)
+        value.refresh()
+
+        with patch('triton.cache.time.monotonic', return_value=time.monotonic() + 120):
+            assert value.get() == 1.5
+            assert value.get() == 1.5  # Only one refresh runs at a time
+
+        release.set()
+        with value._refresh_lock:  # Wait for the background refresh
+            pass
+        assert value.get() == 2.0
+
+    def test_refresh_keeps_value_on_failure(self):
+        """Test that failed or empty fetches keep the previous value"""
+        fetch = MagicMock(side_effect=[1.5, None, ValueError("Rate limited")])
+        value = RefreshingValue(fetch, ttl=60)
+
+        assert value.refresh() == 1.5
+        assert value.refresh() == 1.5
+        assert value.refresh() == 1.5
+        assert fetch.call_count == 3
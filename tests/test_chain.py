@@ -2,20 +2,37 @@
 import datetime
 from http import HTTPStatus
 from unittest.mock import Mock, patch, MagicMock, mock_open
+import pytest
 import pytz
-from web3.exceptions import ABIFunctionNotFound
+from eth_abi import encode
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
 
+from triton.cache import LruCache
 from triton.chain import (
+    ContractCall,
+    clear_contract_cache,
+    get_balances,
+    get_function_specs,
     get_native_balance,
+    load_abi,
     load_contract,
     get_olas_balance,
     get_mech_request_count,
+    get_mech_request_count_method,
+    find_mech_request_count_method,
+    get_staking_program,
+    get_staking_rewards,
     get_staking_status,
+    invalidate_staking_program,
+    get_staking_statuses,
     get_olas_price,
+    get_olas_price_quote,
     get_slots,
+    invalidate_slots,
+    multicall,
     web3
 )
-from triton.constants import LOCAL_TIMEZONE
+from triton.constants import LOCAL_TIMEZONE, OLAS_TOKEN_ADDRESS_GNOSIS, STAKING_PROGRAM_RECHECK
 
 
 class TestGetNativeBalance:
@@ -47,6 +64,14 @@ class TestGetNativeBalance:
 
 class TestLoadContract:
     """Tests for load_contract function"""
+
+    def setup_method(self):
+        """Start every test with empty caches"""
+        clear_contract_cache()
+
+    def teardown_method(self):
+        """Do not leak mocked contracts into other tests"""
+        clear_contract_cache()
     
     @patch('builtins.open', new_callable=mock_open, read_data='{"abi": [{"name": "test"}]}')
     @patch('triton.chain.web3')
@@ -81,6 +106,50 @@ class TestLoadContract:
         )
 
 
+    @patch('builtins.open', new_callable=mock_open, read_data='{"abi": [{"name": "test"}]}')
+    @patch('triton.chain.web3')
+    def test_load_contract_cached(self, mock_web3, mock_file):
+        """Test that ABIs and contracts are only built once"""
+        mock_web3.to_checksum_address = lambda x: x
+        mock_web3.eth.contract.side_effect = lambda address, abi: MagicMock()
+
+        first = load_contract("0x1234567890abcdef1234567890abcdef12345678", "test")
+        second = load_contract("0x1234567890abcdef1234567890abcdef12345678", "test")
+        other = load_contract("0xabcdef1234567890abcdef1234567890abcdef12", "test")
+
+        assert first is second
+        assert other is not first
+        assert mock_web3.eth.contract.call_count == 2
+        mock_file.assert_called_once()
+
+    @patch('triton.chain._contracts', LruCache(1))
+    @patch('builtins.open', new_callable=mock_open, read_data='{"abi": [{"name": "test"}]}')
+    @patch('triton.chain.web3')
+    def test_load_contract_bounded_cache(self, mock_web3, mock_file):
+        """Test that the least recently used contract is evicted"""
+        mock_web3.to_checksum_address = lambda x: x
+        mock_web3.eth.contract.side_effect = lambda address, abi: MagicMock()
+
+        first = load_contract("0x1234567890abcdef1234567890abcdef12345678", "test")
+        load_contract("0xabcdef1234567890abcdef1234567890abcdef12", "test")
+
+        assert load_contract("0x1234567890abcdef1234567890abcdef12345678", "test") is not first
+        assert mock_web3.eth.contract.call_count == 3
+
+    def test_get_function_specs(self):
+        """Test the precompiled function selectors"""
+        specs = get_function_specs("staking_token")
+
+        assert specs["mapServiceInfo"].selector == bytes.fromhex("a74466ad")
+        assert specs["mapServiceInfo"].input_types == ("uint256",)
+        assert specs["getServiceInfo"].output_types == (
+            "(address,address,uint256[],uint256,uint256,uint256)",
+        )
+        # Overloaded functions are left to web3
+        assert "permit" not in get_function_specs("olas", False)
+        assert load_abi("staking_token") is load_abi("staking_token")
+
+
 class TestGetOlasBalance:
     """Tests for get_olas_balance function"""
     
@@ -110,46 +179,114 @@ class TestGetOlasBalance:
 
 class TestGetMechRequestCount:
     """Tests for get_mech_request_count function"""
-    
+
+    MECH = "0x1234567890AbcdEF1234567890aBcdef12345678"
+    REQUESTER = "0xabcdef1234567890abcdef1234567890abcdef12"
+
+    @patch('triton.chain.web3')
     @patch('triton.chain.load_contract')
-    def test_get_mech_request_count_success(self, mock_load_contract):
-        """Test successful mech request count retrieval"""
+    def test_get_mech_request_count_success(self, mock_load_contract, mock_web3):
+        """Test that the counter found in the bytecode is called once"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_web3.eth.get_code.return_value = b"\x63" + bytes.fromhex("1bbbeeb8") + b"\x14"  # PUSH4 mapRequestCounts
         mock_contract = MagicMock()
-        mock_contract.functions.mapRequestsCounts.return_value.call.return_value = 5
+        mock_contract.get_function_by_name.return_value.return_value.call.return_value = 5
         mock_load_contract.return_value = mock_contract
-        
-        result = get_mech_request_count(
-            "0x1234567890abcdef1234567890abcdef12345678",
-            "0xabcdef1234567890abcdef1234567890abcdef12"
-        )
-        
+
+        result = get_mech_request_count(self.MECH, self.REQUESTER)
+
         assert result == 5
-        mock_contract.functions.mapRequestsCounts.assert_called_once_with(
-            "0xabcdef1234567890abcdef1234567890abcdef12"
-        )
-    
+        mock_contract.get_function_by_name.assert_called_once_with("mapRequestCounts")
+        mock_contract.get_function_by_name.return_value.assert_called_once_with(self.REQUESTER)
+        mock_contract.functions.mapRequestsCounts.assert_not_called()
+
+    @patch('triton.chain.web3')
     @patch('triton.chain.load_contract')
-    def test_get_mech_request_count_fallback(self, mock_load_contract):
-        """Test fallback to mapRequestCounts on exception"""
+    def test_get_mech_request_count_fallback(self, mock_load_contract, mock_web3):
+        """Test fallback to mapRequestCounts when the bytecode does not tell"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_web3.eth.get_code.return_value = b"\x60\x80"  # A proxy
         mock_contract = MagicMock()
-        mock_contract.functions.mapRequestsCounts.return_value.call.side_effect = ABIFunctionNotFound("Not found")
-        mock_contract.functions.mapRequestCounts.return_value.call.return_value = 3
+        mock_contract.functions.mapRequestsCounts.return_value.call.side_effect = ContractLogicError("execution reverted")
+        mock_contract.get_function_by_name.return_value.return_value.call.return_value = 3
         mock_load_contract.return_value = mock_contract
-        
-        result = get_mech_request_count(
-            "0x1234567890abcdef1234567890abcdef12345678",
-            "0xabcdef1234567890abcdef1234567890abcdef12"
-        )
-        
-        assert result == 3
-        mock_contract.functions.mapRequestCounts.assert_called_once_with(
-            "0xabcdef1234567890abcdef1234567890abcdef12"
-        )
+
+        assert get_mech_request_count(self.MECH, self.REQUESTER) == 3
+        assert get_mech_request_count(self.MECH, self.REQUESTER) == 3
+
+        mock_contract.get_function_by_name.assert_called_with("mapRequestCounts")
+        # Probed once
+        mock_contract.functions.mapRequestsCounts.assert_called_once()
+        mock_web3.eth.get_code.assert_called_once()
+
+    @patch('triton.chain.load_contract')
+    def test_get_mech_request_count_known_method(self, mock_load_contract):
+        """Test that a known request counter is called without probing"""
+        mock_contract = MagicMock()
+        mock_contract.get_function_by_name.return_value.return_value.call.return_value = 7
+        mock_load_contract.return_value = mock_contract
+
+        result = get_mech_request_count(self.MECH, self.REQUESTER, method="mapRequestCounts")
+
+        assert result == 7
+        mock_contract.get_function_by_name.assert_called_once_with("mapRequestCounts")
+        mock_contract.functions.mapRequestsCounts.assert_not_called()
+
+    def test_find_mech_request_count_method(self):
+        """Test finding the request counter from the dispatcher selectors"""
+        specs = get_function_specs("mech", has_abi_key=False)
+        old_selector = specs["mapRequestsCounts"].selector
+        new_selector = specs["mapRequestCounts"].selector
+
+        assert find_mech_request_count_method(b"\x63" + old_selector) == "mapRequestsCounts"
+        assert find_mech_request_count_method(b"\x63" + new_selector) == "mapRequestCounts"
+        assert find_mech_request_count_method(b"\x60\x80") is None
+        assert find_mech_request_count_method(b"\x63" + old_selector + b"\x63" + new_selector) is None
+
+    @patch('triton.chain.web3')
+    @patch('triton.chain.load_contract')
+    def test_get_mech_request_count_method_persisted(self, mock_load_contract, mock_web3, isolated_mech_counters):
+        """Test that the probed counter survives a restart"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_web3.eth.get_code.return_value = b"\x60\x80"
+        mock_load_contract.return_value.functions.mapRequestsCounts.return_value.call.side_effect = ContractLogicError("execution reverted")
+
+        assert get_mech_request_count_method(self.MECH, self.REQUESTER) == "mapRequestCounts"
+        isolated_mech_counters.reset()  # As after a restart
+        assert get_mech_request_count_method(self.MECH, self.REQUESTER) == "mapRequestCounts"
+
+        mock_web3.eth.get_code.assert_called_once()
+        assert isolated_mech_counters.path.exists()
+
+    @patch('triton.chain.web3')
+    @patch('triton.chain.load_contract')
+    def test_get_mech_request_count_method_rpc_error(self, mock_load_contract, mock_web3, isolated_mech_counters):
+        """Test that an RPC error while probing is raised, and not recorded"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_web3.eth.get_code.return_value = b"\x60\x80"
+        mock_load_contract.return_value.functions.mapRequestsCounts.return_value.call.side_effect = ValueError({"code": 429})
+
+        with pytest.raises(ValueError):
+            get_mech_request_count_method(self.MECH, self.REQUESTER)
+
+        assert isolated_mech_counters.get(self.MECH) is None
+
+    @patch('triton.chain.load_contract')
+    def test_get_mech_request_count_reverted_method_forgotten(self, mock_load_contract, isolated_mech_counters):
+        """Test that a recorded counter that reverts is dropped, to be probed again"""
+        isolated_mech_counters.set(self.MECH, "mapRequestsCounts")
+        mock_load_contract.return_value.get_function_by_name.return_value.return_value.call.side_effect = ContractLogicError("execution reverted")
+
+        with pytest.raises(ContractLogicError):
+            get_mech_request_count(self.MECH, self.REQUESTER, method="mapRequestsCounts")
+
+        assert isolated_mech_counters.get(self.MECH) is None
 
 
 class TestGetStakingStatus:
     """Tests for get_staking_status function"""
     
+    @patch('triton.chain.USE_MULTICALL', False)
     @patch('triton.chain.get_mech_request_count')
     @patch('triton.chain.load_contract')
     @patch('triton.chain.wei_to_olas')
@@ -181,6 +318,8 @@ class TestGetStakingStatus:
         ]
         mock_staking_contract.functions.livenessPeriod.return_value.call.return_value = 86400
         mock_staking_contract.functions.tsCheckpoint.return_value.call.return_value = 1753007240
+        mock_staking_contract.functions.metadataHash.return_value.call.return_value = bytes.fromhex("ab" * 32)
+        mock_staking_contract.functions.activityChecker.return_value.call.return_value = "0x29e3f37CB7a4f4F00a07Ea7BE956006163809298"
         mock_activity_contract.functions.livenessRatio.return_value.call.return_value = 462962962962960
         
         # Mock load_contract to return appropriate contracts
@@ -207,7 +346,6 @@ class TestGetStakingStatus:
         result = get_staking_status(
             "0x735FAAb1c4Ec41128c367AFb5c3baC73509f70bB",
             "0x9c7F6103e3a72E4d1805b9C683Ea5B370Ec1a99f",
-            "0x29e3f37CB7a4f4F00a07Ea7BE956006163809298",
             1259,
             "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"
         )
@@ -226,6 +364,325 @@ class TestGetStakingStatus:
         }
 
 
+class TestMulticall:
+    """Tests for multicall function"""
+
+    @patch('triton.chain.load_contract')
+    def test_multicall_decodes_and_tolerates_failures(self, mock_load_contract):
+        """Test that successful calls are decoded and failed ones return None"""
+        mock_multicall_contract = MagicMock()
+        mock_multicall_contract.functions.aggregate3.return_value.call.return_value = [
+            (True, encode(["uint256"], [5])),
+            (False, b""),
+            (True, b""),  # No code at the target address
+        ]
+        mock_load_contract.return_value = mock_multicall_contract
+        call = ContractCall(
+            OLAS_TOKEN_ADDRESS_GNOSIS,
+            "olas",
+            "balanceOf",
+            ("0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f",),
+            has_abi_key=False,
+        )
+
+        result = multicall([call, call, call])
+
+        assert result == [5, None, None]
+        aggregated_calls = mock_multicall_contract.functions.aggregate3.call_args[0][0]
+        assert len(aggregated_calls) == 3
+        target, allow_failure, call_data = aggregated_calls[0]
+        assert target == OLAS_TOKEN_ADDRESS_GNOSIS
+        assert allow_failure is True
+        assert call_data == bytes.fromhex("70a08231") + encode(
+            ["address"], ["0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"]
+        )
+
+    @patch('triton.chain.MULTICALL_BATCH_SIZE', 2)
+    @patch('triton.chain.load_contract')
+    def test_multicall_batches(self, mock_load_contract):
+        """Test that calls are split into several aggregate3 calls"""
+        mock_multicall_contract = MagicMock()
+        mock_multicall_contract.functions.aggregate3.return_value.call.side_effect = [
+            [(False, b""), (False, b"")],
+            [(False, b"")],
+        ]
+        mock_load_contract.return_value = mock_multicall_contract
+        call = ContractCall(OLAS_TOKEN_ADDRESS_GNOSIS, "olas", "decimals", has_abi_key=False)
+
+        result = multicall([call, call, call])
+
+        assert result == [None, None, None]
+        assert mock_multicall_contract.functions.aggregate3.call_count == 2
+
+
+class TestGetBalances:
+    """Tests for get_balances function"""
+
+    AGENT = "0x1111111111111111111111111111111111111111"
+    SAFE = "0x2222222222222222222222222222222222222222"
+
+    @patch('triton.chain.get_olas_balance')
+    @patch('triton.chain.get_native_balance')
+    @patch('triton.chain.multicall')
+    def test_get_balances_deduplicated(self, mock_multicall, mock_get_native_balance, mock_get_olas_balance):
+        """Test that every address is read once, in a single multicall"""
+        mock_multicall.return_value = [10**18, 2 * 10**18, 5 * 10**18]
+
+        native, olas = get_balances([self.AGENT, self.SAFE, self.AGENT], [self.SAFE])
+
+        calls = mock_multicall.call_args[0][0]
+        assert [call.fn_name for call in calls] == ["getEthBalance", "getEthBalance", "balanceOf"]
+        assert native[self.AGENT] == 1
+        assert native[self.SAFE] == 2
+        assert olas == {self.SAFE: 5 * 10**18}
+        mock_get_native_balance.assert_not_called()
+        mock_get_olas_balance.assert_not_called()
+
+    @patch('triton.chain.get_olas_balance', return_value=7)
+    @patch('triton.chain.get_native_balance', return_value=3)
+    @patch('triton.chain.multicall')
+    def test_get_balances_failed_reads_fallback(self, mock_multicall, mock_get_native_balance, mock_get_olas_balance):
+        """Test that failed batched reads fall back to direct reads"""
+        mock_multicall.return_value = [None, 10**18, None]
+
+        native, olas = get_balances([self.AGENT, self.SAFE], [self.SAFE])
+
+        assert native == {self.AGENT: 3, self.SAFE: 1}
+        assert olas == {self.SAFE: 7}
+        mock_get_native_balance.assert_called_once_with(self.AGENT)
+        mock_get_olas_balance.assert_called_once_with(self.SAFE)
+
+    @patch('triton.chain.USE_MULTICALL', False)
+    @patch('triton.chain.get_olas_balance', return_value=7)
+    @patch('triton.chain.get_native_balance', return_value=3)
+    @patch('triton.chain.multicall')
+    def test_get_balances_multicall_disabled(self, mock_multicall, mock_get_native_balance, mock_get_olas_balance):
+        """Test direct reads when Multicall3 is disabled"""
+        native, olas = get_balances([self.AGENT], [self.SAFE])
+
+        assert native == {self.AGENT: 3}
+        assert olas == {self.SAFE: 7}
+        mock_multicall.assert_not_called()
+
+
+class TestGetStakingStatuses:
+    """Tests for get_staking_statuses function"""
+
+    STAKING_PARAMS = [
+        {
+            "mech_contract_address": "0x77af31De935740567Cf4fF1986D04B2c964A786a",
+            "staking_token_address": "0x389b46c259631acd6a69bde8b6cee218230bae8c",
+            "service_id": 1259,
+            "safe_address": "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f",
+        },
+        {
+            "mech_contract_address": "0x735FAAb1c4Ec41128c367AFb5c3baC73509f70bB",
+            "staking_token_address": "0x389b46c259631acd6a69bde8b6cee218230bae8c",
+            "service_id": 1260,
+            "safe_address": "0x67f6086f87D7698F0a2C37530B0f3549c304D04E",
+        },
+    ]
+
+    @staticmethod
+    def _multicall_side_effect(calls):
+        values = {
+            "mapServiceInfo": ("0x0", "0x0", 1752808320, 2 * 10**18, 0),
+            "getServiceInfo": ("0x0", "0x0", (7240, 93), 1752808320, 2 * 10**18, 0),
+            "mapRequestCounts": 126,
+            "activityChecker": "0x29e3f37CB7a4f4F00a07Ea7BE956006163809298",
+            "livenessRatio": 462962962962960,
+            "livenessPeriod": 86400,
+            "tsCheckpoint": 1753007240,
+            "metadataHash": bytes.fromhex("ab" * 32),
+        }
+        return [
+            # The first mech only implements mapRequestsCounts
+            (100 if call.address == "0x77af31De935740567Cf4fF1986D04B2c964A786a" else None)
+            if call.fn_name == "mapRequestsCounts"
+            else values[call.fn_name]
+            for call in calls
+        ]
+
+    @patch('triton.chain.get_staking_metadata', return_value={"name": "Staking Program 1"})
+    @patch('triton.chain.multicall')
+    def test_get_staking_statuses_multicall(self, mock_multicall, mock_get_staking_metadata):
+        """Test that all the reads go through a single multicall"""
+        mock_multicall.side_effect = self._multicall_side_effect
+
+        result = get_staking_statuses(self.STAKING_PARAMS)
+
+        # Staking program parameters, the activity checker's ratio, then the services
+        assert [len(call[0][0]) for call in mock_multicall.call_args_list] == [4, 1, 2 * 4]
+        mock_get_staking_metadata.assert_called_with("ab" * 32)
+        assert [status["mech_requests_this_epoch"] for status in result] == [7, 33]
+        assert all(status["accrued_rewards"] == "2.00 OLAS" for status in result)
+        assert all(status["required_mech_requests"] == 40 for status in result)
+        assert all(status["metadata"] == {"name": "Staking Program 1"} for status in result)
+
+    @patch('triton.chain.get_staking_metadata', return_value={"name": "Staking Program 1"})
+    @patch('triton.chain.multicall')
+    def test_get_staking_statuses_program_cached(self, mock_multicall, mock_get_staking_metadata):
+        """Test that the staking program is only read again after the epoch rolls over"""
+        mock_multicall.side_effect = self._multicall_side_effect
+        epoch_end = 1753007240 + 86400
+
+        with patch('triton.chain.time.time') as mock_time:
+            mock_time.return_value = epoch_end - 7200
+            get_staking_statuses(self.STAKING_PARAMS)
+            mock_time.return_value = epoch_end - 3600
+            get_staking_statuses(self.STAKING_PARAMS)
+
+            # Only the per-service reads, with the request counter that worked
+            assert [len(call[0][0]) for call in mock_multicall.call_args_list] == [4, 1, 8, 6]
+            mock_multicall.reset_mock()
+
+            # Past the epoch end the program is read again, then every recheck interval
+            mock_time.return_value = epoch_end + 1
+            get_staking_statuses(self.STAKING_PARAMS)
+            get_staking_statuses(self.STAKING_PARAMS)
+            mock_time.return_value = epoch_end + 1 + STAKING_PROGRAM_RECHECK
+            get_staking_statuses(self.STAKING_PARAMS)
+
+        assert [len(call[0][0]) for call in mock_multicall.call_args_list] == [4, 1, 6, 6, 4, 1, 6]
+
+    @patch('triton.chain.multicall')
+    def test_invalidate_staking_program(self, mock_multicall):
+        """Test that an invalidated staking program is read again"""
+        mock_multicall.side_effect = self._multicall_side_effect
+        address = self.STAKING_PARAMS[0]["staking_token_address"]
+
+        with patch('triton.chain.time.time', return_value=1753007240):
+            program = get_staking_program(address)
+            assert get_staking_program(address) is program
+            invalidate_staking_program(address)
+            assert get_staking_program(address) is not program
+
+        assert program.activity_checker == "0x29e3f37CB7a4f4F00a07Ea7BE956006163809298"
+        assert program.epoch_end == 1753007240 + 86400
+        assert program.metadata_hash == "ab" * 32
+        assert mock_multicall.call_count == 4
+
+    @patch('triton.chain.get_staking_status')
+    @patch('triton.chain._read_staking_program')
+    @patch('triton.chain.multicall', side_effect=BadFunctionCallOutput("No code"))
+    def test_get_staking_statuses_multicall_unavailable(self, mock_multicall, mock_read_staking_program, mock_get_staking_status):
+        """Test fallback to sequential reads when Multicall3 is unavailable"""
+        mock_get_staking_status.side_effect = [{"service": 1}, {"service": 2}]
+
+        result = get_staking_statuses(self.STAKING_PARAMS)
+
+        assert result == [{"service": 1}, {"service": 2}]
+        mock_get_staking_status.assert_any_call(**self.STAKING_PARAMS[0])
+        mock_get_staking_status.assert_any_call(**self.STAKING_PARAMS[1])
+
+    @patch('triton.chain.get_staking_status', return_value={"service": 2})
+    @patch('triton.chain.get_staking_metadata', return_value={"name": "Staking Program 1"})
+    @patch('triton.chain.multicall')
+    def test_get_staking_statuses_failed_service_read(self, mock_multicall, mock_get_staking_metadata, mock_get_staking_status):
+        """Test that a service whose reads failed goes through the sequential path"""
+        def side_effect(calls):
+            return [
+                None if call.fn_name == "mapServiceInfo" and call.args == (1260,) else value
+                for call, value in zip(calls, self._multicall_side_effect(calls))
+            ]
+        mock_multicall.side_effect = side_effect
+
+        result = get_staking_statuses(self.STAKING_PARAMS)
+
+        assert result[0]["mech_requests_this_epoch"] == 7
+        assert result[1] == {"service": 2}
+        mock_get_staking_status.assert_called_once_with(**self.STAKING_PARAMS[1])
+
+    @patch('triton.chain.get_staking_status', return_value={"service": 1})
+    @patch('triton.chain.get_staking_metadata', return_value={"name": "Staking Program 1"})
+    @patch('triton.chain.multicall')
+    def test_get_staking_statuses_recorded_counter_failed(self, mock_multicall, mock_get_staking_metadata, mock_get_staking_status, isolated_mech_counters):
+        """Test that a recorded counter that fails in the multicall is dropped, to be probed again"""
+        mech = self.STAKING_PARAMS[0]["mech_contract_address"]
+        # The first mech only implements mapRequestsCounts
+        isolated_mech_counters.set(mech, "mapRequestCounts")
+        mock_multicall.side_effect = lambda calls: [
+            None if call.address == mech and call.fn_name == "mapRequestCounts" else value
+            for call, value in zip(calls, self._multicall_side_effect(calls))
+        ]
+
+        result = get_staking_statuses(self.STAKING_PARAMS)
+
+        assert result[0] == {"service": 1}
+        assert result[1]["mech_requests_this_epoch"] == 33
+        assert isolated_mech_counters.get(mech) is None
+
+    @patch('triton.chain.get_staking_status')
+    @patch('triton.chain.get_staking_metadata', return_value={"name": "Staking Program 1"})
+    @patch('triton.chain.multicall')
+    def test_get_staking_statuses_failures_are_isolated(self, mock_multicall, mock_get_staking_metadata, mock_get_staking_status):
+        """Test that a service whose sequential read fails gets its error, and the others their status"""
+        def side_effect(calls):
+            return [
+                None if call.fn_name == "mapServiceInfo" and call.args == (1260,) else value
+                for call, value in zip(calls, self._multicall_side_effect(calls))
+            ]
+        mock_multicall.side_effect = side_effect
+        error = ValueError("rate limited")
+        mock_get_staking_status.side_effect = error
+
+        result = get_staking_statuses(self.STAKING_PARAMS)
+
+        assert result[0]["mech_requests_this_epoch"] == 7
+        assert result[1] is error
+
+    @patch('triton.chain.get_staking_status')
+    @patch('triton.chain._read_staking_program')
+    @patch('triton.chain.multicall', side_effect=BadFunctionCallOutput("No code"))
+    def test_get_staking_statuses_fallback_failures_are_isolated(self, mock_multicall, mock_read_staking_program, mock_get_staking_status):
+        """Test that a failing service does not fail the others on the sequential path"""
+        error = ValueError("rate limited")
+        mock_get_staking_status.side_effect = [error, {"service": 2}]
+
+        assert get_staking_statuses(self.STAKING_PARAMS) == [error, {"service": 2}]
+
+    @patch('triton.chain.USE_MULTICALL', False)
+    @patch('triton.chain.get_staking_status', return_value={"service": 1})
+    @patch('triton.chain.multicall')
+    def test_get_staking_statuses_multicall_disabled(self, mock_multicall, mock_get_staking_status):
+        """Test the sequential path when multicall is disabled"""
+        result = get_staking_statuses(self.STAKING_PARAMS)
+
+        assert result == [{"service": 1}, {"service": 1}]
+        mock_multicall.assert_not_called()
+
+
+class TestGetStakingRewards:
+    """Tests for get_staking_rewards function"""
+
+    STAKING = "0x389B46c259631Acd6a69Bde8B6cEe218230bAE8C"
+
+    @patch('triton.chain.load_contract')
+    @patch('triton.chain.multicall')
+    def test_get_staking_rewards_batched(self, mock_multicall, mock_load_contract):
+        """Test every reward is read in a single multicall, failed reads one by one"""
+        mock_multicall.return_value = [5 * 10**18, None]
+        mock_load_contract.return_value.functions.calculateStakingReward.return_value.call.return_value = 0
+
+        result = get_staking_rewards([(self.STAKING, 1), (self.STAKING.lower(), 2)])
+
+        assert result == [5 * 10**18, 0]
+        calls = mock_multicall.call_args[0][0]
+        assert calls == [
+            ContractCall(self.STAKING, "staking_token", "calculateStakingReward", (1,)),
+            ContractCall(self.STAKING, "staking_token", "calculateStakingReward", (2,)),
+        ]
+        mock_load_contract.return_value.functions.calculateStakingReward.assert_called_once_with(2)
+
+    @patch('triton.chain.load_contract')
+    @patch('triton.chain.multicall', side_effect=ValueError("no multicall"))
+    def test_get_staking_rewards_multicall_unavailable(self, mock_multicall, mock_load_contract):
+        """Test the sequential reads when the multicall fails"""
+        mock_load_contract.return_value.functions.calculateStakingReward.return_value.call.return_value = 3
+
+        assert get_staking_rewards([(self.STAKING, 1)]) == [3]
+
+
 class TestGetOlasPrice:
     """Tests for get_olas_price function"""
     
@@ -256,41 +713,144 @@ class TestGetOlasPrice:
         mock_logger.error.assert_called_once_with(mock_response)
 
 
+    @patch('triton.chain.olas_price')
+    def test_get_olas_price_quote(self, mock_olas_price):
+        """Test that the quote comes from the cached price"""
+        mock_olas_price.get.return_value = 1.23
+        mock_olas_price.age = 42.0
+
+        result = get_olas_price_quote()
+
+        assert result.price == 1.23
+        assert result.age == 42.0
+
+
+SLOT_CONTRACTS = {
+    "Test Contract 1": {"address": "0x1234567890abcdef1234567890abcdef12345678"},
+    "Test Contract 2": {"address": "0xabcdef1234567890abcdef1234567890abcdef12"},
+}
+
+
 class TestGetSlots:
     """Tests for get_slots function"""
-    
-    @patch('triton.chain.STAKING_CONTRACTS', {
-        "Test Contract 1": {"address": "0x1234567890abcdef1234567890abcdef12345678", "slots": 10},
-        "Test Contract 2": {"address": "0xabcdef1234567890abcdef1234567890abcdef12", "slots": 20}
-    })
-    @patch('triton.chain.load_contract')
+
+    @staticmethod
+    def slot_reads(calls):
+        """Answer the slot reads of a multicall"""
+        values = {
+            ("0x1234567890abcdef1234567890abcdef12345678", "getServiceIds"): [1, 2, 3],
+            ("0x1234567890abcdef1234567890abcdef12345678", "maxNumServices"): 10,
+            ("0xabcdef1234567890abcdef1234567890abcdef12", "getServiceIds"): [1, 2, 3, 4, 5],
+            ("0xabcdef1234567890abcdef1234567890abcdef12", "maxNumServices"): 20,
+        }
+        return [
+            100 if call.fn_name == "getBlockNumber" else values[(call.address, call.fn_name)]
+            for call in calls
+        ]
+
+    @patch('triton.chain.STAKING_CONTRACTS', SLOT_CONTRACTS)
+    @patch('triton.chain.multicall')
     @patch('triton.chain.web3')
-    def test_get_slots_success(self, mock_web3, mock_load_contract):
-        """Test successful slots retrieval"""
-        mock_web3.to_checksum_address.side_effect = lambda x: x.upper()
-        
-        # Mock contracts
-        mock_contract_1 = MagicMock()
-        mock_contract_1.functions.getServiceIds.return_value.call.return_value = [1, 2, 3]  # 3 services
-        
-        mock_contract_2 = MagicMock()
-        mock_contract_2.functions.getServiceIds.return_value.call.return_value = [1, 2, 3, 4, 5]  # 5 services
-        
-        mock_load_contract.side_effect = [mock_contract_1, mock_contract_2]
-        
+    def test_get_slots_success(self, mock_web3, mock_multicall):
+        """Test that the slots are counted through a single multicall"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_multicall.side_effect = self.slot_reads
+
         result = get_slots()
-        
+
         assert result == {
             "Test Contract 1": 7,  # 10 - 3
             "Test Contract 2": 15  # 20 - 5
         }
-        assert mock_load_contract.call_count == 2
-    
+        mock_multicall.assert_called_once()
+        mock_web3.eth.get_logs.assert_not_called()
+
+    @patch('triton.chain.STAKING_CONTRACTS', SLOT_CONTRACTS)
+    @patch('triton.chain.multicall')
+    @patch('triton.chain.web3')
+    def test_get_slots_cached_until_staking_events(self, mock_web3, mock_multicall):
+        """Test that the counts are reused while no service is staked or unstaked"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_multicall.side_effect = self.slot_reads
+        mock_web3.eth.get_logs.return_value = []
+
+        get_slots()
+        result = get_slots()
+
+        assert result == {"Test Contract 1": 7, "Test Contract 2": 15}
+        mock_multicall.assert_called_once()
+        log_filter = mock_web3.eth.get_logs.call_args[0][0]
+        assert log_filter["fromBlock"] == 101
+        assert len(log_filter["topics"][0]) == 3
+
+        mock_web3.eth.get_logs.return_value = [{"blockNumber": 101}]
+        get_slots()
+
+        # The capacities are only read once
+        assert mock_multicall.call_count == 2
+        assert [call.fn_name for call in mock_multicall.call_args[0][0]] == [
+            "getBlockNumber", "getServiceIds", "getServiceIds"
+        ]
+
+    @patch('triton.chain.STAKING_CONTRACTS', SLOT_CONTRACTS)
+    @patch('triton.chain.multicall')
+    @patch('triton.chain.web3')
+    def test_get_slots_reload_on_log_error(self, mock_web3, mock_multicall):
+        """Test that the counts are read again when the events cannot be checked"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_multicall.side_effect = self.slot_reads
+        mock_web3.eth.get_logs.side_effect = ValueError("Block range too large")
+
+        get_slots()
+        get_slots()
+
+        assert mock_multicall.call_count == 2
+
+    @patch('triton.chain.STAKING_CONTRACTS', SLOT_CONTRACTS)
+    @patch('triton.chain.USE_MULTICALL', False)
+    @patch('triton.chain.load_contract')
+    @patch('triton.chain.web3')
+    def test_get_slots_sequential(self, mock_web3, mock_load_contract):
+        """Test the direct reads when Multicall3 is disabled"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_web3.eth.block_number = 100
+
+        mock_contract_1 = MagicMock()
+        mock_contract_1.functions.getServiceIds.return_value.call.return_value = [1, 2, 3]
+        mock_contract_1.functions.maxNumServices.return_value.call.return_value = 10
+        mock_contract_2 = MagicMock()
+        mock_contract_2.functions.getServiceIds.return_value.call.return_value = [1, 2, 3, 4, 5]
+        mock_contract_2.functions.maxNumServices.return_value.call.return_value = 20
+        mock_load_contract.side_effect = [mock_contract_1, mock_contract_2]
+
+        result = get_slots()
+
+        assert result == {"Test Contract 1": 7, "Test Contract 2": 15}
+        mock_contract_1.functions.getServiceIds.return_value.call.assert_called_once_with(
+            block_identifier=100
+        )
+
+    @patch('triton.chain.STAKING_CONTRACTS', SLOT_CONTRACTS)
+    @patch('triton.chain.multicall')
+    @patch('triton.chain.web3')
+    def test_invalidate_slots(self, mock_web3, mock_multicall):
+        """Test that invalidated counts are read again without checking the events"""
+        mock_web3.to_checksum_address.side_effect = lambda x: x
+        mock_multicall.side_effect = self.slot_reads
+
+        get_slots()
+        invalidate_slots()
+        get_slots()
+
+        assert mock_multicall.call_count == 2
+        mock_web3.eth.get_logs.assert_not_called()
+
     @patch('triton.chain.STAKING_CONTRACTS', {})
-    def test_get_slots_empty_contracts(self):
+    @patch('triton.chain.multicall', return_value=[100])
+    def test_get_slots_empty_contracts(self, mock_multicall):
         """Test get_slots with empty contracts dictionary"""
         result = get_slots()
-        
+
         assert result == {}
 
 
@@ -0,0 +1,112 @@
+"""Tests for triton.claims module"""
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from triton.chain import load_contract, web3
+from triton.claims import ClaimOutcome, ClaimRequest, plan_claims, run_claims
+from triton.transactions import TransactionFailed
+
+STAKING = "0x389B46c259631Acd6a69Bde8B6cEe218230bAE8C"
+OTHER_STAKING = "0x238EB6993b90a978ec6AAD7530d6429c949C08DA"
+MASTER_SAFE = "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"
+
+
+def make_request(name, service_id=1, staking_contract=STAKING):
+    """Build a claim request signed by a mocked master EOA"""
+    crypto = Mock()
+    crypto.address = "0xmaster1"
+    return ClaimRequest(
+        name=name,
+        service_id=service_id,
+        staking_contract=staking_contract,
+        safe=MASTER_SAFE,
+        crypto=crypto,
+    )
+
+
+class TestClaimRequest:
+    """Tests for ClaimRequest class"""
+
+    def test_claim_transaction(self):
+        """Test the master Safe calls claim on the staking contract"""
+        request = make_request("service1", service_id=42)
+
+        transaction = request.transaction
+
+        assert transaction.safe == MASTER_SAFE
+        assert transaction.to == STAKING
+        assert transaction.data == load_contract(STAKING, "staking_token").encodeABI(
+            fn_name="claim", args=[42]
+        )
+        assert transaction.crypto is request.crypto
+        assert transaction.signer == "0xmaster1"
+        assert transaction.gas == 500000
+
+    def test_checkpoint_transaction(self):
+        """Test checkpointAndClaim is called, with its own gas limit, when the epoch ended"""
+        request = make_request("service1", service_id=42)._replace(checkpoint=True)
+
+        transaction = request.transaction
+
+        assert transaction.data == load_contract(STAKING, "staking_token").encodeABI(
+            fn_name="checkpointAndClaim", args=[42]
+        )
+        assert transaction.gas == 2000000
+
+
+class TestPlanClaims:
+    """Tests for plan_claims function"""
+
+    @patch('triton.claims.get_staking_programs')
+    @patch('triton.claims.get_staking_rewards', return_value=[10**18, 0])
+    def test_checkpoint_where_the_epoch_ended(self, mock_get_staking_rewards, mock_get_staking_programs):
+        """Test the rewards are read in one batch, and the checkpoint is called past the epoch end"""
+        mock_get_staking_programs.return_value = {
+            STAKING: Mock(epoch_end=1000),
+            web3.to_checksum_address(OTHER_STAKING): Mock(epoch_end=3000),
+        }
+        requests = [
+            make_request("service1", service_id=1),
+            make_request("service2", service_id=2, staking_contract=OTHER_STAKING),
+        ]
+
+        planned, rewards = plan_claims(requests, now=2000)
+
+        assert rewards == [10**18, 0]
+        assert [request.checkpoint for request in planned] == [True, False]
+        mock_get_staking_rewards.assert_called_once_with([(STAKING, 1), (OTHER_STAKING, 2)])
+
+
+class TestRunClaims:
+    """Tests for run_claims function"""
+
+    @patch('triton.claims.send_all', new_callable=AsyncMock)
+    @patch('triton.claims.plan_claims')
+    def test_skips_low_rewards(self, mock_plan_claims, mock_send_all):
+        """Test services without rewards, or below the minimum, are not claimed"""
+        requests = [make_request(name) for name in ("a", "b", "c", "d")]
+        mock_plan_claims.return_value = (requests, [0, 5 * 10**17, 2 * 10**18, 3 * 10**18])
+        error = TransactionFailed("reverted")
+        mock_send_all.return_value = ["0xc", error]
+
+        result = asyncio.run(run_claims(requests, min_reward=1))
+
+        assert [t.name for t in mock_send_all.call_args.args[0]] == ["c", "d"]
+        assert result == [
+            ClaimOutcome(reward=0),
+            ClaimOutcome(reward=5 * 10**17),
+            ClaimOutcome(reward=2 * 10**18, tx_hash="0xc"),
+            ClaimOutcome(reward=3 * 10**18, error=error),
+        ]
+
+    @patch('triton.claims.send_all', new_callable=AsyncMock, return_value=[])
+    @patch('triton.claims.plan_claims')
+    def test_nothing_to_claim(self, mock_plan_claims, mock_send_all):
+        """Test no transaction is sent when no service has rewards"""
+        requests = [make_request("a")]
+        mock_plan_claims.return_value = (requests, [0])
+
+        result = asyncio.run(run_claims(requests))
+
+        assert result == [ClaimOutcome(reward=0)]
+        mock_send_all.assert_called_once_with([])
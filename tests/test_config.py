@@ -0,0 +1,59 @@
+"""Tests for triton.config module"""
+import os
+
+from triton.config import ConfigWatcher, OperatorsDiff, diff_operators
+
+
+class TestDiffOperators:
+    """Tests for diff_operators function"""
+
+    def test_diff(self):
+        """Test added, removed and moved operators are reported"""
+        old = {"alice": "/alice", "bob": "/bob", "carol": "/carol"}
+        new = {"alice": "/alice", "carol": "/new/carol", "dave": "/dave"}
+
+        assert diff_operators(old, new) == OperatorsDiff(
+            added={"carol": "/new/carol", "dave": "/dave"},
+            removed=["bob", "carol"],
+        )
+
+    def test_no_changes(self):
+        """Test an unchanged configuration has nothing to load or drop"""
+        operators = {"alice": "/alice"}
+
+        assert diff_operators(operators, dict(operators)) == OperatorsDiff({}, [])
+
+
+class TestConfigWatcher:
+    """Tests for ConfigWatcher class"""
+
+    def test_poll_reads_modified_file(self, tmp_path):
+        """Test the file is only read again once it is modified"""
+        path = tmp_path / "config.yaml"
+        path.write_text("operators:\n  alice: /alice\n", encoding="utf-8")
+        watcher = ConfigWatcher(path)
+
+        assert watcher.load() == {"alice": "/alice"}
+        assert watcher.poll() is None
+
+        path.write_text("operators:\n  alice: /alice\n  bob: /bob\n", encoding="utf-8")
+
+        assert watcher.poll() == {"alice": "/alice", "bob": "/bob"}
+        assert watcher.poll() is None
+
+    def test_poll_ignores_invalid_file(self, tmp_path):
+        """Test an invalid or missing file is ignored until it is modified again"""
+        path = tmp_path / "config.yaml"
+        path.write_text("operators:\n  alice: /alice\n", encoding="utf-8")
+        watcher = ConfigWatcher(path)
+        watcher.load()
+
+        path.write_text("operators: [alice\n", encoding="utf-8")
+        assert watcher.poll() is None
+        assert watcher.poll() is None
+
+        os.remove(path)
+        assert watcher.poll() is None
+
+        path.write_text("operators:\n  bob: /bob\n", encoding="utf-8")
+        assert watcher.poll() == {"bob": "/bob"}
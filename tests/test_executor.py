@@ -0,0 +1,123 @@
+"""Tests for triton.executor module"""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from triton.executor import (
+    map_blocking,
+    map_concurrently,
+    run_blocking,
+)
+
+
+class TestRunBlocking:
+    """Tests for run_blocking function"""
+
+    def test_run_blocking_result(self):
+        """Test that the result of the blocking function is returned"""
+        result = asyncio.run(run_blocking(lambda x, y: x + y, 1, 2))
+
+        assert result == 3
+
+    def test_run_blocking_runs_off_the_event_loop(self):
+        """Test that the blocking function runs in a worker thread"""
+        main_thread = threading.get_ident()
+
+        result = asyncio.run(run_blocking(threading.get_ident))
+
+        assert result != main_thread
+
+    def test_run_blocking_timeout(self):
+        """Test that the caller stops waiting after the timeout"""
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run_blocking(time.sleep, 1, timeout=0.05))
+
+
+class TestMapBlocking:
+    """Tests for map_blocking function"""
+
+    def test_map_blocking_runs_concurrently(self):
+        """Test that the items run at the same time, and results keep their order"""
+        def work(delay):
+            time.sleep(delay)
+            return delay
+
+        started = time.monotonic()
+        results = map_blocking(work, [0.2, 0.1, 0.2])
+
+        assert results == [0.2, 0.1, 0.2]
+        assert time.monotonic() - started < 0.4
+
+    def test_map_blocking_returns_exceptions(self):
+        """Test that a failing item does not stop the others"""
+        def work(item):
+            if item == 2:
+                raise ValueError("bad item")
+            return item
+
+        results = map_blocking(work, [1, 2, 3])
+
+        assert results[0] == 1
+        assert isinstance(results[1], ValueError)
+        assert results[2] == 3
+
+
+class TestMapConcurrently:
+    """Tests for map_concurrently function"""
+
+    def test_map_concurrently_keeps_order(self):
+        """Test that results come back in the order of the items"""
+        def work(delay):
+            time.sleep(delay)
+            return delay
+
+        result = asyncio.run(map_concurrently(work, [0.03, 0.01, 0.02]))
+
+        assert result == [0.03, 0.01, 0.02]
+
+    def test_map_concurrently_runs_in_parallel(self):
+        """Test that wall time is roughly the slowest item"""
+        start = time.monotonic()
+
+        asyncio.run(map_concurrently(time.sleep, [0.1] * 4))
+
+        assert time.monotonic() - start < 0.3
+
+    def test_map_concurrently_returns_exceptions(self):
+        """Test that failures and timeouts do not affect other items"""
+        def work(item):
+            if item == "fail":
+                raise ValueError("Failed")
+            if item == "slow":
+                time.sleep(0.2)
+            return item
+
+        result = asyncio.run(map_concurrently(work, ["ok", "fail", "slow"], timeout=0.05))
+
+        assert result[0] == "ok"
+        assert isinstance(result[1], ValueError)
+        assert isinstance(result[2], asyncio.TimeoutError)
+
+    @patch('triton.executor.SERVICE_CONCURRENCY', 2)
+    def test_map_concurrently_bounded(self):
+        """Test that no more than the configured number of items run at once"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def work(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(item)
+            return item
+
+        asyncio.run(map_concurrently(work, list(range(6))))
+
+        assert max(peak) <= 2
+
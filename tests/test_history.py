@@ -0,0 +1,177 @@
+"""Tests for triton.history module"""
+from unittest.mock import patch
+
+from triton.cache import JsonRecord
+from triton.history import (
+    DAY,
+    BalanceHistory,
+    BalanceSample,
+    BurnRate,
+    BurnRateEstimator,
+    get_balance_samples,
+    get_balance_trend,
+)
+
+AGENT = "0x1111111111111111111111111111111111111111"
+
+
+class TestGetBalanceSamples:
+    """Tests for get_balance_samples function"""
+
+    def test_get_balance_samples(self):
+        """Test that every checked balance becomes a sample of its address"""
+        addresses = {
+            "agent_eoa": "0xagent",
+            "service_safe": "0xsafe",
+            "master_eoa": "0xmaster",
+            "master_safe": "0xmastersafe",
+        }
+        balances = {
+            "agent_eoa_native_balance": 0.5,
+            "service_safe_native_balance": 2,
+            "service_safe_olas_balance": 100.0,
+            "master_eoa_native_balance": 1.5,
+            "master_safe_native_balance": 3.0,
+        }
+
+        samples = get_balance_samples(addresses, balances, 100)
+
+        assert BalanceSample("0xagent", "xDAI", 100, 0.5) in samples
+        assert BalanceSample("0xsafe", "xDAI", 100, 2.0) in samples
+        assert BalanceSample("0xsafe", "OLAS", 100, 100.0) in samples
+        assert len(samples) == 5
+
+
+class TestGetBalanceTrend:
+    """Tests for get_balance_trend function"""
+
+    def test_get_balance_trend_ignores_top_ups(self):
+        """Test that top-ups change the balance but are not burnt"""
+        points = [(0, 1.0), (DAY, 0.8), (DAY + 1, 2.0), (2 * DAY, 1.6)]
+
+        trend = get_balance_trend(points)
+
+        assert trend.balance == 1.6
+        assert abs(trend.burn_per_day - 0.3) < 1e-9
+        assert abs(trend.change_per_day - 0.3) < 1e-9
+        assert abs(trend.days_to_empty - 1.6 / 0.3) < 1e-9
+
+    def test_get_balance_trend_not_enough_samples(self):
+        """Test that a single sample has no trend"""
+        assert get_balance_trend([(0, 1.0)]) is None
+        assert get_balance_trend([(0, 1.0), (0, 1.0)]) is None
+
+    def test_days_to_empty_without_burn(self):
+        """Test that a balance that does not go down never runs out"""
+        trend = get_balance_trend([(0, 1.0), (DAY, 1.5)])
+
+        assert trend.burn_per_day == 0
+        assert trend.days_to_empty is None
+
+
+class TestBalanceHistory:
+    """Tests for the BalanceHistory class"""
+
+    def test_record_and_get_trend(self, tmp_path):
+        """Test range queries over the recorded samples"""
+        history = BalanceHistory(tmp_path / "balances.db")
+        history.record(
+            BalanceSample(AGENT, "xDAI", hour * 3600, 10 - hour * 0.01)
+            for hour in range(48)
+        )
+
+        samples = history.get_samples(AGENT, "xDAI", 24 * 3600, 47 * 3600)
+        trend = history.get_trend(AGENT, "xDAI", 1, now=47 * 3600)
+
+        assert len(samples) == 24
+        assert abs(trend.burn_per_day - 0.24) < 1e-9
+        assert history.get_trend(AGENT, "OLAS", 1, now=47 * 3600) is None
+
+    def test_record_survives_restart(self, tmp_path):
+        """Test that the samples are kept on disk"""
+        BalanceHistory(tmp_path / "balances.db").record([BalanceSample(AGENT, "xDAI", 1, 1.0)])
+
+        assert BalanceHistory(tmp_path / "balances.db").get_samples(AGENT, "xDAI", 0, 10) == [(1, 1.0)]
+
+    @patch('triton.history.BALANCE_HISTORY_RETENTION_DAYS', 10)
+    @patch('triton.history.BALANCE_HISTORY_FULL_RESOLUTION_DAYS', 2)
+    def test_downsampling_and_retention(self, tmp_path):
+        """Test that old samples are downsampled to one per day, then dropped"""
+        history = BalanceHistory(tmp_path / "balances.db")
+        now = 20 * DAY
+        history.record(
+            BalanceSample(AGENT, "xDAI", ts, 1.0)
+            for ts in range(5 * DAY, now + 1, 6 * 3600)
+        )
+
+        samples = [ts for ts, _ in history.get_samples(AGENT, "xDAI", 0, now)]
+
+        # Nothing older than the retention period
+        assert min(samples) >= now - 10 * DAY
+        # One sample per day up to the full resolution window
+        old = [ts for ts in samples if ts < now - 2 * DAY]
+        assert len(old) == len({ts // DAY for ts in old})
+        assert all(ts % DAY == 18 * 3600 for ts in old)
+        # Every sample within the full resolution window
+        assert len([ts for ts in samples if ts >= now - 2 * DAY]) == 9
+
+
+class TestBurnRateEstimator:
+    """Tests for the BurnRateEstimator class"""
+
+    def test_update(self, tmp_path):
+        """Test the first estimate and the weighting of the following samples"""
+        estimator = BurnRateEstimator(JsonRecord(tmp_path / "burn_rates.json"), half_life=DAY)
+
+        assert estimator.update(AGENT, 0, 1.0).burn_per_day is None
+        assert abs(estimator.update(AGENT, DAY, 0.9).burn_per_day - 0.1) < 1e-9
+
+        # After one half-life, the new sample weighs as much as the estimate
+        assert abs(estimator.update(AGENT, 2 * DAY, 0.6).burn_per_day - 0.2) < 1e-9
+
+    def test_update_ignores_top_ups_and_repeated_samples(self, tmp_path):
+        """Test that top-ups and samples at the same time keep the estimate"""
+        estimator = BurnRateEstimator(JsonRecord(tmp_path / "burn_rates.json"), half_life=DAY)
+        estimator.update(AGENT, 0, 1.0)
+        estimator.update(AGENT, DAY, 0.9)
+
+        repeated = estimator.update(AGENT, DAY, 0.8)
+        topped_up = estimator.update(AGENT, 2 * DAY, 5.0)
+
+        assert repeated.balance == 0.9
+        assert abs(repeated.burn_per_day - 0.1) < 1e-9
+        assert topped_up.balance == 5.0
+        assert abs(topped_up.burn_per_day - 0.1) < 1e-9
+        # The top-up is the baseline of the next sample
+        assert abs(estimator.update(AGENT, 3 * DAY, 4.9).burn_per_day - 0.1) < 1e-9
+
+    def test_update_survives_restart(self, tmp_path):
+        """Test that the estimate is persisted"""
+        BurnRateEstimator(JsonRecord(tmp_path / "burn_rates.json"), half_life=DAY).update(AGENT, 0, 1.0)
+        estimator = BurnRateEstimator(JsonRecord(tmp_path / "burn_rates.json"), half_life=DAY)
+
+        assert abs(estimator.update(AGENT, DAY, 0.5).burn_per_day - 0.5) < 1e-9
+
+    def test_update_all_persists_once(self, tmp_path):
+        """Test that the samples of a check are estimated in order and written at once"""
+        record = JsonRecord(tmp_path / "burn_rates.json")
+        estimator = BurnRateEstimator(record, half_life=DAY)
+        safe = "0x2222222222222222222222222222222222222222"
+        estimator.update(AGENT, 0, 1.0)
+
+        with patch.object(record, 'update', wraps=record.update) as mock_update:
+            burn_rates = estimator.update_all([(AGENT, DAY, 0.9), (safe, DAY, 2.0), (AGENT, DAY, 0.8)])
+
+        mock_update.assert_called_once()
+        assert abs(burn_rates[0].burn_per_day - 0.1) < 1e-9
+        assert burn_rates[1].burn_per_day is None
+        # A repeated address sees the sample taken earlier in the same check
+        assert burn_rates[2].balance == 0.9
+        assert JsonRecord(tmp_path / "burn_rates.json").get(safe) == [DAY, 2.0, None]
+
+    def test_days_to(self):
+        """Test the projection to a threshold"""
+        assert BurnRate(balance=1.0, burn_per_day=0.2).days_to(0.1) == 4.5
+        assert BurnRate(balance=0.05, burn_per_day=0.2).days_to(0.1) == 0
+        assert BurnRate(balance=1.0, burn_per_day=0).days_to(0.1) is None
+        assert BurnRate(balance=1.0, burn_per_day=None).days_to(0.1) is None
@@ -0,0 +1,228 @@
+"""Tests for triton.indexer module"""
+from unittest.mock import patch
+
+import pytest
+from eth_abi import encode
+from hexbytes import HexBytes
+
+from triton.chain import web3
+from triton.indexer import EventIndexer, decode_log, get_event_topics
+
+STAKING = "0x389B46c259631Acd6a69Bde8B6cEe218230bAE8C"
+OTHER_STAKING = "0x238EB6993b90A978ec6AAD7530d6429c949C08DA"
+OWNER = "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"
+
+
+def topic(name):
+    """Get the log topic of an event"""
+    return HexBytes(next(key for key, value in get_event_topics().items() if value == name))
+
+
+def make_log(name, block, data_types, data, indexed=(), address=STAKING, log_index=0):
+    """Build a raw staking contract log"""
+    return {
+        "address": address,
+        "blockNumber": block,
+        "logIndex": log_index,
+        "transactionHash": HexBytes(block.to_bytes(32, "big")),
+        "blockHash": HexBytes(b"\x00" * 32),
+        "transactionIndex": 0,
+        "removed": False,
+        "topics": [topic(name)] + [HexBytes(encode([t], [v])) for t, v in indexed],
+        "data": HexBytes(encode(data_types, data)),
+    }
+
+
+def reward_claimed_log(block, service_id, reward, address=STAKING):
+    """Build a RewardClaimed log"""
+    return make_log(
+        "RewardClaimed",
+        block,
+        ["uint256", "uint256[]", "uint256"],
+        [7, [1, 2], reward],
+        indexed=[("uint256", service_id), ("address", OWNER), ("address", OWNER)],
+        address=address,
+    )
+
+
+def checkpoint_log(block, service_ids):
+    """Build a Checkpoint log"""
+    return make_log(
+        "Checkpoint",
+        block,
+        ["uint256", "uint256[]", "uint256[]", "uint256"],
+        [10**20, service_ids, [10**18] * len(service_ids), 86400],
+        indexed=[("uint256", 7)],
+    )
+
+
+def logs_in_range(logs):
+    """Answer get_logs with the logs in the filter's block range"""
+    def get_logs(log_filter):
+        return [
+            log for log in logs
+            if log_filter["fromBlock"] <= log["blockNumber"] <= log_filter["toBlock"]
+        ]
+    return get_logs
+
+
+class TestDecodeLog:
+    """Tests for decode_log function"""
+
+    def test_decode_log(self):
+        """Test that the event name and arguments are decoded"""
+        event = decode_log(reward_claimed_log(100, 1259, 5 * 10**18))
+
+        assert event.event == "RewardClaimed"
+        assert event.block == 100
+        assert event.args["serviceId"] == 1259
+        assert event.args["reward"] == 5 * 10**18
+        assert event.service_ids == [1259]
+
+    def test_decode_log_several_services(self):
+        """Test the services of a Checkpoint"""
+        event = decode_log(checkpoint_log(100, [1, 2, 3]))
+
+        assert event.event == "Checkpoint"
+        assert event.service_ids == [1, 2, 3]
+
+
+@patch('triton.indexer.EVENT_INDEXER_LOOKBACK', 1000)
+@patch('triton.indexer.web3')
+class TestEventIndexer:
+    """Tests for the EventIndexer class"""
+
+    @staticmethod
+    def setup_web3(mock_web3, latest, logs):
+        """Serve the given logs and block number"""
+        mock_web3.to_hex = web3.to_hex
+        mock_web3.to_checksum_address = web3.to_checksum_address
+        mock_web3.eth.block_number = latest
+        mock_web3.eth.get_logs.side_effect = logs_in_range(logs)
+
+    def test_index_resumes_from_cursor(self, mock_web3, tmp_path):
+        """Test that only the blocks after the cursor are read again"""
+        indexer = EventIndexer(tmp_path / "events.db", chunk_size=10000)
+        self.setup_web3(mock_web3, 5000, [reward_claimed_log(4500, 1259, 10**18)])
+
+        events = indexer.index([STAKING])
+
+        assert [event.event for event in events] == ["RewardClaimed"]
+        assert mock_web3.eth.get_logs.call_args[0][0]["fromBlock"] == 4001
+        assert indexer.get_cursors([STAKING]) == {STAKING: 5000}
+
+        # A new indexer on the same database, as after a restart
+        restarted = EventIndexer(tmp_path / "events.db", chunk_size=10000)
+        self.setup_web3(mock_web3, 5100, [reward_claimed_log(4500, 1259, 10**18)])
+
+        assert not restarted.index([STAKING])
+        assert mock_web3.eth.get_logs.call_args[0][0]["fromBlock"] == 5001
+        assert len(restarted.get_events(service_id=1259)) == 1
+
+    def test_index_in_chunks(self, mock_web3, tmp_path):
+        """Test that the block range is read in chunks"""
+        indexer = EventIndexer(tmp_path / "events.db", chunk_size=300)
+        self.setup_web3(mock_web3, 5000, [])
+
+        indexer.index([STAKING])
+
+        ranges = [
+            (call[0][0]["fromBlock"], call[0][0]["toBlock"])
+            for call in mock_web3.eth.get_logs.call_args_list
+        ]
+        assert ranges[0] == (4001, 4300)
+        assert ranges[-1][1] == 5000
+        assert all(to_block - from_block < 300 for from_block, to_block in ranges)
+
+    def test_index_shrinks_chunks(self, mock_web3, tmp_path):
+        """Test that the block range shrinks when the RPC rejects it"""
+        indexer = EventIndexer(tmp_path / "events.db", chunk_size=1000)
+        logs = logs_in_range([reward_claimed_log(4100, 1, 10**18)])
+
+        def get_logs(log_filter):
+            if log_filter["toBlock"] - log_filter["fromBlock"] >= 250:
+                raise ValueError("Block range too large")
+            return logs(log_filter)
+
+        self.setup_web3(mock_web3, 5000, [])
+        mock_web3.eth.get_logs.side_effect = get_logs
+
+        events = indexer.index([STAKING])
+
+        assert [event.block for event in events] == [4100]
+        assert indexer.chunk_size < 1000
+        assert indexer.get_cursors([STAKING]) == {STAKING: 5000}
+
+    def test_index_gives_up_on_single_block(self, mock_web3, tmp_path):
+        """Test that errors are raised once the range cannot shrink, without moving the cursor"""
+        indexer = EventIndexer(tmp_path / "events.db", chunk_size=4)
+        self.setup_web3(mock_web3, 5000, [])
+        mock_web3.eth.get_logs.side_effect = ValueError("RPC down")
+
+        with pytest.raises(ValueError):
+            indexer.index([STAKING])
+
+        assert indexer.get_cursors([STAKING]) == {}
+
+    def test_index_new_contract(self, mock_web3, tmp_path):
+        """Test that a contract without a cursor is indexed from the lookback, the others from their cursor"""
+        indexer = EventIndexer(tmp_path / "events.db", chunk_size=10000)
+        self.setup_web3(mock_web3, 5000, [])
+        indexer.index([STAKING])
+
+        logs = [
+            reward_claimed_log(4500, 1, 10**18, address=STAKING),
+            reward_claimed_log(4600, 2, 10**18, address=OTHER_STAKING),
+            reward_claimed_log(5050, 3, 10**18, address=STAKING),
+        ]
+        self.setup_web3(mock_web3, 5100, logs)
+
+        events = indexer.index([STAKING, OTHER_STAKING])
+
+        # The first log was already covered by the cursor of its contract
+        assert sorted(event.service_ids[0] for event in events) == [2, 3]
+        assert indexer.get_cursors([STAKING, OTHER_STAKING]) == {STAKING: 5100, OTHER_STAKING: 5100}
+
+    @patch('triton.indexer.invalidate_staking_resolutions')
+    @patch('triton.indexer.invalidate_slots')
+    @patch('triton.indexer.invalidate_staking_program')
+    def test_index_invalidates_caches(self, mock_invalidate_staking_program, mock_invalidate_slots, mock_invalidate_resolutions, mock_web3, tmp_path):
+        """Test that checkpoints and staking events drop the stale cached reads"""
+        indexer = EventIndexer(tmp_path / "events.db")
+        self.setup_web3(mock_web3, 5000, [checkpoint_log(4800, [1, 2])])
+
+        indexer.index([STAKING])
+
+        mock_invalidate_staking_program.assert_called_once_with(STAKING)
+        mock_invalidate_slots.assert_not_called()
+        mock_invalidate_resolutions.assert_not_called()
+
+        staked = make_log(
+            "ServiceStaked",
+            5050,
+            ["uint256", "uint256[]"],
+            [7, [1]],
+            indexed=[("uint256", 3), ("address", OWNER), ("address", OWNER)],
+        )
+        self.setup_web3(mock_web3, 5100, [staked])
+
+        indexer.index([STAKING])
+
+        mock_invalidate_slots.assert_called_once()
+        mock_invalidate_resolutions.assert_called_once_with([3])
+
+    def test_get_events(self, mock_web3, tmp_path):
+        """Test the queries on the indexed events"""
+        indexer = EventIndexer(tmp_path / "events.db")
+        self.setup_web3(mock_web3, 5000, [
+            checkpoint_log(4200, [1259, 1260]),
+            reward_claimed_log(4300, 1259, 10**18),
+            reward_claimed_log(4400, 1260, 2 * 10**18),
+            reward_claimed_log(4500, 1259, 3 * 10**18),
+        ])
+        indexer.index([STAKING])
+
+        assert [event.block for event in indexer.get_events(service_id=1259)] == [4500, 4300, 4200]
+        assert len(indexer.get_events(event="Checkpoint", address=STAKING.lower())) == 1
+        assert indexer.get_last_event("RewardClaimed", service_id=1259).args["reward"] == 3 * 10**18
+        assert indexer.get_last_event("ServiceStaked") is None
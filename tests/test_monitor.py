@@ -0,0 +1,100 @@
+"""Tests for triton.monitor module"""
+from unittest.mock import patch
+
+from triton.monitor import EpochMonitor, EpochProjection, get_sample_interval
+
+HOUR = 3600
+
+
+def make_status(requests, checkpoint_ts=0, epoch_length=24 * HOUR, required=40):
+    """Build the staking status fields used by the monitor"""
+    return {
+        "mech_requests_this_epoch": requests,
+        "required_mech_requests": required,
+        "checkpoint_ts": checkpoint_ts,
+        "epoch_end_ts": checkpoint_ts + epoch_length,
+    }
+
+
+class TestEpochMonitor:
+    """Tests for the EpochMonitor class"""
+
+    def test_first_sample_uses_epoch_average(self):
+        """Test the projection from the requests made since the checkpoint"""
+        projection = EpochMonitor().update("service", make_status(10), now=12 * HOUR)
+
+        assert projection.velocity * HOUR == 10 / 12
+        assert projection.projected == 20
+        assert projection.at_risk
+        assert abs(projection.required_velocity * HOUR - 30 / 12) < 1e-9
+
+    def test_on_track(self):
+        """Test that a service making requests fast enough is not at risk"""
+        projection = EpochMonitor().update("service", make_status(30), now=12 * HOUR)
+
+        assert projection.projected == 60
+        assert not projection.at_risk
+
+    def test_stalled_service(self):
+        """Test that the velocity drops when the service stops making requests"""
+        monitor = EpochMonitor()
+        first = monitor.update("service", make_status(30), now=12 * HOUR)
+        stalled = monitor.update("service", make_status(30), now=16 * HOUR)
+
+        assert not first.at_risk
+        # Four hours are two half-lives
+        assert abs(stalled.velocity - first.velocity / 4) < 1e-12
+        assert stalled.at_risk
+
+    def test_new_epoch_resets_velocity(self):
+        """Test that samples of the previous epoch are not used"""
+        monitor = EpochMonitor()
+        monitor.update("service", make_status(40), now=23 * HOUR)
+        projection = monitor.update(
+            "service", make_status(2, checkpoint_ts=24 * HOUR), now=26 * HOUR
+        )
+
+        assert projection.velocity * HOUR == 1
+        assert projection.projected == 24
+
+    def test_reached(self):
+        """Test that a service that made the required requests is never at risk"""
+        projection = EpochMonitor().update("service", make_status(40), now=HOUR)
+
+        assert projection.reached
+        assert not projection.at_risk
+        assert projection.required_velocity == 0
+
+
+@patch('triton.scheduler.POLL_MAX_INTERVAL', 4 * HOUR)
+@patch('triton.scheduler.POLL_MIN_INTERVAL', 300)
+@patch('triton.monitor.POLL_MIN_INTERVAL', 300)
+class TestGetSampleInterval:
+    """Tests for get_sample_interval function"""
+
+    @staticmethod
+    def projection(requests, seconds_left):
+        """Build a projection"""
+        return EpochProjection(
+            requests=requests,
+            required=40,
+            projected=requests,
+            velocity=0,
+            epoch_end=0,
+            seconds_left=seconds_left,
+        )
+
+    def test_denser_near_epoch_end(self):
+        """Test that samples get closer as the epoch end approaches"""
+        assert get_sample_interval(self.projection(10, 20 * HOUR)) == 4 * HOUR
+        assert get_sample_interval(self.projection(10, 2 * HOUR)) == HOUR / 2
+        assert get_sample_interval(self.projection(10, 60)) == 300
+
+    def test_reached_waits_for_next_epoch(self):
+        """Test that a service that reached its target is sampled again after the epoch end"""
+        assert get_sample_interval(self.projection(40, 20 * HOUR)) == 20 * HOUR
+
+    def test_epoch_over_or_unknown(self):
+        """Test the interval while waiting for the checkpoint or after a failure"""
+        assert get_sample_interval(self.projection(10, -HOUR)) == 300
+        assert get_sample_interval(None) == 300
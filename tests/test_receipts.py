@@ -0,0 +1,159 @@
+"""Tests for triton.receipts module"""
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from telegram.error import BadRequest, NetworkError
+
+from triton.cache import JsonRecord
+from triton.constants import OLAS_TOKEN_ADDRESS_GNOSIS
+from triton.receipts import (
+    TRANSFER_TOPIC,
+    ReceiptTracker,
+    TrackedMessage,
+    TrackedTransaction,
+    get_olas_moved,
+    resolve_message,
+)
+
+RECIPIENT = "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"
+OTHER = "0x238EB6993b90a978ec6AAD7530d6429c949C08DA"
+
+
+def transfer_log(to, value, token=OLAS_TOKEN_ADDRESS_GNOSIS):
+    """Build the log of an ERC20 transfer"""
+    return {
+        "address": token,
+        "topics": [TRANSFER_TOPIC, bytes(32), bytes(12) + bytes.fromhex(to[2:])],
+        "data": value.to_bytes(32, "big"),
+    }
+
+
+def make_message(*tx_hashes, sent_at=0.0):
+    """Build a message with one line per transaction"""
+    return TrackedMessage(
+        chat_id=1,
+        message_id=2,
+        lines=[f"Sent {tx_hash}." for tx_hash in tx_hashes],
+        separator="\n",
+        parse_mode=None,
+        transactions=[
+            TrackedTransaction(tx_hash, line, RECIPIENT, sent_at)
+            for line, tx_hash in enumerate(tx_hashes)
+        ],
+    )
+
+
+class TestGetOlasMoved:
+    """Tests for get_olas_moved function"""
+
+    def test_sums_the_transfers_to_the_recipient(self):
+        """Test only the OLAS transfers to the recipient are counted"""
+        receipt = {
+            "logs": [
+                transfer_log(RECIPIENT, 10**18),
+                transfer_log(OTHER, 5 * 10**18),
+                transfer_log(RECIPIENT, 7 * 10**18, token=OTHER),
+                transfer_log(RECIPIENT, 2 * 10**18),
+            ]
+        }
+
+        assert get_olas_moved(receipt, RECIPIENT.lower()) == 3 * 10**18
+
+
+class TestResolveMessage:
+    """Tests for resolve_message function"""
+
+    def test_reports_mined_reverted_and_dropped(self):
+        """Test every resolved transaction gets its status in its own line"""
+        message = make_message("0xa", "0xb", "0xc", "0xd", sent_at=1000)
+        receipts = {
+            "0xa": {"status": 1, "gasUsed": 52341, "logs": [transfer_log(RECIPIENT, 10**18)]},
+            "0xb": {"status": 0, "gasUsed": 30000, "logs": []},
+        }
+        message = message._replace(
+            transactions=message.transactions[:3]
+            + [message.transactions[3]._replace(sent_at=1250)]
+        )
+
+        resolved = resolve_message(message, receipts, now=1300, timeout=300)
+
+        assert resolved.lines == [
+            "Sent 0xa. Mined, 52,341 gas used, 1.00 OLAS moved.",
+            "Sent 0xb. Reverted, 30,000 gas used.",
+            "Sent 0xc. Not mined within 300 seconds, it may have been dropped.",
+            "Sent 0xd.",
+        ]
+        assert [tx.tx_hash for tx in resolved.transactions] == ["0xd"]
+
+
+class TestReceiptTracker:
+    """Tests for ReceiptTracker class"""
+
+    @patch('triton.receipts.get_receipts')
+    def test_poll_edits_the_message(self, mock_get_receipts, tmp_path):
+        """Test the receipts are read at once, and the message is edited until nothing is pending"""
+        tracker = ReceiptTracker(JsonRecord(tmp_path / "pending.json"), timeout=300)
+        tracker.track(make_message("0xa", "0xb", sent_at=1000))
+        mock_get_receipts.return_value = {"0xa": {"status": 1, "gasUsed": 21000, "logs": []}}
+        bot = Mock()
+        bot.edit_message_text = AsyncMock()
+
+        asyncio.run(tracker.poll(bot, now=1010))
+
+        mock_get_receipts.assert_called_once_with(["0xa", "0xb"])
+        bot.edit_message_text.assert_called_once_with(
+            chat_id=1,
+            message_id=2,
+            text="Sent 0xa. Mined, 21,000 gas used, 0.00 OLAS moved.\nSent 0xb.",
+            parse_mode=None,
+            disable_web_page_preview=True,
+        )
+        assert [tx.tx_hash for tx in tracker.pending()[0].transactions] == ["0xb"]
+
+        mock_get_receipts.return_value = {"0xb": {"status": 0, "gasUsed": 21000, "logs": []}}
+        asyncio.run(tracker.poll(bot, now=1020))
+
+        assert bot.edit_message_text.call_args.kwargs["text"].endswith(
+            "Sent 0xb. Reverted, 21,000 gas used."
+        )
+        assert not tracker.pending()
+
+    @patch('triton.receipts.get_receipts', return_value={})
+    def test_pending_survives_restart(self, mock_get_receipts, tmp_path):
+        """Test the pending transactions are read back from disk"""
+        ReceiptTracker(JsonRecord(tmp_path / "pending.json"), timeout=300).track(
+            make_message("0xa", sent_at=1000)
+        )
+        tracker = ReceiptTracker(JsonRecord(tmp_path / "pending.json"), timeout=300)
+        bot = Mock()
+        bot.edit_message_text = AsyncMock()
+
+        asyncio.run(tracker.poll(bot, now=1010))
+
+        assert tracker.pending() == [make_message("0xa", sent_at=1000)]
+        bot.edit_message_text.assert_not_called()
+
+    @patch('triton.receipts.get_receipts', return_value={})
+    def test_edit_failures(self, mock_get_receipts, tmp_path):
+        """Test a network failure is edited again later, and a deleted message is forgotten"""
+        tracker = ReceiptTracker(JsonRecord(tmp_path / "pending.json"), timeout=300)
+        tracker.track(make_message("0xa", sent_at=0))
+        bot = Mock()
+        bot.edit_message_text = AsyncMock(side_effect=NetworkError("timeout"))
+
+        asyncio.run(tracker.poll(bot, now=1000))
+        assert len(tracker.pending()) == 1
+
+        bot.edit_message_text.side_effect = BadRequest("Message to edit not found")
+        asyncio.run(tracker.poll(bot, now=1000))
+        assert not tracker.pending()
+
+    @patch('triton.receipts.get_receipts')
+    def test_nothing_to_track(self, mock_get_receipts, tmp_path):
+        """Test messages without transactions are not tracked, and nothing is read"""
+        tracker = ReceiptTracker(JsonRecord(tmp_path / "pending.json"), timeout=300)
+        tracker.track(make_message())
+
+        asyncio.run(tracker.poll(Mock()))
+
+        mock_get_receipts.assert_not_called()
@@ -0,0 +1,359 @@
+"""Tests for triton.rpc module"""
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import aiohttp
+import pytest
+import requests
+from web3 import AsyncWeb3, Web3
+
+from triton.rpc import (
+    DEFAULT_ENDPOINT,
+    HEALTH_WINDOW,
+    EndpointHealth,
+    PooledAsyncHTTPProvider,
+    PooledHTTPProvider,
+    BACKOFF_MAX,
+    RpcPool,
+    TokenBucket,
+    format_rpc_stats,
+    get_backoff_delay,
+    parse_endpoints,
+)
+
+
+def make_web3(*servers, hedge=True, retries=0):
+    """Build a web3 client on a pool of mock servers, without rate limit"""
+    pool = RpcPool(
+        [server.url for server in servers],
+        hedge=hedge,
+        limiter=TokenBucket(rate=0, burst=1),
+        retries=retries,
+    )
+    return pool, Web3(PooledHTTPProvider(pool))
+
+
+def run_concurrently(func, count):
+    """Call a function from several threads at once, returning the results"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        results[index] = func()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestParseEndpoints:
+    """Tests for parse_endpoints function"""
+
+    def test_parse_endpoints(self):
+        """Test a comma separated list is split, and an empty one falls back to the default"""
+        assert parse_endpoints("https://a.io, https://b.io,") == ["https://a.io", "https://b.io"]
+        assert parse_endpoints(None) == [DEFAULT_ENDPOINT]
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket class"""
+
+    @patch('triton.rpc.time.monotonic', return_value=1000)
+    @patch('triton.rpc.time.sleep')
+    def test_burst_then_steady_rate(self, mock_sleep, mock_monotonic):
+        """Test the burst goes through at once, and the next requests wait in line"""
+        bucket = TokenBucket(rate=10, burst=2)
+        depths = []
+        mock_sleep.side_effect = lambda delay: depths.append(bucket.queue_depth)
+
+        waits = [bucket.acquire() for _ in range(4)]
+
+        assert waits == pytest.approx([0, 0, 0.1, 0.2])
+        assert depths == [1, 1]
+        stats = bucket.stats()
+        assert (stats.requests, stats.waited, stats.queue_depth) == (4, 2, 0)
+        assert stats.total_wait == pytest.approx(0.3)
+        assert stats.max_wait == pytest.approx(0.2)
+
+        mock_monotonic.return_value = 1001
+        assert bucket.acquire() == 0
+
+    @patch('triton.rpc.time.sleep')
+    def test_unlimited(self, mock_sleep):
+        """Test a rate of 0 never waits, but still counts the requests"""
+        bucket = TokenBucket(rate=0, burst=1)
+
+        assert [bucket.acquire() for _ in range(5)] == [0] * 5
+        assert bucket.stats().requests == 5
+        mock_sleep.assert_not_called()
+
+    def test_acquire_async(self):
+        """Test the asyncio requests take their tokens from the same bucket"""
+        # The clock is not patched, the event loop runs on it too
+        bucket = TokenBucket(rate=20, burst=1)
+
+        async def run():
+            return [await bucket.acquire_async(), bucket.acquire(), await bucket.acquire_async()]
+
+        assert asyncio.run(run()) == pytest.approx([0, 0.05, 0.05], abs=0.02)
+        stats = bucket.stats()
+        assert (stats.requests, stats.waited, stats.queue_depth) == (3, 2, 0)
+
+
+class TestGetBackoffDelay:
+    """Tests for get_backoff_delay function"""
+
+    def test_jittered_exponential(self):
+        """Test the delay is random, within a bound that doubles on every attempt"""
+        delays = [get_backoff_delay(3) for _ in range(100)]
+
+        assert all(0 <= delay <= 4 for delay in delays)
+        assert len(set(delays)) > 1
+        assert get_backoff_delay(100) <= BACKOFF_MAX
+
+    def test_retry_after(self):
+        """Test the Retry-After header of the endpoint is waited for"""
+        error = requests.HTTPError(response=Mock(headers={"Retry-After": "2"}))
+
+        assert 2 <= get_backoff_delay(0, error) <= 2.5
+
+
+class TestEndpointHealth:
+    """Tests for EndpointHealth class"""
+
+    def test_errors_lower_the_score_until_they_expire(self):
+        """Test a failing endpoint ranks behind a slower one, until its errors leave the window"""
+        failing = EndpointHealth("https://failing.io")
+        slow = EndpointHealth("https://slow.io")
+        for _ in range(4):
+            failing.record(0.1, ok=True, now=1000)
+            slow.record(1.0, ok=True, now=1000)
+        failing.record(0.1, ok=False, now=1000)
+
+        assert failing.error_rate(now=1000) == 0.2
+        assert failing.score(now=1000) > slow.score(now=1000)
+        assert failing.score(now=1000 + HEALTH_WINDOW) == 0
+
+    def test_latency_quantile(self):
+        """Test the quantiles only count successful requests, once there are enough of them"""
+        health = EndpointHealth("https://rpc.io")
+        for latency in range(1, 11):
+            health.record(latency / 10, ok=True, now=1000)
+        health.record(5.0, ok=False, now=1000)
+
+        assert health.latency(0.95, now=1000) == 1.0
+        assert health.latency(0.5, now=1000) == 0.6
+        assert health.latency(0.95, min_samples=20, now=1000) is None
+
+
+class TestRpcPool:
+    """Tests for RpcPool class, against local JSON-RPC servers"""
+
+    def test_failover(self, mock_rpc_server):
+        """Test a read fails over to the next endpoint, which then serves the next reads"""
+        failing = mock_rpc_server(status=503)
+        healthy = mock_rpc_server()
+        _, web3 = make_web3(failing, healthy)
+
+        assert web3.eth.block_number == 16
+        assert web3.eth.block_number == 16
+
+        assert failing.methods == ["eth_blockNumber"]
+        assert healthy.methods == ["eth_blockNumber"] * 2
+
+    @patch('triton.rpc.time.sleep')
+    def test_throttled_read_backs_off(self, mock_sleep, mock_rpc_server):
+        """Test a read rejected with HTTP 429 is sent again after a jittered backoff"""
+        server = mock_rpc_server()
+        server.throttle = 2
+        pool, web3 = make_web3(server, retries=3)
+
+        assert web3.eth.block_number == 16
+
+        assert server.methods == ["eth_blockNumber"] * 3
+        assert mock_sleep.call_count == 2
+        assert pool.stats().throttled == 2
+
+    @patch('triton.rpc.time.sleep')
+    def test_throttled_too_often(self, mock_sleep, mock_rpc_server):
+        """Test the throttling error is raised once the retries are exhausted"""
+        server = mock_rpc_server()
+        server.throttle = 5
+        _, web3 = make_web3(server, retries=1)
+
+        with pytest.raises(requests.HTTPError, match="429"):
+            web3.eth.block_number  # pylint: disable=pointless-statement
+
+        assert len(server.methods) == 2
+        mock_sleep.assert_called_once()
+
+    def test_identical_reads_are_coalesced(self, mock_rpc_server):
+        """Test identical reads in flight share one request, and other block tags do not"""
+        server = mock_rpc_server(delay=0.2)
+        server.results["eth_getBalance"] = "0x1"
+        pool, web3 = make_web3(server)
+        address = "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"
+
+        assert run_concurrently(lambda: web3.eth.get_balance(address), 5) == [1] * 5
+        assert server.methods == ["eth_getBalance"]
+        assert pool.stats().coalesced == 4
+
+        run_concurrently(
+            lambda: [web3.eth.get_balance(address, block) for block in ("latest", 1)],
+            1,
+        )
+        assert server.methods == ["eth_getBalance"] * 3
+
+    def test_writes_are_not_coalesced(self, mock_rpc_server):
+        """Test the same transaction sent twice at once reaches the endpoint twice"""
+        server = mock_rpc_server(delay=0.1)
+        _, web3 = make_web3(server)
+
+        run_concurrently(lambda: web3.eth.send_raw_transaction("0x12"), 2)
+
+        assert server.methods == ["eth_sendRawTransaction"] * 2
+
+    def test_all_endpoints_failing(self, mock_rpc_server):
+        """Test the last error is raised once every endpoint failed"""
+        _, web3 = make_web3(mock_rpc_server(status=503), mock_rpc_server(status=429))
+
+        with pytest.raises(requests.HTTPError, match="429"):
+            web3.eth.block_number  # pylint: disable=pointless-statement
+
+    def test_routes_to_the_fastest(self, mock_rpc_server):
+        """Test reads go to the endpoint with the lowest latency once both were tried"""
+        slow = mock_rpc_server(delay=0.05)
+        fast = mock_rpc_server()
+        pool, web3 = make_web3(slow, fast)
+
+        for _ in range(5):
+            web3.eth.block_number  # pylint: disable=pointless-statement
+
+        assert len(slow.methods) == 1
+        assert len(fast.methods) == 4
+        assert pool.ranked()[0].url == fast.url
+
+    def test_hedged_read(self, mock_rpc_server):
+        """Test a read slower than the usual latency of its endpoint is answered by the next one"""
+        primary = mock_rpc_server()
+        backup = mock_rpc_server()
+        pool, web3 = make_web3(primary, backup)
+        primary_health, backup_health = pool.endpoints
+        for _ in range(20):
+            primary_health.record(0.01, ok=True)
+            backup_health.record(0.02, ok=True)
+        primary.delay = 1.0
+
+        started_at = time.monotonic()
+        assert web3.eth.block_number == 16
+
+        assert time.monotonic() - started_at < 0.5
+        assert primary.methods == backup.methods == ["eth_blockNumber"]
+
+    def test_no_hedge(self, mock_rpc_server):
+        """Test a slow read waits for its endpoint when hedging is disabled"""
+        primary = mock_rpc_server()
+        backup = mock_rpc_server()
+        pool, web3 = make_web3(primary, backup, hedge=False)
+        for _ in range(20):
+            pool.endpoints[0].record(0.01, ok=True)
+            pool.endpoints[1].record(0.02, ok=True)
+        primary.delay = 0.1
+
+        assert web3.eth.block_number == 16
+        assert not backup.methods
+
+    def test_writes_stay_pinned(self, mock_rpc_server):
+        """Test the requests of a signer go to its endpoint, until that endpoint fails"""
+        first = mock_rpc_server()
+        second = mock_rpc_server()
+        pool, web3 = make_web3(first, second)
+
+        with pool.pinned("0xsigner"):
+            web3.eth.send_raw_transaction("0x12")
+        # The other endpoint is now the healthiest one for reads
+        for _ in range(20):
+            pool.endpoints[0].record(0.5, ok=True)
+        with pool.pinned("0xsigner"):
+            web3.eth.block_number  # pylint: disable=pointless-statement
+            web3.eth.send_raw_transaction("0x12")
+
+        assert first.methods == ["eth_sendRawTransaction", "eth_blockNumber", "eth_sendRawTransaction"]
+        assert not second.methods
+
+        first.status = 503
+        with pool.pinned("0xsigner"), pytest.raises(requests.HTTPError):
+            web3.eth.send_raw_transaction("0x12")
+        for _ in range(40):
+            pool.endpoints[0].record(0.5, ok=False)
+        with pool.pinned("0xsigner"):
+            web3.eth.send_raw_transaction("0x12")
+
+        assert second.methods == ["eth_sendRawTransaction"]
+
+
+class TestPooledAsyncHTTPProvider:
+    """Tests for PooledAsyncHTTPProvider class"""
+
+    @patch('triton.rpc.get_backoff_delay', return_value=0)
+    def test_throttled_read_backs_off(self, mock_get_backoff_delay, mock_rpc_server):
+        """Test the asyncio reads go through the rate limiter, and back off while throttled"""
+        server = mock_rpc_server()
+        server.throttle = 2
+        pool = RpcPool([server.url], limiter=TokenBucket(rate=0, burst=1), retries=3)
+        web3 = AsyncWeb3(PooledAsyncHTTPProvider(pool))
+
+        assert asyncio.run(web3.eth.block_number) == 16
+
+        assert server.methods == ["eth_blockNumber"] * 3
+        assert mock_get_backoff_delay.call_count == 2
+        stats = pool.stats()
+        assert (stats.limiter.requests, stats.throttled) == (3, 2)
+
+    def test_throttled_too_often(self, mock_rpc_server):
+        """Test the throttling error is raised once the retries are exhausted"""
+        server = mock_rpc_server()
+        server.throttle = 5
+        pool = RpcPool([server.url], limiter=TokenBucket(rate=0, burst=1), retries=0)
+        web3 = AsyncWeb3(PooledAsyncHTTPProvider(pool))
+
+        with pytest.raises(aiohttp.ClientResponseError, match="429"):
+            asyncio.run(web3.eth.block_number)
+
+        assert len(server.methods) == 1
+
+
+class TestFormatRpcStats:
+    """Tests for format_rpc_stats function"""
+
+    @patch('triton.rpc.time.monotonic', return_value=1000)
+    @patch('triton.rpc.time.sleep')
+    def test_format(self, mock_sleep, mock_monotonic):
+        """Test the endpoints are shown by host only, with the waits of the rate limiter"""
+        pool = RpcPool(
+            ["https://rpc.example.io/v1/secret-key", "https://other.example.io"],
+            limiter=TokenBucket(rate=10, burst=1),
+        )
+        for _ in range(20):
+            pool.endpoints[0].record(0.1, ok=True)
+        pool.endpoints[0].record(0.2, ok=False)
+        pool.coalescer.coalesced = 3
+        for _ in range(3):
+            pool.limiter.acquire()
+
+        message = format_rpc_stats(pool)
+
+        assert "secret-key" not in message
+        assert message == """RPC endpoints:
+• rpc.example.io: 100 ms p95, 5% errors, 0 throttled
+• other.example.io: no recent reads, 0% errors, 0 throttled
+Rate limit: 10 requests/s
+• 3 requests, 2 waited 0.2 s on average, at most 0.2 s
+• 0 waiting now, at most 1
+• 3 coalesced"""
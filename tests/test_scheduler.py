@@ -0,0 +1,122 @@
+"""Tests for triton.scheduler module"""
+from unittest.mock import patch
+
+from triton.scheduler import DAY, PollBudget, PollScheduler, get_poll_interval
+
+
+@patch('triton.scheduler.POLL_MAX_INTERVAL', 4 * 3600)
+@patch('triton.scheduler.POLL_MIN_INTERVAL', 300)
+@patch('triton.scheduler.POLL_INTERVAL', 3600)
+class TestGetPollInterval:
+    """Tests for get_poll_interval function"""
+
+    def test_idle_service(self):
+        """Test that a service without burn or deadline is polled at the longest interval"""
+        assert get_poll_interval() == 4 * 3600
+
+    def test_balance_running_low(self):
+        """Test that the interval shrinks with the time left to the threshold"""
+        assert get_poll_interval(days_to_threshold=0.5) == 0.5 * DAY / 4
+        assert get_poll_interval(days_to_threshold=0.001) == 300
+        assert get_poll_interval(days_to_threshold=30) == 4 * 3600
+
+    def test_below_threshold(self):
+        """Test that balances under their threshold keep the default interval"""
+        assert get_poll_interval(below_threshold=True, days_to_threshold=0) == 3600
+
+    def test_epoch_end(self):
+        """Test that the interval shrinks near the end of an epoch the service is behind in"""
+        assert get_poll_interval(seconds_to_epoch_end=3600) == 900
+        assert get_poll_interval(seconds_to_epoch_end=-10) == 4 * 3600
+
+
+class TestPollScheduler:
+    """Tests for the PollScheduler class"""
+
+    def test_pop_due_in_order(self):
+        """Test that only the due services are popped, soonest first"""
+        scheduler = PollScheduler(PollBudget(100), cost=1)
+        scheduler.reschedule("slow", 600, now=0)
+        scheduler.reschedule("fast", 60, now=0)
+        scheduler.reschedule("later", 6000, now=0)
+
+        assert scheduler.pop_due(10) == []
+        assert scheduler.pop_due(1000) == ["fast", "slow"]
+        assert scheduler.pop_due(1000) == []
+
+    def test_reschedule_replaces_previous_check(self):
+        """Test that a service is only due at its latest schedule"""
+        scheduler = PollScheduler(PollBudget(100), cost=1)
+        scheduler.reschedule("service", 60, now=0)
+        scheduler.reschedule("service", 600, now=0)
+
+        assert scheduler.pop_due(100) == []
+        assert scheduler.pop_due(600) == ["service"]
+
+    def test_new_services_are_due(self):
+        """Test that added services are due at the next tick"""
+        scheduler = PollScheduler(PollBudget(100), cost=1)
+        scheduler.add("service")
+
+        assert scheduler.pop_due(1_700_000_000) == ["service"]
+
+    def test_removed_services_are_not_due(self):
+        """Test that removed services are skipped"""
+        scheduler = PollScheduler(PollBudget(100), cost=1)
+        scheduler.add("service")
+        scheduler.remove("service")
+
+        assert scheduler.pop_due(100) == []
+        assert not scheduler.schedules()
+
+    def test_budget(self):
+        """Test that the services beyond the RPC budget wait for it to refill"""
+        scheduler = PollScheduler(PollBudget(2), cost=1)
+        for name in ("a", "b", "c", "d"):
+            scheduler.add(name)
+
+        assert scheduler.pop_due(0) == ["a", "b"]
+        assert scheduler.pop_due(1) == []
+        assert scheduler.pop_due(30) == ["c"]
+        assert scheduler.pop_due(60) == ["d"]
+
+    def test_shared_budget(self):
+        """Test that schedulers sharing a budget stay within it together"""
+        budget = PollBudget(10)
+        balances = PollScheduler(budget, cost=1)
+        epochs = PollScheduler(budget, cost=3)
+        for index in range(20):
+            balances.add(f"balance-{index}")
+            epochs.add(f"epoch-{index}")
+
+        spent = 0
+        for now in range(0, 600, 60):
+            spent += len(balances.pop_due(now)) * 1 + len(epochs.pop_due(now)) * 3
+            # One minute of budget, on top of the initial burst
+            assert spent <= 10 + 10 * now / 60
+            for index in range(20):
+                balances.reschedule(f"balance-{index}", 0, now)
+                epochs.reschedule(f"epoch-{index}", 0, now)
+        assert spent > 0
+
+    def test_schedules(self):
+        """Test the schedule listing"""
+        scheduler = PollScheduler(PollBudget(100), cost=1)
+        scheduler.reschedule("slow", 600, now=0)
+        scheduler.reschedule("fast", 60, now=0)
+
+        assert [(s.name, s.next_check, s.interval) for s in scheduler.schedules()] == [
+            ("fast", 60, 60),
+            ("slow", 600, 600),
+        ]
+
+    def test_epoch_deadline(self):
+        """Test setting and clearing the epoch deadline of a service"""
+        scheduler = PollScheduler()
+        scheduler.set_epoch_deadline("service", 1000)
+
+        assert scheduler.get_epoch_deadline("service") == 1000
+
+        scheduler.set_epoch_deadline("service", None)
+
+        assert scheduler.get_epoch_deadline("service") is None
@@ -1,11 +1,39 @@
 """Tests for triton.service module"""
+import asyncio
 import logging
 import os
 import pytest
-from unittest.mock import patch, MagicMock
+from eth_account import Account
+from unittest.mock import AsyncMock, patch, MagicMock
 
 from operate.operate_types import Chain
-from triton.service import TritonService
+from web3.exceptions import ContractLogicError
+from triton.constants import STAKING_RESOLUTION_TTL
+from triton.service import (
+    OperatorContext,
+    TritonService,
+    check_balances,
+    check_balances_async,
+    discover_operators,
+    flatten_services,
+    get_current_staking_program,
+    invalidate_staking_resolutions,
+    load_operator_services,
+    withdraw_all,
+)
+
+
+def mock_activity_checker(mock_load_contract, **mechs):
+    """Answer the given activity checker getters with their mech, and revert the others"""
+    def get_function_by_name(name):
+        function = MagicMock()
+        if name in mechs:
+            function.return_value.call.return_value = mechs[name]
+        else:
+            function.return_value.call.side_effect = ContractLogicError("execution reverted")
+        return function
+
+    mock_load_contract.return_value.get_function_by_name.side_effect = get_function_by_name
 
 
 class TestTritonService:
@@ -41,11 +69,33 @@ class TestTritonService:
         mock_chain_config.chain_data = mock_chain_data
         
         self.mock_service.chain_configs = {"gnosis": mock_chain_config}
+
+        # Staking program parameters read from the chain
+        self.get_staking_program_patcher = patch('triton.service.get_staking_program')
+        self.mock_get_staking_program = self.get_staking_program_patcher.start()
+        self.mock_get_staking_program.return_value.activity_checker = "0xactivity123"
+        self.get_mech_request_count_method_patcher = patch(
+            'triton.service.get_mech_request_count_method', return_value="mapRequestCounts"
+        )
+        self.mock_get_mech_request_count_method = self.get_mech_request_count_method_patcher.start()
+        self.staking_moves_patcher = patch.dict('triton.service._staking_moves', clear=True)
+        self.staking_moves_patcher.start()
+        self.get_current_staking_program_patcher = patch('triton.service.get_current_staking_program')
+        self.mock_get_current_staking_program = self.get_current_staking_program_patcher.start()
+
+        self.operator = OperatorContext(self.mock_operate)
+
+    def teardown_method(self):
+        """Teardown test fixtures"""
+        self.get_staking_program_patcher.stop()
+        self.get_mech_request_count_method_patcher.stop()
+        self.staking_moves_patcher.stop()
+        self.get_current_staking_program_patcher.stop()
     
     @patch.dict(os.environ, {"WITHDRAWAL_ADDRESS": "0x1111111111111111111111111111111111111111"})
     def test_init_with_withdrawal_address(self):
         """Test TritonService initialization with withdrawal address"""
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         assert service.service_manager == self.mock_service_manager
         assert service.master_wallet == self.mock_master_wallet
@@ -53,22 +103,36 @@ class TestTritonService:
         assert service.withdrawal_address == "0x1111111111111111111111111111111111111111"
         assert isinstance(service.logger, logging.Logger)
     
+    def test_init_reuses_loaded_objects(self):
+        """Test the service given by the discovery is not loaded again, and the operator objects are shared"""
+        service = TritonService(self.operator, "test_config_id", service=self.mock_service)
+        other_service = MagicMock()
+        other_service.name = "other_service"
+        other = TritonService(self.operator, "other_config_id", service=other_service)
+
+        assert service.service is self.mock_service
+        assert service.service_manager is other.service_manager is self.mock_service_manager
+        assert service.master_wallet is other.master_wallet is self.mock_master_wallet
+        self.mock_operate.service_manager.assert_called_once()
+        self.mock_wallet_manager.load.assert_called_once()
+        self.mock_service_manager.load.assert_not_called()
+
     @patch.dict(os.environ, {}, clear=True)
     def test_init_without_withdrawal_address(self):
         """Test TritonService initialization without withdrawal address"""
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         assert service.withdrawal_address is None
     
     def test_service_id_property(self):
         """Test service_id property"""
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         assert service.service_id == 123
     
     def test_agent_address_property(self):
         """Test agent_address property"""
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         assert service.agent_address == "0xabcdef1234567890abcdef1234567890abcdef12"
     
@@ -77,12 +141,12 @@ class TestTritonService:
         self.mock_service.chain_configs["gnosis"].chain_data.instances = []
         
         with pytest.raises(ValueError, match="No agent instances found"):
-            service = TritonService(self.mock_operate, "test_config_id")
+            service = TritonService(self.operator, "test_config_id")
             service.agent_address
     
     def test_service_safe_property(self):
         """Test service_safe property"""
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         assert service.service_safe == "0x1234567890abcdef1234567890abcdef12345678"
     
@@ -90,9 +154,9 @@ class TestTritonService:
     def test_staking_contract_address_property(self, mock_get_staking_contract):
         """Test staking_contract_address property"""
         mock_get_staking_contract.return_value = "0x2222222222222222222222222222222222222222"
-        self.mock_service_manager._get_current_staking_program.return_value = "program_1"
+        self.mock_get_current_staking_program.return_value = "program_1"
         
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         assert service.staking_contract_address == "0x2222222222222222222222222222222222222222"
         mock_get_staking_contract.assert_called_once_with(
@@ -102,17 +166,17 @@ class TestTritonService:
     
     def test_staking_contract_address_property_key_error(self):
         """Test staking_contract_address property with KeyError"""
-        self.mock_service_manager._get_current_staking_program.side_effect = KeyError("Not found")
+        self.mock_get_current_staking_program.side_effect = KeyError("Not found")
         
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         with pytest.raises(ValueError, match="Failed to get staking contract address"):
             service.staking_contract_address
     
     @patch('triton.service.get_staking_status')
     @patch('triton.service.get_staking_contract')
-    @patch('triton.service.RequesterActivityCheckerContract')
-    def test_get_staking_status_success_with_mech_marketplace(self, mock_requester_contract, mock_get_staking_contract, mock_get_staking_status):
+    @patch('triton.service.load_contract')
+    def test_get_staking_status_success_with_mech_marketplace(self, mock_load_contract, mock_get_staking_contract, mock_get_staking_status):
         """Test get_staking_status method success when mechMarketplace call works"""
         mock_get_staking_contract.return_value = "0x2222222222222222222222222222222222222222"
         mock_get_staking_status.return_value = {
@@ -121,38 +185,27 @@ class TestTritonService:
             "required_mech_requests": 10,
             "epoch_end": "2023-01-01 12:00:00 UTC"
         }
-        self.mock_service_manager._get_current_staking_program.return_value = "program_1"
+        self.mock_get_current_staking_program.return_value = "program_1"
+        mock_activity_checker(mock_load_contract, mechMarketplace="0xmech123")
         
-        # Mock the safe tx builder and staking params
-        mock_sftxb = MagicMock()
-        mock_sftxb.get_staking_params.return_value = {"activity_checker": "0xactivity123"}
-        self.mock_service_manager.get_eth_safe_tx_builder.return_value = mock_sftxb
-        
-        # Mock RequesterActivityCheckerContract to succeed
-        mock_contract_instance = MagicMock()
-        mock_contract_instance.functions.mechMarketplace.return_value.call.return_value = "0xmech123"
-        mock_requester_instance = MagicMock()
-        mock_requester_instance.get_instance.return_value = mock_contract_instance
-        mock_requester_contract.from_dir.return_value = mock_requester_instance
-        
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         result = service.get_staking_status()
         
         assert result["accrued_rewards"] == "1.00 OLAS"
         assert result["mech_requests_this_epoch"] == 5
+        mock_load_contract.assert_called_once_with("0xactivity123", "requester_activity_checker")
         mock_get_staking_status.assert_called_once_with(
             mech_contract_address="0xmech123",
             staking_token_address="0x2222222222222222222222222222222222222222",
-            activity_checker_address="0xactivity123",
             service_id=123,
-            safe_address="0x1234567890abcdef1234567890abcdef12345678"
+            safe_address="0x1234567890abcdef1234567890abcdef12345678",
+            mech_request_count_method="mapRequestCounts",
         )
     
     @patch('triton.service.get_staking_status')
     @patch('triton.service.get_staking_contract')
-    @patch('triton.service.RequesterActivityCheckerContract')
-    @patch('triton.service.MechActivityContract')
-    def test_get_staking_status_success_with_agent_mech(self, mock_mech_contract, mock_requester_contract, mock_get_staking_contract, mock_get_staking_status):
+    @patch('triton.service.load_contract')
+    def test_get_staking_status_success_with_agent_mech(self, mock_load_contract, mock_get_staking_contract, mock_get_staking_status):
         """Test get_staking_status method success when mechMarketplace fails but agentMech works"""
         mock_get_staking_contract.return_value = "0x2222222222222222222222222222222222222222"
         mock_get_staking_status.return_value = {
@@ -161,24 +214,10 @@ class TestTritonService:
             "required_mech_requests": 10,
             "epoch_end": "2023-01-01 12:00:00 UTC"
         }
-        self.mock_service_manager._get_current_staking_program.return_value = "program_1"
-        
-        # Mock the safe tx builder and staking params
-        mock_sftxb = MagicMock()
-        mock_sftxb.get_staking_params.return_value = {"activity_checker": "0xactivity123"}
-        self.mock_service_manager.get_eth_safe_tx_builder.return_value = mock_sftxb
-        
-        # Mock RequesterActivityCheckerContract to fail
-        mock_requester_contract.from_dir.side_effect = Exception("RequesterActivityChecker failed")
+        self.mock_get_current_staking_program.return_value = "program_1"
+        mock_activity_checker(mock_load_contract, agentMech="0xagentmech456")
         
-        # Mock MechActivityContract to succeed
-        mock_mech_instance = MagicMock()
-        mock_mech_instance.functions.agentMech.return_value.call.return_value = "0xagentmech456"
-        mock_mech_contract_instance = MagicMock()
-        mock_mech_contract_instance.get_instance.return_value = mock_mech_instance
-        mock_mech_contract.from_dir.return_value = mock_mech_contract_instance
-        
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         result = service.get_staking_status()
         
         assert result["accrued_rewards"] == "2.00 OLAS"
@@ -186,16 +225,15 @@ class TestTritonService:
         mock_get_staking_status.assert_called_once_with(
             mech_contract_address="0xagentmech456",
             staking_token_address="0x2222222222222222222222222222222222222222",
-            activity_checker_address="0xactivity123",
             service_id=123,
-            safe_address="0x1234567890abcdef1234567890abcdef12345678"
+            safe_address="0x1234567890abcdef1234567890abcdef12345678",
+            mech_request_count_method="mapRequestCounts",
         )
     
     @patch('triton.service.get_staking_status')
     @patch('triton.service.get_staking_contract')
-    @patch('triton.service.RequesterActivityCheckerContract')
-    @patch('triton.service.MechActivityContract')
-    def test_get_staking_status_success_with_fallback_mech(self, mock_mech_contract, mock_requester_contract, mock_get_staking_contract, mock_get_staking_status):
+    @patch('triton.service.load_contract')
+    def test_get_staking_status_success_with_fallback_mech(self, mock_load_contract, mock_get_staking_contract, mock_get_staking_status):
         """Test get_staking_status method success when both contract calls fail and fallback is used"""
         mock_get_staking_contract.return_value = "0x2222222222222222222222222222222222222222"
         mock_get_staking_status.return_value = {
@@ -204,18 +242,10 @@ class TestTritonService:
             "required_mech_requests": 10,
             "epoch_end": "2023-01-01 12:00:00 UTC"
         }
-        self.mock_service_manager._get_current_staking_program.return_value = "program_1"
-        
-        # Mock the safe tx builder and staking params
-        mock_sftxb = MagicMock()
-        mock_sftxb.get_staking_params.return_value = {"activity_checker": "0xactivity123"}
-        self.mock_service_manager.get_eth_safe_tx_builder.return_value = mock_sftxb
+        self.mock_get_current_staking_program.return_value = "program_1"
+        mock_activity_checker(mock_load_contract)
         
-        # Mock both contracts to fail
-        mock_requester_contract.from_dir.side_effect = Exception("RequesterActivityChecker failed")
-        mock_mech_contract.from_dir.side_effect = Exception("MechActivity failed")
-        
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         result = service.get_staking_status()
         
         assert result["accrued_rewards"] == "0.50 OLAS"
@@ -223,162 +253,369 @@ class TestTritonService:
         mock_get_staking_status.assert_called_once_with(
             mech_contract_address="0x77af31De935740567Cf4fF1986D04B2c964A786a",  # Hardcoded fallback
             staking_token_address="0x2222222222222222222222222222222222222222",
-            activity_checker_address="0xactivity123",
             service_id=123,
-            safe_address="0x1234567890abcdef1234567890abcdef12345678"
+            safe_address="0x1234567890abcdef1234567890abcdef12345678",
+            mech_request_count_method="mapRequestCounts",
         )
     
-    @patch('triton.service.get_olas_balance')
-    @patch('triton.service.get_native_balance')
-    def test_check_balance_success(self, mock_get_native_balance, mock_get_olas_balance):
-        """Test check_balance method success"""
-        mock_get_native_balance.side_effect = [1.0, 2.0, 3.0, 4.0]  # agent, service, master eoa, master safe
-        mock_get_olas_balance.return_value = 5000000000000000000  # 5 OLAS in wei
-        
-        # Mock master wallet properties
-        self.mock_master_wallet.crypto.address = "0x3333333333333333333333333333333333333333"
-        self.mock_master_wallet.safes = {Chain.GNOSIS: "0x4444444444444444444444444444444444444444"}
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        result = service.check_balance()
-        
-        assert result["agent_eoa_native_balance"] == 1.0
-        assert result["service_safe_native_balance"] == 2.0
-        assert result["master_eoa_native_balance"] == 3.0
-        assert result["master_safe_native_balance"] == 4.0
-        assert result["service_safe_olas_balance"] == 5.0  # 5 OLAS
-        assert mock_get_native_balance.call_count == 4
-    
-    def test_check_balance_no_instances(self):
-        """Test check_balance method when no instances exist"""
+    @patch('triton.service.get_staking_contract')
+    @patch('triton.service.load_contract')
+    def test_resolve_staking_memoized(self, mock_load_contract, mock_get_staking_contract):
+        """Test that the resolution is reused until the service is staked or unstaked"""
+        mock_get_staking_contract.side_effect = lambda chain, staking_program_id: {
+            "program_1": "0x2222222222222222222222222222222222222222",
+            "program_2": "0x5555555555555555555555555555555555555555",
+        }[staking_program_id]
+        self.mock_get_current_staking_program.return_value = "program_1"
+        mock_activity_checker(mock_load_contract, mechMarketplace="0xmech123")
+
+        service = TritonService(self.operator, "test_config_id")
+        first = service.resolve_staking()
+        second = service.resolve_staking()
+
+        assert first is second
+        self.mock_get_current_staking_program.assert_called_once()
+        assert first.mech == "0xmech123"
+        mock_load_contract.assert_called_once()
+
+        self.mock_get_current_staking_program.return_value = "program_2"
+        assert service.resolve_staking() is first
+        invalidate_staking_resolutions([123])
+        third = service.resolve_staking()
+
+        assert third.staking_contract == "0x5555555555555555555555555555555555555555"
+        assert mock_load_contract.call_count == 2
+
+    @patch('triton.service.get_staking_contract', return_value="0x2222222222222222222222222222222222222222")
+    @patch('triton.service.load_contract')
+    def test_resolve_staking_checked_again_when_stale(self, mock_load_contract, mock_get_staking_contract):
+        """Test that a stale resolution is kept if the staking program did not change"""
+        self.mock_get_current_staking_program.return_value = "program_1"
+        mock_activity_checker(mock_load_contract, mechMarketplace="0xmech123")
+
+        service = TritonService(self.operator, "test_config_id")
+        with patch('triton.service.time.monotonic', return_value=1000.0):
+            first = service.resolve_staking()
+        with patch('triton.service.time.monotonic', return_value=1000.0 + STAKING_RESOLUTION_TTL):
+            second = service.resolve_staking()
+            third = service.resolve_staking()
+
+        assert first is second is third
+        assert self.mock_get_current_staking_program.call_count == 2
+        mock_load_contract.assert_called_once()
+
+    @patch('triton.service.get_staking_contract', return_value="0x2222222222222222222222222222222222222222")
+    @patch('triton.service.load_contract')
+    def test_resolve_staking_fallback_not_memoized(self, mock_load_contract, mock_get_staking_contract):
+        """Test that the hard-coded fallback mech is resolved again on the next call"""
+        self.mock_get_current_staking_program.return_value = "program_1"
+        mock_activity_checker(mock_load_contract)
+
+        service = TritonService(self.operator, "test_config_id")
+        service.resolve_staking()
+        service.resolve_staking()
+
+        # Both getters are tried on every call
+        assert mock_load_contract.call_count == 4
+
+    def test_balance_addresses_no_instances(self):
+        """Test balance_addresses method when no instances exist"""
         self.mock_service.chain_configs["gnosis"].chain_data.instances = []
         
-        service = TritonService(self.mock_operate, "test_config_id")
+        service = TritonService(self.operator, "test_config_id")
         
         with pytest.raises(ValueError, match="No agent instances found"):
-            service.check_balance()
+            service.balance_addresses()
     
-    def test_claim_rewards_success(self):
-        """Test claim_rewards method success"""
-        mock_tx_hash = MagicMock()
-        mock_tx_hash.hex.return_value = "0xabcdef1234567890"
-        self.mock_service_manager.claim_on_chain_from_safe.return_value = mock_tx_hash
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        result = service.claim_rewards()
-        
-        assert result == "0xabcdef1234567890"
-        self.mock_service_manager.claim_on_chain_from_safe.assert_called_once_with(
-            service_config_id="test_config_id",
-            chain="gnosis"
+    def test_balance_addresses_without_decrypting(self):
+        """Test that the master EOA address is read without decrypting the master key"""
+        type(self.mock_master_wallet).crypto = property(
+            lambda _: pytest.fail("The master key was decrypted")
         )
-    
-    @patch('triton.service.traceback')
-    def test_claim_rewards_exception(self, mock_traceback):
-        """Test claim_rewards method with exception"""
-        self.mock_service_manager.claim_on_chain_from_safe.side_effect = Exception("Test error")
-        mock_traceback.format_exc.return_value = "Traceback info"
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        service.logger.error = MagicMock()
-        result = service.claim_rewards()
-        
-        assert result is None
-        service.logger.error.assert_called_once()
-    
-    @patch.dict(os.environ, {}, clear=True)
-    def test_withdraw_rewards_no_withdrawal_address(self):
-        """Test withdraw_rewards method without withdrawal address"""
-        service = TritonService(self.mock_operate, "test_config_id")
-        
-        result = service.withdraw_rewards()
-        
-        assert result == (None, 0)
-    
-    @patch.dict(os.environ, {"WITHDRAWAL_ADDRESS": "0x1111111111111111111111111111111111111111"})
-    @patch('triton.service.get_olas_balance')
-    def test_withdraw_rewards_no_balance(self, mock_get_olas_balance):
-        """Test withdraw_rewards method with no OLAS balance"""
-        mock_get_olas_balance.return_value = 0
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        result = service.withdraw_rewards()
-        
-        assert result == (None, 0)
-    
-    @patch.dict(os.environ, {"WITHDRAWAL_ADDRESS": "0x1111111111111111111111111111111111111111"})
-    @patch('triton.service.get_olas_balance')
-    @patch('triton.service.traceback')
-    def test_withdraw_rewards_get_balance_exception(self, mock_traceback, mock_get_olas_balance):
-        """Test withdraw_rewards method with exception getting balance"""
-        mock_get_olas_balance.side_effect = Exception("Test error")
-        mock_traceback.format_exc.return_value = "Traceback info"
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        service.logger.error = MagicMock()
-        result = service.withdraw_rewards()
-        
-        assert result == (None, 0)
-        service.logger.error.assert_called_once()
-    
-    @patch.dict(os.environ, {"WITHDRAWAL_ADDRESS": "0x1111111111111111111111111111111111111111"})
-    @patch('triton.service.transfer_erc20_from_safe')
-    @patch('triton.service.EthereumCrypto')
-    @patch('triton.service.tempfile')
-    @patch('triton.service.get_olas_balance')
-    @patch('triton.service.OLAS', {Chain.GNOSIS: "0x5555555555555555555555555555555555555555"})
-    def test_withdraw_rewards_success(self, mock_get_olas_balance, mock_tempfile, 
-                                     mock_ethereum_crypto, mock_transfer_erc20):
-        """Test withdraw_rewards method success"""
-        mock_get_olas_balance.return_value = 1000000000000000000  # 1 OLAS in wei
-        mock_transfer_erc20.return_value = "0xabcdef1234567890"
-        
-        # Mock tempfile
-        mock_temp_file = MagicMock()
-        mock_temp_file.name = "temp_key_file"
-        mock_tempfile.NamedTemporaryFile.return_value.__enter__.return_value = mock_temp_file
-        
-        # Mock crypto
-        mock_crypto_instance = MagicMock()
-        mock_ethereum_crypto.return_value = mock_crypto_instance
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        result = service.withdraw_rewards()
-        
-        assert result == ("0xabcdef1234567890", 1.0)
-        mock_transfer_erc20.assert_called_once()
-        mock_temp_file.write.assert_called_once_with(b"test_private_key")
-        mock_temp_file.flush.assert_called_once()
-    
+        self.mock_master_wallet.address = "0x3333333333333333333333333333333333333333"
+        self.mock_master_wallet.safes = {Chain.GNOSIS: "0x4444444444444444444444444444444444444444"}
+
+        service = TritonService(self.operator, "test_config_id")
+
+        assert service.balance_addresses()["master_eoa"] == "0x3333333333333333333333333333333333333333"
+
+    @patch('triton.service.get_balances')
+    def test_check_balances_batched(self, mock_get_balances):
+        """Test that several services are checked with a single batched read"""
+        self.mock_master_wallet.address = "0x3333333333333333333333333333333333333333"
+        self.mock_master_wallet.safes = {Chain.GNOSIS: "0x4444444444444444444444444444444444444444"}
+        mock_get_balances.return_value = (
+            {
+                "0xabcdef1234567890abcdef1234567890abcdef12": 1.0,
+                "0x1234567890abcdef1234567890abcdef12345678": 2.0,
+                "0x3333333333333333333333333333333333333333": 3.0,
+                "0x4444444444444444444444444444444444444444": 4.0,
+            },
+            {"0x1234567890abcdef1234567890abcdef12345678": 5000000000000000000},
+        )
+        service = TritonService(self.operator, "test_config_id")
+
+        result = check_balances([service, service])
+
+        mock_get_balances.assert_called_once()
+        assert result == [{
+            "agent_eoa_native_balance": 1.0,
+            "service_safe_native_balance": 2.0,
+            "master_eoa_native_balance": 3.0,
+            "master_safe_native_balance": 4.0,
+            "service_safe_olas_balance": 5.0,
+        }] * 2
+
+    @patch('triton.service.get_balances', return_value=({}, {}))
+    def test_check_balances_invalid_service(self, mock_get_balances):
+        """Test that a misconfigured service is returned as an error"""
+        self.mock_service.chain_configs["gnosis"].chain_data.instances = []
+        service = TritonService(self.operator, "test_config_id")
+
+        result = check_balances([service])
+
+        assert isinstance(result[0], ValueError)
+        native_addresses, olas_addresses = mock_get_balances.call_args[0]
+        assert not list(native_addresses)
+        assert not list(olas_addresses)
+
+    @patch('triton.service.async_chain')
+    def test_check_balances_async(self, mock_async_chain):
+        """Test the batched balance check through the async provider"""
+        self.mock_master_wallet.address = "0x3333333333333333333333333333333333333333"
+        self.mock_master_wallet.safes = {Chain.GNOSIS: "0x4444444444444444444444444444444444444444"}
+        mock_async_chain.get_balances = AsyncMock(return_value=(
+            {
+                "0xabcdef1234567890abcdef1234567890abcdef12": 1.0,
+                "0x1234567890abcdef1234567890abcdef12345678": 2.0,
+                "0x3333333333333333333333333333333333333333": 3.0,
+                "0x4444444444444444444444444444444444444444": 4.0,
+            },
+            {"0x1234567890abcdef1234567890abcdef12345678": 0},
+        ))
+        service = TritonService(self.operator, "test_config_id")
+
+        result = asyncio.run(check_balances_async([service]))
+
+        mock_async_chain.get_balances.assert_awaited_once()
+        assert result[0]["master_safe_native_balance"] == 4.0
+        assert result[0]["service_safe_olas_balance"] == 0
+
+    def test_get_claim_request(self):
+        """Test the claim is executed by the master Safe and signed by the master EOA"""
+        self.mock_master_wallet.safes = {Chain.GNOSIS: "0xmastersafe"}
+        service = TritonService(self.operator, "test_config_id")
+
+        with patch.object(service, 'resolve_staking') as mock_resolve_staking:
+            mock_resolve_staking.return_value.staking_contract = "0xstaking"
+            request = service.get_claim_request()
+
+        assert request.service_id == service.service_id
+        assert request.staking_contract == "0xstaking"
+        assert request.safe == "0xmastersafe"
+        assert request.crypto is self.mock_master_wallet.crypto
+
+    def test_agent_crypto_from_key(self):
+        """Test the agent signer is built from the service key, without a key file"""
+        self.mock_service.keys[0].private_key = "0x" + "11" * 32
+
+        service = TritonService(self.operator, "test_config_id")
+
+        assert service.agent_crypto.address == Account.from_key("0x" + "11" * 32).address
+        assert service.agent_crypto is service.agent_crypto
+
     @patch.dict(os.environ, {"WITHDRAWAL_ADDRESS": "0x1111111111111111111111111111111111111111"})
-    @patch('triton.service.transfer_erc20_from_safe')
-    @patch('triton.service.EthereumCrypto')
-    @patch('triton.service.tempfile')
-    @patch('triton.service.get_olas_balance')
+    @patch('triton.service.KeyCrypto')
     @patch('triton.service.OLAS', {Chain.GNOSIS: "0x5555555555555555555555555555555555555555"})
-    @patch('triton.service.traceback')
-    def test_withdraw_rewards_transfer_exception(self, mock_traceback, mock_get_olas_balance, 
-                                               mock_tempfile, mock_ethereum_crypto, mock_transfer_erc20):
-        """Test withdraw_rewards method with transfer exception"""
-        mock_get_olas_balance.return_value = 1000000000000000000  # 1 OLAS in wei
-        mock_transfer_erc20.side_effect = Exception("Transfer failed")
-        mock_traceback.format_exc.return_value = "Traceback info"
-        
-        # Mock tempfile
-        mock_temp_file = MagicMock()
-        mock_temp_file.name = "temp_key_file"
-        mock_tempfile.NamedTemporaryFile.return_value.__enter__.return_value = mock_temp_file
-        
-        # Mock crypto
-        mock_crypto_instance = MagicMock()
-        mock_ethereum_crypto.return_value = mock_crypto_instance
-        
-        service = TritonService(self.mock_operate, "test_config_id")
-        service.logger.error = MagicMock()
-        result = service.withdraw_rewards()
-        
-        assert result == (None, 0)
-        service.logger.error.assert_called_once()
+    def test_get_withdrawal_transaction(self, mock_key_crypto):
+        """Test the OLAS transfer is made by the service Safe"""
+        service = TritonService(self.operator, "test_config_id")
+
+        transaction = service.get_withdrawal_transaction(10**18)
+
+        assert transaction.name == "test_service"
+        assert transaction.safe == "0x1234567890abcdef1234567890abcdef12345678"
+        assert transaction.to == "0x5555555555555555555555555555555555555555"
+        assert transaction.data.startswith("0xa9059cbb")  # transfer(address,uint256)
+        assert transaction.crypto is mock_key_crypto.return_value
+        assert transaction.gas == 200000
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_get_withdrawal_transaction_no_withdrawal_address(self):
+        """Test the transfer cannot be built without a withdrawal address"""
+        service = TritonService(self.operator, "test_config_id")
+
+        with pytest.raises(ValueError):
+            service.get_withdrawal_transaction(10**18)
+
+
+@patch('triton.service.STAKING', {Chain.GNOSIS: {"program_1": "0xStaking1", "program_2": "0xStaking2"}})
+@patch('triton.service.load_contract')
+class TestGetCurrentStakingProgram:
+    """Tests for get_current_staking_program function"""
+
+    @staticmethod
+    def mock_contracts(mock_load_contract, owner, states):
+        """Own the service by the given address, and answer getStakingState from the given states"""
+        def load_contract(address, abi_file):
+            contract = MagicMock()
+            contract.functions.ownerOf.return_value.call.return_value = owner
+            state = states.get(address)
+            if isinstance(state, Exception):
+                contract.functions.getStakingState.return_value.call.side_effect = state
+            else:
+                contract.functions.getStakingState.return_value.call.return_value = state
+            return contract
+        mock_load_contract.side_effect = load_contract
+
+    def test_staked_in_known_program(self, mock_load_contract):
+        """Test that the program owning the service is found"""
+        self.mock_contracts(mock_load_contract, "0xStaking2", {"0xStaking2": 1})
+
+        assert get_current_staking_program(123, Chain.GNOSIS) == "program_2"
+        mock_load_contract.assert_any_call(
+            "0x9338b5153AE39BB89f50468E608eD9d764B755fD", "service_registry"
+        )
+
+    def test_unstaked(self, mock_load_contract):
+        """Test that a service evicted and unstaked has no program"""
+        self.mock_contracts(mock_load_contract, "0xStaking1", {"0xStaking1": 0})
+
+        assert get_current_staking_program(123, Chain.GNOSIS) is None
+
+    def test_owner_not_a_staking_contract(self, mock_load_contract):
+        """Test that a service owned by an EOA or Safe has no program"""
+        self.mock_contracts(
+            mock_load_contract, "0xOwner", {"0xOwner": ContractLogicError("execution reverted")}
+        )
+
+        assert get_current_staking_program(123, Chain.GNOSIS) is None
+
+    def test_rpc_error_raised(self, mock_load_contract):
+        """Test that an RPC failure is not mistaken for an unstaked service"""
+        self.mock_contracts(mock_load_contract, "0xStaking1", {"0xStaking1": ValueError("rate limited")})
+
+        with pytest.raises(ValueError, match="rate limited"):
+            get_current_staking_program(123, Chain.GNOSIS)
+
+    def test_inner_staking_contract(self, mock_load_contract):
+        """Test that a service held by an inner staking contract gets its program"""
+        self.mock_contracts(
+            mock_load_contract, "0xDual", {"0xDual": 1, "0xStaking1": 0, "0xStaking2": 2}
+        )
+
+        assert get_current_staking_program(123, Chain.GNOSIS) == "program_2"
+
+    def test_unknown_staking_contract(self, mock_load_contract):
+        """Test that a staking contract without a known program is returned as is"""
+        self.mock_contracts(
+            mock_load_contract, "0xUnknown", {"0xUnknown": 1, "0xStaking1": 0, "0xStaking2": 0}
+        )
+
+        assert get_current_staking_program(123, Chain.GNOSIS) == "0xUnknown"
+
+    def test_not_minted(self, mock_load_contract):
+        """Test that a service without a token has no program"""
+        assert get_current_staking_program(-1, Chain.GNOSIS) is None
+        mock_load_contract.assert_not_called()
+
+
+class TestWithdrawAll:
+    """Tests for withdraw_all function"""
+
+    @patch('triton.service.send_transactions', new_callable=AsyncMock)
+    @patch('triton.service.get_balances')
+    def test_withdraw_all_batched(self, mock_get_balances, mock_send_transactions):
+        """Test the balances are read in one batch, and the transfers sent together"""
+        services = [MagicMock(), MagicMock(), MagicMock(), MagicMock()]
+        for index, service in enumerate(services):
+            service.service_safe = f"0xsafe{index}"
+        services[3].withdrawal_address = None
+        services[2].get_withdrawal_transaction.side_effect = ValueError("No home chain")
+        mock_get_balances.return_value = (
+            {},
+            {"0xsafe0": 2 * 10**18, "0xsafe1": 0, "0xsafe2": 10**18},
+        )
+        error = Exception("Reverted")
+        mock_send_transactions.return_value = [error]
+
+        result = asyncio.run(withdraw_all(services))
+
+        mock_get_balances.assert_called_once_with([], ["0xsafe0", "0xsafe1", "0xsafe2"])
+        mock_send_transactions.assert_called_once_with(
+            [services[0].get_withdrawal_transaction.return_value]
+        )
+        services[0].get_withdrawal_transaction.assert_called_once_with(2 * 10**18)
+        services[1].get_withdrawal_transaction.assert_not_called()
+        assert result[0] is error
+        assert result[1] == (None, 0)
+        assert isinstance(result[2], ValueError)
+        assert result[3] == (None, 0)
+
+    @patch('triton.service.send_transactions', new_callable=AsyncMock, return_value=["0xhash"])
+    @patch('triton.service.get_balances')
+    def test_withdraw_all_success(self, mock_get_balances, mock_send_transactions):
+        """Test the withdrawn OLAS are returned with the tx hash"""
+        service = MagicMock()
+        service.service_safe = "0xsafe0"
+        mock_get_balances.return_value = ({}, {"0xsafe0": 15 * 10**17})
+
+        assert asyncio.run(withdraw_all([service])) == [("0xhash", 1.5)]
+
+    @patch('triton.service.get_balances')
+    def test_withdraw_all_without_withdrawal_address(self, mock_get_balances):
+        """Test nothing is read when no service has a withdrawal address"""
+        service = MagicMock()
+        service.withdrawal_address = None
+
+        assert asyncio.run(withdraw_all([service])) == [(None, 0)]
+        mock_get_balances.assert_not_called()
+
+
+class TestDiscoverServices:
+    """Tests for load_operator_services and discover_operators functions"""
+
+    @patch('triton.service.OperateApp')
+    def test_load_operator_services(self, mock_operate_app):
+        """Test the services of an operator share its service manager and master wallet"""
+        operate = mock_operate_app.return_value
+        service_manager = operate.service_manager.return_value
+        services = [MagicMock(), MagicMock()]
+        services[0].name = "trader"
+        services[1].name = "mech"
+        service_manager._get_all_services.return_value = services
+
+        result = load_operator_services("alice", "/path/to/alice")
+
+        assert list(result) == ["alice-trader", "alice-mech"]
+        assert result["alice-trader"].service is services[0]
+        assert result["alice-mech"].service is services[1]
+        assert result["alice-trader"].master_wallet is result["alice-mech"].master_wallet
+        operate.service_manager.assert_called_once()
+        operate.wallet_manager.load.assert_called_once()
+        service_manager.load.assert_not_called()
+
+    @patch('triton.service.load_operator_services')
+    def test_discover_operators(self, mock_load_operator_services):
+        """Test the services are grouped by operator, without the broken ones"""
+        def load(operator_name, operate_path):
+            if operator_name == "bob":
+                raise FileNotFoundError(operate_path)
+            return {f"{operator_name}-trader": operator_name}
+
+        mock_load_operator_services.side_effect = load
+
+        result = discover_operators({"alice": "/path/to/alice", "bob": "/path/to/bob"})
+
+        assert result == {"alice": {"alice-trader": "alice"}}
+
+    def test_flatten_services(self):
+        """Test the services keep the configured order of their operators"""
+        result = flatten_services(
+            {"carol": {"carol-trader": "carol"}, "alice": {"alice-a": 1, "alice-b": 2}}
+        )
+
+        assert list(result.items()) == [("carol-trader", "carol"), ("alice-a", 1), ("alice-b", 2)]
 
 
 class TestTritonServiceIntegration:
@@ -417,7 +654,7 @@ class TestTritonServiceIntegration:
         
         mock_service.chain_configs = {"gnosis": mock_chain_config}
         
-        service = TritonService(mock_operate, "test_config_id")
+        service = TritonService(OperatorContext(mock_operate), "test_config_id")
         
         assert service is not None
         assert service.service_id == 123
@@ -0,0 +1,330 @@
+"""Tests for triton.transactions module"""
+import asyncio
+import json
+from unittest.mock import Mock, patch
+
+import requests
+from web3.exceptions import ContractLogicError, TransactionNotFound
+
+from triton.transactions import (
+    SafeTransaction,
+    TransactionFailed,
+    build_safe_transaction,
+    get_receipts,
+    send_all,
+    send_safe_transactions,
+    send_transactions,
+    wait_for_receipts,
+)
+
+TARGET = "0x389B46c259631Acd6a69Bde8B6cEe218230bAE8C"
+SAFE = "0x59536E0e06FE394Aa82a4d40B0087b5f19841E2f"
+OTHER_SAFE = "0x238EB6993b90a978ec6AAD7530d6429c949C08DA"
+
+
+def make_transaction(name, signer="0xowner1", safe=SAFE, gas=100000):
+    """Build a Safe transaction signed by a mocked owner"""
+    crypto = Mock()
+    crypto.address = signer
+    return SafeTransaction(
+        name=name, safe=safe, to=TARGET, data="0x1234", crypto=crypto, gas=gas
+    )
+
+
+def mock_safe(nonce):
+    """Mock a Safe contract with a nonce"""
+    safe = Mock()
+    safe.functions.nonce.return_value.call.return_value = nonce
+    return safe
+
+
+class TestBuildSafeTransaction:
+    """Tests for build_safe_transaction function"""
+
+    @patch('triton.transactions.load_contract')
+    def test_signs_for_the_given_nonces(self, mock_load_contract):
+        """Test the Safe transaction is signed for the given Safe and EOA nonces"""
+        safe = mock_load_contract.return_value
+        safe.functions.getTransactionHash.return_value.call.return_value = b"\x01" * 32
+        safe.functions.execTransaction.return_value.build_transaction.return_value = {"tx": 1}
+        transaction = make_transaction("service1", gas=123)
+        transaction.crypto.sign_message.return_value = "0x" + "ab" * 65
+        transaction.crypto.sign_transaction.return_value = {"raw_transaction": "0xraw"}
+
+        raw_transaction = build_safe_transaction(
+            transaction, nonce=7, safe_nonce=3, gas_price=10, chain_id=100
+        )
+
+        assert raw_transaction == "0xraw"
+        hash_args = safe.functions.getTransactionHash.call_args.args
+        assert hash_args[0] == TARGET
+        assert hash_args[2] == b"\x12\x34"
+        assert hash_args[-1] == 3
+        transaction.crypto.sign_message.assert_called_once_with(
+            message=b"\x01" * 32, is_deprecated_mode=True
+        )
+        assert safe.functions.execTransaction.call_args.args[-1] == b"\xab" * 65
+        safe.functions.execTransaction.return_value.build_transaction.assert_called_once_with(
+            {
+                "from": "0xowner1",
+                "nonce": 7,
+                "gas": 123,
+                "gasPrice": 10,
+                "chainId": 100,
+            }
+        )
+        transaction.crypto.sign_transaction.assert_called_once_with(transaction={"tx": 1})
+
+
+class TestSendSafeTransactions:
+    """Tests for send_safe_transactions function"""
+
+    @patch('triton.transactions.build_safe_transaction')
+    @patch('triton.transactions.load_contract')
+    @patch('triton.transactions.web3')
+    def test_assigns_nonces_locally(self, mock_web3, mock_load_contract, mock_build):
+        """Test the nonces are read once and incremented for every transaction"""
+        mock_web3.eth.get_transaction_count.return_value = 5
+        mock_web3.to_checksum_address.side_effect = lambda address: address
+        mock_web3.to_hex.side_effect = lambda tx_hash: tx_hash
+        mock_web3.eth.send_raw_transaction.side_effect = lambda raw: f"hash-{raw}"
+        safes = {SAFE: mock_safe(10), OTHER_SAFE: mock_safe(20)}
+        mock_load_contract.side_effect = lambda address, abi: safes[address]
+        mock_build.side_effect = lambda transaction, **kwargs: (
+            f"{transaction.name}-{kwargs['nonce']}-{kwargs['safe_nonce']}"
+        )
+        transactions = [
+            make_transaction("service1"),
+            make_transaction("service2", safe=OTHER_SAFE),
+            make_transaction("service3"),
+        ]
+
+        result = send_safe_transactions(transactions)
+
+        assert result == [
+            "hash-service1-5-10",
+            "hash-service2-6-20",
+            "hash-service3-7-11",
+        ]
+        mock_web3.eth.get_transaction_count.assert_called_once_with("0xowner1", "pending")
+        safes[SAFE].functions.nonce.return_value.call.assert_called_once()
+
+    @patch('triton.transactions.build_safe_transaction')
+    @patch('triton.transactions.load_contract')
+    @patch('triton.transactions.web3')
+    def test_stops_at_the_first_failure(self, mock_web3, mock_load_contract, mock_build):
+        """Test the transactions after a failed send are not sent"""
+        mock_web3.eth.get_transaction_count.return_value = 0
+        mock_web3.to_hex.side_effect = lambda tx_hash: tx_hash
+        error = ValueError("nonce too low")
+        mock_web3.eth.send_raw_transaction.side_effect = ["0xhash1", error]
+        mock_load_contract.return_value = mock_safe(0)
+        mock_build.return_value = "0xraw"
+
+        result = send_safe_transactions([make_transaction(f"service{i}") for i in range(3)])
+
+        assert result == ["0xhash1", error, error]
+        assert mock_web3.eth.send_raw_transaction.call_count == 2
+
+    @patch('triton.transactions.build_safe_transaction')
+    @patch('triton.transactions.load_contract')
+    @patch('triton.transactions.web3')
+    def test_skips_reverting_transactions(self, mock_web3, mock_load_contract, mock_build):
+        """Test a transaction that reverts in simulation is not sent, and uses no nonce"""
+        mock_web3.eth.get_transaction_count.return_value = 5
+        mock_web3.to_checksum_address.side_effect = lambda address: address
+        mock_web3.to_hex.side_effect = lambda tx_hash: tx_hash
+        mock_web3.eth.send_raw_transaction.side_effect = lambda raw: f"hash-{raw}"
+        mock_web3.eth.call.side_effect = [b"", ContractLogicError("GS013"), b""]
+        mock_load_contract.return_value = mock_safe(10)
+        mock_build.side_effect = lambda transaction, **kwargs: (
+            f"{transaction.name}-{kwargs['nonce']}-{kwargs['safe_nonce']}"
+        )
+
+        result = send_safe_transactions(
+            [make_transaction(f"service{i}") for i in range(3)]
+        )
+
+        assert result[0] == "hash-service0-5-10"
+        assert isinstance(result[1], TransactionFailed)
+        assert "GS013" in str(result[1])
+        assert result[2] == "hash-service2-6-11"
+        assert mock_web3.eth.call.call_args.args[0]["from"] == SAFE
+
+
+class TestReceipts:
+    """Tests for get_receipts and wait_for_receipts functions"""
+
+    @patch('triton.transactions.rpc_pool.post')
+    def test_get_receipts_batched(self, mock_post):
+        """Test the receipts are read in one batch, leaving out the pending transactions"""
+        mock_post.return_value = json.dumps([
+            {"jsonrpc": "2.0", "id": 1, "result": None},
+            {
+                "jsonrpc": "2.0",
+                "id": 0,
+                "result": {"status": "0x1", "gasUsed": "0x5208", "logs": []},
+            },
+        ]).encode()
+
+        result = get_receipts(["0x1", "0x2"])
+
+        assert result == {"0x1": {"status": 1, "gasUsed": 21000, "logs": []}}
+        mock_post.assert_called_once()
+        batch = json.loads(mock_post.call_args.args[0])
+        assert [item["method"] for item in batch] == ["eth_getTransactionReceipt"] * 2
+        assert [item["params"] for item in batch] == [["0x1"], ["0x2"]]
+
+    @patch('triton.transactions.web3')
+    @patch('triton.transactions.rpc_pool.post')
+    def test_get_receipts_fallback(self, mock_post, mock_web3):
+        """Test the receipts are read one by one when the batch fails"""
+        mock_post.return_value = json.dumps([
+            {"jsonrpc": "2.0", "id": 0, "error": {"code": -32005, "message": "limit"}},
+            {"jsonrpc": "2.0", "id": 1, "result": None},
+        ]).encode()
+        mock_web3.eth.get_transaction_receipt.side_effect = [{"status": 1}]
+
+        assert get_receipts(["0x1", "0x2"]) == {"0x1": {"status": 1}}
+        mock_web3.eth.get_transaction_receipt.assert_called_once_with("0x1")
+
+    @patch('triton.transactions.web3')
+    @patch('triton.transactions.rpc_pool.post', side_effect=requests.ConnectionError("down"))
+    def test_get_receipts_batch_unavailable(self, mock_post, mock_web3):
+        """Test transactions not mined yet are left out of the sequential reads"""
+        mock_web3.eth.get_transaction_receipt.side_effect = [
+            {"status": 1},
+            TransactionNotFound("pending"),
+        ]
+
+        assert get_receipts(["0x1", "0x2"]) == {"0x1": {"status": 1}}
+
+    @patch('triton.transactions.RECEIPT_POLL_INTERVAL', 0)
+    @patch('triton.transactions.get_receipts')
+    def test_wait_polls_the_pending_transactions(self, mock_get_receipts):
+        """Test every poll only asks for the receipts still missing"""
+        mock_get_receipts.side_effect = [
+            {"0x1": {"status": 1}},
+            {"0x2": {"status": 0}},
+        ]
+
+        result = asyncio.run(wait_for_receipts(["0x1", "0x2"], timeout=60))
+
+        assert result == {"0x1": {"status": 1}, "0x2": {"status": 0}}
+        assert mock_get_receipts.call_args_list[1].args == (["0x2"],)
+
+    @patch('triton.transactions.get_receipts', return_value={})
+    def test_wait_gives_up_at_the_timeout(self, mock_get_receipts):
+        """Test the transactions not mined in time are left out"""
+        assert asyncio.run(wait_for_receipts(["0x1"], timeout=0)) == {}
+        mock_get_receipts.assert_called_once()
+
+
+class TestSendTransactions:
+    """Tests for send_transactions function"""
+
+    @patch('triton.transactions.wait_for_receipts')
+    @patch('triton.transactions.send_safe_transactions')
+    def test_does_not_wait(self, mock_send, mock_wait):
+        """Test the tx hashes and send errors are returned without waiting for receipts"""
+        error = ValueError("insufficient funds")
+        mock_send.side_effect = lambda transactions: (
+            ["0xa", "0xc"] if transactions[0].name == "a" else [error]
+        )
+        transactions = [
+            make_transaction("a"),
+            make_transaction("b", signer="0xowner2"),
+            make_transaction("c"),
+        ]
+
+        assert asyncio.run(send_transactions(transactions)) == ["0xa", error, "0xc"]
+        mock_wait.assert_not_called()
+
+
+class TestSendAll:
+    """Tests for send_all function"""
+
+    @patch('triton.transactions.wait_for_receipts')
+    @patch('triton.transactions.send_safe_transactions')
+    def test_groups_by_signer(self, mock_send, mock_wait):
+        """Test every signer sends its own transactions, and results keep their order"""
+        mock_send.side_effect = lambda transactions: [
+            f"0x{transaction.name}" for transaction in transactions
+        ]
+        mock_wait.side_effect = lambda tx_hashes, timeout: {
+            tx_hash: {"status": 1} for tx_hash in tx_hashes
+        }
+        transactions = [
+            make_transaction("a", signer="0xowner1"),
+            make_transaction("b", signer="0xowner2"),
+            make_transaction("c", signer="0xowner1"),
+        ]
+
+        result = asyncio.run(send_all(transactions))
+
+        assert result == ["0xa", "0xb", "0xc"]
+        sent = sorted([t.name for t in call.args[0]] for call in mock_send.call_args_list)
+        assert sent == [["a", "c"], ["b"]]
+
+    @patch('triton.transactions.wait_for_receipts')
+    @patch('triton.transactions.send_safe_transactions')
+    def test_retries_reverted_transactions(self, mock_send, mock_wait):
+        """Test the transactions reverted behind a reverted one of their Safe are sent again"""
+        mock_send.side_effect = [["0xa1", "0xb1", "0xc1"], ["0xc2"], ["0xc3"]]
+        mock_wait.side_effect = [
+            {"0xa1": {"status": 0}, "0xb1": {"status": 1}, "0xc1": {"status": 0}},
+            {"0xc2": {"status": 0}},
+            {"0xc3": {"status": 0}},
+        ]
+
+        result = asyncio.run(
+            send_all(
+                [make_transaction("a"), make_transaction("b"), make_transaction("c")],
+                retries=2,
+            )
+        )
+
+        assert isinstance(result[0], TransactionFailed)
+        assert "0xa1" in str(result[0])
+        assert result[1] == "0xb1"
+        assert isinstance(result[2], TransactionFailed)
+        assert "0xc2" in str(result[2])
+        # The reverted transaction is dropped, the one behind it is sent once more
+        sent = [[t.name for t in call.args[0]] for call in mock_send.call_args_list]
+        assert sent == [["a", "b", "c"], ["c"]]
+
+    @patch('triton.transactions.wait_for_receipts')
+    @patch('triton.transactions.send_safe_transactions')
+    def test_retries_per_safe(self, mock_send, mock_wait):
+        """Test a reverted transaction does not hold back the transactions of other Safes"""
+        mock_send.side_effect = [["0xa1", "0xb1"]]
+        mock_wait.side_effect = [{"0xa1": {"status": 0}, "0xb1": {"status": 0}}]
+
+        result = asyncio.run(
+            send_all([make_transaction("a"), make_transaction("b", safe=OTHER_SAFE)])
+        )
+
+        assert all(isinstance(item, TransactionFailed) for item in result)
+        assert mock_send.call_count == 1
+
+    @patch('triton.transactions.wait_for_receipts', return_value={})
+    @patch('triton.transactions.send_safe_transactions')
+    def test_reports_send_failures_and_timeouts(self, mock_send, mock_wait):
+        """Test transactions that could not be sent, or were not mined, are not retried"""
+        error = ValueError("insufficient funds")
+        mock_send.side_effect = lambda transactions: (
+            ["0xa"] if transactions[0].name == "a" else [error]
+        )
+
+        result = asyncio.run(
+            send_all(
+                [make_transaction("a"), make_transaction("b", signer="0xowner2")],
+                timeout=0,
+            )
+        )
+
+        assert isinstance(result[0], TransactionFailed)
+        assert "not mined" in str(result[0])
+        assert result[1] is error
+        assert mock_send.call_count == 2
+        mock_wait.assert_called_once_with(["0xa"], 0)
@@ -3,22 +3,71 @@
 import asyncio
 import os
 import re
-from unittest.mock import AsyncMock, Mock, patch, mock_open
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
-import yaml
 from telegram import Update
 from telegram.constants import ParseMode
-from telegram.ext import ContextTypes
+from telegram.ext import CommandHandler, ContextTypes
 
 from operate.operate_types import Chain
 
+from triton.chain import PriceQuote
+from triton.claims import ClaimOutcome
+
 
 class TestTritonBot:
     """Test cases for Triton Telegram bot"""
 
+    @pytest.fixture(autouse=True)
+    def mock_check_balances(self):
+        """Check the balances through the mocked balances of each service"""
+        with patch(
+            'triton.commands.check_balances',
+            side_effect=lambda services: [service.balances() for service in services],
+        ) as mock_check_balances:
+            yield mock_check_balances
+
+    @pytest.fixture(autouse=True)
+    def mock_withdraw_all(self):
+        """Withdraw through a mocked pipeline in which every service sends 50 OLAS"""
+        with patch(
+            'triton.commands.withdraw_all',
+            new_callable=AsyncMock,
+            side_effect=lambda services: [("0x789ghi012jkl", 50.0)] * len(services),
+        ) as mock_withdraw_all:
+            yield mock_withdraw_all
+
+    @pytest.fixture(autouse=True)
+    def mock_run_claims(self):
+        """Claim through a mocked pipeline in which every claim of 10 OLAS is mined"""
+        with patch(
+            'triton.commands.run_claims',
+            new_callable=AsyncMock,
+            side_effect=lambda requests, min_reward: [
+                ClaimOutcome(reward=10 * 10**18, tx_hash="0x123abc456def")
+            ] * len(requests),
+        ) as mock_run_claims:
+            yield mock_run_claims
+
+    @pytest.fixture(autouse=True)
+    def mock_receipt_tracker(self):
+        """Track the sent transactions in memory"""
+        with patch('triton.commands.receipt_tracker') as mock_receipt_tracker, \
+             patch('triton.triton.receipt_tracker', mock_receipt_tracker):
+            yield mock_receipt_tracker
+
+    @pytest.fixture
+    def mock_config_watcher(self, mock_config):
+        """Configuration whose operators do not change unless told to"""
+        with patch('triton.triton.ConfigWatcher') as mock_config_watcher:
+            mock_config_watcher.return_value.load.return_value = dict(mock_config["operators"])
+            mock_config_watcher.return_value.poll.return_value = None
+            yield mock_config_watcher.return_value
+
     @pytest.fixture
-    def mock_triton_app(self, mock_config, mock_service):
+    def mock_triton_app(self, mock_config, mock_service, mock_config_watcher):
         """
         Mock the Triton application and capture handlers for direct execution.
 
@@ -40,6 +89,7 @@ class TestTritonBot:
             # Configure the builder chain
             mock_builder.token.return_value = mock_builder
             mock_builder.post_init.return_value = mock_builder
+            mock_builder.post_shutdown.return_value = mock_builder
             mock_builder.build.return_value = mock_app
 
             # Configure the app
@@ -69,20 +119,13 @@ class TestTritonBot:
 
             # Mock other dependencies
             with patch('triton.triton.Application.builder', return_value=mock_builder), \
-                 patch('triton.triton.yaml.safe_load', return_value=mock_config), \
-                 patch('triton.triton.OperateApp') as mock_operate_app, \
-                 patch('triton.triton.TritonService', return_value=mock_service), \
-                 patch('builtins.open', mock_open(read_data=yaml.dump(mock_config))):
-
-                # Mock the operate app
-                mock_operate = Mock()
-                mock_operate_service = Mock()
-                mock_operate_service.name = "service"
-                mock_operate_service.service_config_id = "service1"
-                mock_operate.service_manager.return_value._get_all_services.return_value = [
-                    mock_operate_service,
-                ]
-                mock_operate_app.return_value = mock_operate
+                 patch('triton.triton.discover_operators') as mock_discover_operators:
+
+                # Every operator has a single service
+                mock_discover_operators.side_effect = lambda operators: {
+                    operator_name: {f"{operator_name}-service": mock_service}
+                    for operator_name in operators
+                }
 
                 # Import and call run_triton to capture all handlers
                 from triton.triton import run_triton
@@ -126,21 +169,25 @@ class TestTritonBot:
                 "name": "Staking Program 1",
             }
         }
-        service.check_balance.return_value = {
+        service.balances.return_value = {
             "agent_eoa_native_balance": 0.5,
             "service_safe_native_balance": 2.0,
             "service_safe_olas_balance": 100.0,
             "master_eoa_native_balance": 1.5,
             "master_safe_native_balance": 3.0,
         }
-        service.claim_rewards.return_value = "0x123abc456def"
-        service.withdraw_rewards.return_value = ("0x789ghi012jkl", 50.0)
         service.agent_address = "0xagent123"
         service.service_safe = "0xsafe456"
-        service.master_wallet.crypto.address = "0xmaster789"
+        service.master_wallet.address = "0xmaster789"
         service.master_wallet.safes = {Chain.GNOSIS: "0xmastersafe012"}
         service.withdrawal_address = "0xwithdraw345"
         service.service.home_chain = "gnosis"
+        service.balance_addresses.return_value = {
+            "agent_eoa": "0xagent123",
+            "service_safe": "0xsafe456",
+            "master_eoa": "0xmaster789",
+            "master_safe": "0xmastersafe012",
+        }
         return service
 
     @pytest.fixture
@@ -173,8 +220,8 @@ class TestTritonBot:
             all_functions = mock_triton_app()
             
             # Verify that we have the expected handlers
-            expected_handlers = ['staking_status', 'balance', 'claim', 'withdraw', 'slots', 'scheduled_jobs']
-            expected_jobs = ['start', 'balance_check', 'autoclaim']
+            expected_handlers = ['staking_status', 'balance', 'history', 'claim', 'withdraw', 'slots', 'scheduled_jobs', 'rpc_stats']
+            expected_jobs = ['start', 'balance_check', 'epoch_risk_check', 'track_receipts', 'reload_config', 'autoclaim']
             
             for handler in expected_handlers:
                 assert handler in all_functions, f"Handler '{handler}' not found"
@@ -197,22 +244,24 @@ class TestTritonBot:
             text="Triton has started",
         )
 
-    def test_staking_status_handler(self, mock_triton_app, mock_update):
+    def test_staking_status_handler(self, mock_triton_app, mock_update, mock_service):
         """Test staking_status handler using the mock_triton_app fixture"""
         # Get the staking_status handler
         staking_status_handler = mock_triton_app('staking_status')
 
         with (
-            patch('triton.triton.get_olas_price', return_value=2.5),
-            patch('triton.chain.requests.get', side_effect=Mock(
-                status_code=200,
-                json=lambda: {"name": "Staking Program 1"}
-            )),
+            patch('triton.commands.get_olas_price_quote', return_value=PriceQuote(price=2.5, age=10)),
+            patch('triton.commands.get_staking_statuses', side_effect=lambda params: [
+                mock_service.get_staking_status.return_value
+            ] * len(params)) as mock_get_staking_statuses,
         ):
             # Execute the handler
             asyncio.run(staking_status_handler(mock_update, None))
         
         # Verify the call
+        mock_get_staking_statuses.assert_called_once_with(
+            [mock_service.get_staking_params.return_value] * 2
+        )
         mock_update.message.reply_text.assert_called_once()
         mock_update.message.called_once_with(
             disable_web_page_preview=True,
@@ -228,6 +277,36 @@ Next epoch: 2025-07-21 12:00:00
 Total rewards = 21 OLAS [$52.5]""",
         )
 
+    def test_staking_status_handler_reports_failures(self, mock_triton_app, mock_update, mock_service):
+        """Test a failed service is reported, and the others still get their status"""
+        staking_status_handler = mock_triton_app('staking_status')
+        status = mock_service.get_staking_status.return_value
+
+        with (
+            patch('triton.commands.get_olas_price_quote', return_value=PriceQuote(price=None, age=None)),
+            patch('triton.commands.get_staking_statuses', return_value=[ValueError("rate limited"), status]),
+        ):
+            asyncio.run(staking_status_handler(mock_update, None))
+
+        message = mock_update.message.reply_text.call_args.kwargs["text"]
+        assert message.startswith("[operator1-service] Cannot get the staking status\n\n[operator2-service] 10.5 OLAS [5/10]")
+
+    def test_staking_status_handler_batch_failure(self, mock_triton_app, mock_update):
+        """Test a failed batch still gets a reply, with every service reported as failed"""
+        staking_status_handler = mock_triton_app('staking_status')
+
+        with (
+            patch('triton.commands.get_olas_price_quote', return_value=PriceQuote(price=None, age=None)),
+            patch('triton.commands.get_staking_statuses', side_effect=TimeoutError("RPC timeout")),
+        ):
+            asyncio.run(staking_status_handler(mock_update, None))
+
+        assert mock_update.message.reply_text.call_args.kwargs["text"] == """[operator1-service] Cannot get the staking status
+
+[operator2-service] Cannot get the staking status
+
+Total rewards = 0 OLAS"""
+
     def test_balance_handler(self, mock_triton_app, mock_update):
         """Test balance handler using the mock_triton_app fixture"""
         # Get the balance handler
@@ -263,10 +342,66 @@ Total rewards = 21 OLAS [$52.5]""",
         
         # Verify the call
         mock_update.message.reply_text.assert_called_once_with(
-            text="""[operator1-service] Sent the [claim transaction](https://gnosisscan.io/tx/0x123abc456def). Rewards will be sent to the Service Safe.
-[operator2-service] Sent the [claim transaction](https://gnosisscan.io/tx/0x123abc456def). Rewards will be sent to the Service Safe."""
+            text="""[operator1-service] Sent the claim of about 10.00 OLAS in this [transaction](https://gnosisscan.io/tx/0x123abc456def), to the Service Safe.
+[operator2-service] Sent the claim of about 10.00 OLAS in this [transaction](https://gnosisscan.io/tx/0x123abc456def), to the Service Safe."""
         )
 
+    def test_claim_handler_does_not_block_updates(self, mock_triton_app):
+        """Test that claims, which wait for their receipts, do not hold back other updates"""
+        with patch('triton.triton.CommandHandler', wraps=CommandHandler) as mock_command_handler:
+            mock_triton_app()
+
+        blocking = {
+            call.args[0]: call.kwargs.get("block", True)
+            for call in mock_command_handler.call_args_list
+        }
+        assert blocking["claim"] is False
+        assert blocking["balance"] is True
+
+    def test_claim_handler_while_claiming(self, mock_triton_app, mock_update, mock_run_claims):
+        """Test that a claim is not sent while the previous one is waiting for its receipts"""
+        from triton.commands import claim_lock
+
+        claim_handler = mock_triton_app('claim')
+
+        async def claim_while_claiming():
+            async with claim_lock:
+                await claim_handler(mock_update, None)
+
+        asyncio.run(claim_while_claiming())
+
+        mock_update.message.reply_text.assert_called_once_with(
+            text="Claims are already being sent"
+        )
+        mock_run_claims.assert_not_called()
+
+    def test_claim_handler_reports_failures(
+        self, mock_triton_app, mock_update, mock_service, mock_run_claims, mock_receipt_tracker
+    ):
+        """Test claim handler reports the services whose claim failed"""
+        mock_run_claims.side_effect = lambda requests, min_reward: [
+            ClaimOutcome(reward=10 * 10**18, tx_hash="0x123abc456def"),
+            ClaimOutcome(reward=10 * 10**18, error=RuntimeError("reverted")),
+        ]
+        claim_handler = mock_triton_app('claim')
+
+        asyncio.run(claim_handler(mock_update, None))
+
+        assert len(mock_run_claims.call_args.args[0]) == 2
+        assert mock_run_claims.call_args.args[0][0] is mock_service.get_claim_request.return_value
+        assert mock_run_claims.call_args.kwargs == {"min_reward": 0}
+        mock_update.message.reply_text.assert_called_once_with(
+            text="""[operator1-service] Sent the claim of about 10.00 OLAS in this [transaction](https://gnosisscan.io/tx/0x123abc456def), to the Service Safe.
+[operator2-service] Failed to claim the rewards"""
+        )
+        # Only the mined claim is followed up, with the OLAS sent to the service Safe
+        message = mock_receipt_tracker.track.call_args.args[0]
+        assert message.separator == "\n"
+        assert message.parse_mode is None
+        assert [(tx.tx_hash, tx.line, tx.recipient) for tx in message.transactions] == [
+            ("0x123abc456def", 0, "0xsafe456"),
+        ]
+
     def test_withdraw_handler(self, mock_triton_app, mock_update):
         """Test withdraw handler using the mock_triton_app fixture"""
         # Get the withdraw handler
@@ -284,31 +419,136 @@ Total rewards = 21 OLAS [$52.5]""",
 \\[operator2-service] Sent the [withdrawal transaction](https://gnosisscan.io/tx/0x789ghi012jkl). 50 OLAS sent from the Service Safe to [0xwithdraw345](https://gnosisscan.io/address/0xwithdraw345) #withdraw""",
         )
 
+    def test_withdraw_handler_tracks_receipts(self, mock_triton_app, mock_update, mock_receipt_tracker):
+        """Test the withdrawal transactions are followed up in the sent message"""
+        withdraw_handler = mock_triton_app('withdraw')
+        mock_update.message.reply_text.return_value = Mock(chat_id=123, message_id=456)
+
+        asyncio.run(withdraw_handler(mock_update, None))
+
+        message = mock_receipt_tracker.track.call_args.args[0]
+        assert (message.chat_id, message.message_id) == (123, 456)
+        assert message.separator == "\n\n"
+        assert message.parse_mode == ParseMode.MARKDOWN
+        assert message.text == mock_update.message.reply_text.call_args.kwargs["text"]
+        assert [(tx.tx_hash, tx.line, tx.recipient) for tx in message.transactions] == [
+            ("0x789ghi012jkl", 0, "0xwithdraw345"),
+            ("0x789ghi012jkl", 1, "0xwithdraw345"),
+        ]
+
+    def test_withdraw_handler_reports_failures(self, mock_triton_app, mock_update, mock_withdraw_all):
+        """Test every service is reported when the withdrawals cannot be sent"""
+        withdraw_handler = mock_triton_app('withdraw')
+        mock_withdraw_all.side_effect = Exception("RPC down")
+
+        asyncio.run(withdraw_handler(mock_update, None))
+
+        mock_update.message.reply_text.assert_called_once_with(
+            disable_web_page_preview=True,
+            parse_mode=ParseMode.MARKDOWN,
+            text="""\\[operator1-service] Cannot withdraw rewards
+
+\\[operator2-service] Cannot withdraw rewards""",
+        )
+
+    def test_track_receipts_job(self, mock_triton_app, mock_context, mock_receipt_tracker):
+        """Test the job polls the receipts of the tracked transactions"""
+        track_receipts_job = mock_triton_app('track_receipts')
+        mock_receipt_tracker.poll = AsyncMock()
+
+        asyncio.run(track_receipts_job(mock_context))
+
+        mock_receipt_tracker.poll.assert_called_once_with(mock_context.bot)
+
+    def test_reload_config_job(
+        self, mock_triton_app, mock_context, mock_config_watcher, mock_check_balances, mock_service
+    ):
+        """Test only the added operators are loaded, and the removed ones stop being checked"""
+        all_functions = mock_triton_app()
+        added_service = Mock()
+        added_service.balances.return_value = mock_service.balances.return_value
+        mock_config_watcher.poll.return_value = {
+            "operator2": "/path/to/operator2",
+            "operator3": "/path/to/operator3",
+        }
+
+        with patch(
+            'triton.triton.discover_operators',
+            return_value={"operator3": {"operator3-service": added_service}},
+        ) as mock_discover_operators:
+            asyncio.run(all_functions['reload_config'](mock_context))
+        with patch('triton.triton.time.time', return_value=1_000_000):
+            asyncio.run(all_functions['balance_check'](mock_context))
+
+        mock_discover_operators.assert_called_once_with({"operator3": "/path/to/operator3"})
+        assert mock_check_balances.call_args[0][0] == [mock_service, added_service]
+
+    def test_reload_config_job_single_worker(self, mock_triton_app, mock_context, mock_config_watcher):
+        """Test loading the added operators does not wait on a worker it holds itself"""
+        all_functions = mock_triton_app()
+        mock_config_watcher.poll.return_value = {"operator3": "/path/to/operator3"}
+
+        with (
+            patch('triton.executor._executor', ThreadPoolExecutor(max_workers=1)),
+            patch(
+                'triton.service.load_operator_services',
+                return_value={"operator3-service": Mock()},
+            ) as mock_load_operator_services,
+        ):
+            asyncio.run(asyncio.wait_for(all_functions['reload_config'](mock_context), 5))
+
+        mock_load_operator_services.assert_called_once_with("operator3", "/path/to/operator3")
+
     def test_slots_handler(self, mock_triton_app, mock_update):
         """Test slots handler using the mock_triton_app fixture"""
         # Get the slots handler
         slots_handler = mock_triton_app('slots')
 
-        with (
-            patch('triton.chain.load_contract', return_value=Mock()),
-            patch('triton.chain.len', return_value=0),
-        ):
+        with patch('triton.commands.get_slots', return_value={
+            "Hobbyist (100 OLAS)": 100,
+            "Expert (1k OLAS)": 20,
+        }):
             # Execute the handler
             asyncio.run(slots_handler(mock_update, None))
         
         # Verify the call
         mock_update.message.reply_text.assert_called_once_with(
             text="""[Hobbyist (100 OLAS)] 100 available slots
-[Hobbyist 2 (500 OLAS)] 50 available slots
-[Expert (1k OLAS)] 20 available slots
-[Expert 2 (1k OLAS)] 40 available slots
-[Expert 3 (2k OLAS)] 20 available slots
-[Expert 4 (10k OLAS)] 26 available slots
-[Expert 5 (10k OLAS)] 26 available slots
-[Expert 6 (1k OLAS)] 40 available slots
-[Expert 7 (10k OLAS)] 26 available slots"""
+[Expert (1k OLAS)] 20 available slots"""
         )
 
+    def test_history_handler(self, mock_triton_app, mock_update, mock_context, mock_service):
+        """Test that balance_check samples feed the history command"""
+        app_functions = mock_triton_app()
+        balance_check_job = app_functions['balance_check']
+        history_handler = app_functions['history']
+        mock_context.args = []
+
+        for ts, agent_balance in ((1_000_000, 1.0), (1_000_000 + 86400, 0.9)):
+            mock_service.balances.return_value = {
+                **mock_service.balances.return_value,
+                "agent_eoa_native_balance": agent_balance,
+            }
+            with patch('triton.triton.time.time', return_value=ts):
+                asyncio.run(balance_check_job(mock_context))
+
+        with patch('triton.history.time.time', return_value=1_000_000 + 86400):
+            asyncio.run(history_handler(mock_update, mock_context))
+
+        text = mock_update.message.reply_text.call_args[1]["text"]
+        assert text.startswith("[operator1-")
+        assert "Agent EOA: 0.9 xDAI (-0.1/day), burning 0.1 xDAI/day, empty in 9.0 days" in text
+        assert "Service Safe: 100 OLAS (+0/day)" in text
+
+    def test_history_handler_bad_window(self, mock_triton_app, mock_update, mock_context):
+        """Test the usage message of the history command"""
+        history_handler = mock_triton_app('history')
+        mock_context.args = ["week"]
+
+        asyncio.run(history_handler(mock_update, mock_context))
+
+        mock_update.message.reply_text.assert_called_once_with(text="Usage: /history [days]")
+
     def test_scheduled_jobs_handler_empty(self, mock_triton_app, mock_update, mock_context):
         """Test scheduled_jobs handler with no jobs using the mock_triton_app fixture"""
         mock_context.job_queue.jobs.return_value = []
@@ -322,6 +562,61 @@ Total rewards = 21 OLAS [$52.5]""",
         # Verify the call
         mock_update.message.reply_text.assert_called_once_with("No scheduled jobs")
 
+    def test_scheduled_jobs_handler_balance_checks(self, mock_triton_app, mock_update, mock_context):
+        """Test that the scheduled_jobs handler lists the next balance check of every service"""
+        # Both from the same application, so that they share the schedule
+        app_functions = mock_triton_app()
+        balance_check_job = app_functions['balance_check']
+        scheduled_jobs_handler = app_functions['scheduled_jobs']
+        job = Mock()
+        job.name = "balance_check"
+        job.next_t = None
+        mock_context.job_queue.jobs.return_value = [job]
+
+        asyncio.run(scheduled_jobs_handler(mock_update, mock_context))
+
+        message = mock_update.message.reply_text.call_args[0][0]
+        assert message.startswith("""• balance_check: N/A
+
+Balance checks:
+• operator1-service: at the next tick
+• operator2-service: at the next tick
+""")
+        assert "RPC endpoints:" not in message
+
+        with (
+            patch('triton.triton.time.time', return_value=1_000_000),
+            patch('triton.commands.LOCAL_TIMEZONE', 'UTC'),
+            patch('triton.scheduler.POLL_MAX_INTERVAL', 14400),
+        ):
+            asyncio.run(balance_check_job(mock_context))
+            asyncio.run(scheduled_jobs_handler(mock_update, mock_context))
+
+        assert "• operator1-service: 1970-01-12 17:46:40 UTC (every 240 min)" in (
+            mock_update.message.reply_text.call_args[0][0]
+        )
+
+    def test_rpc_stats_handler(self, mock_triton_app, mock_update, mock_context):
+        """Test that the rpc_stats handler reports the endpoints and the rate limiting"""
+        rpc_stats_handler = mock_triton_app('rpc_stats')
+
+        asyncio.run(rpc_stats_handler(mock_update, mock_context))
+
+        message = mock_update.message.reply_text.call_args[0][0]
+        assert message.startswith("RPC endpoints:\n")
+        assert "Rate limit:" in message
+        assert "waiting now" in message
+
+    def test_balance_check_job_skips_services_not_due(self, mock_triton_app, mock_context, mock_service):
+        """Test that services are only checked again once they are due"""
+        balance_check_job = mock_triton_app('balance_check')
+
+        for now in (1_000_000, 1_000_060):
+            with patch('triton.triton.time.time', return_value=now):
+                asyncio.run(balance_check_job(mock_context))
+
+        assert mock_service.balances.call_count == 2
+
     @pytest.mark.parametrize("agent_balance,safe_balance,agent_threshold,safe_threshold,expected_messages", [
         # Both balances below threshold
         (0.05, 0.5, 0.1, 1.0, 4),  # One call per operator
@@ -340,7 +635,7 @@ Total rewards = 21 OLAS [$52.5]""",
                                           agent_balance, safe_balance, agent_threshold, safe_threshold, expected_messages, mock_config):
         """Test balance_check job with different balance scenarios using the mock_triton_app fixture"""
         # Configure the mock service with the test balances
-        mock_service.check_balance.return_value = {
+        mock_service.balances.return_value = {
             "agent_eoa_native_balance": agent_balance,
             "service_safe_native_balance": safe_balance,
             "service_safe_olas_balance": 100.0,
@@ -393,6 +688,77 @@ Total rewards = 21 OLAS [$52.5]""",
                 assert call[1]['parse_mode'] == "Markdown"
                 assert call[1]['disable_web_page_preview'] is True
 
+    def test_balance_check_job_forecast(self, mock_triton_app, mock_context, mock_service):
+        """Test that a balance burning towards its threshold is reported once, ahead of time"""
+        balance_check_job = mock_triton_app('balance_check')
+
+        for day, agent_balance in enumerate((1.0, 0.5, 0.2)):
+            mock_service.balances.return_value = {
+                **mock_service.balances.return_value,
+                "agent_eoa_native_balance": agent_balance,
+            }
+            with (
+                patch('triton.triton.time.time', return_value=1_000_000 + day * 86400),
+                patch('triton.triton.AGENT_BALANCE_THRESHOLD', 0.1),
+                patch('triton.triton.SAFE_BALANCE_THRESHOLD', 1.0),
+                patch('triton.triton.CHAT_ID', '123456789'),
+            ):
+                asyncio.run(balance_check_job(mock_context))
+
+        mock_context.bot.send_message.assert_called_once_with(
+            chat_id='123456789',
+            text="[operator1-service] [Agent EOA](https://gnosisscan.io/address/0xagent123) balance of 0.5 xDAI will drop below 0.1 xDAI in about 19 h, at 0.5 xDAI/day",
+            parse_mode=ParseMode.MARKDOWN,
+            disable_web_page_preview=True,
+        )
+
+    def test_epoch_risk_check_job(self, mock_triton_app, mock_context):
+        """Test that services projected to miss their target are reported once per epoch"""
+        epoch_risk_check_job = mock_triton_app('epoch_risk_check')
+        status = {
+            "mech_requests_this_epoch": 10,
+            "required_mech_requests": 40,
+            "checkpoint_ts": 1_000_000,
+            "epoch_end_ts": 1_000_000 + 86400,
+            "epoch_end": "2025-07-21 12:00:00",
+        }
+
+        with (
+            patch('triton.commands.get_staking_statuses', side_effect=lambda params: [status] * len(params)),
+            patch('triton.triton.CHAT_ID', '123456789'),
+            patch('triton.triton.EPOCH_RISK_HORIZON', 8),
+        ):
+            # Too early to warn, then warned once, then not due yet
+            for hours in (10, 20, 20):
+                with patch('triton.triton.time.time', return_value=1_000_000 + hours * 3600):
+                    asyncio.run(epoch_risk_check_job(mock_context))
+
+        assert mock_context.bot.send_message.call_count == 2
+        mock_context.bot.send_message.assert_called_with(
+            chat_id='123456789',
+            text="[operator2-service] 10/40 mech requests, projected to reach 10 by the end of the epoch "
+                 "(2025-07-21 12:00:00). It needs 7.5 requests/h and makes 0.0 requests/h",
+        )
+
+    @patch('triton.triton.CLAIM_MIN_REWARD', 1)
+    @patch('triton.triton.AUTOCLAIM', True)
+    def test_autoclaim_job_skips_low_rewards(self, mock_triton_app, mock_context, mock_run_claims):
+        """Test autoclaim reports the services whose rewards were not worth claiming"""
+        mock_run_claims.side_effect = lambda requests, min_reward: [
+            ClaimOutcome(reward=0),
+            ClaimOutcome(reward=5 * 10**17),
+        ]
+        autoclaim_job = mock_triton_app('autoclaim')
+
+        asyncio.run(autoclaim_job(mock_context))
+
+        assert mock_run_claims.call_args.kwargs == {"min_reward": 1}
+        text = mock_context.bot.send_message.call_args.kwargs["text"]
+        assert text.startswith(
+            "\\[operator1-service] (Autoclaim) No rewards to claim\n\n"
+            "\\[operator2-service] (Autoclaim) Skipped the claim of 0.50 OLAS, below the 1 OLAS minimum"
+        )
+
     def test_autoclaim_job(self, mock_triton_app, mock_context):
         """Test autoclaim job when enabled/disabled using the mock_triton_app fixture"""
         with patch('triton.triton.AUTOCLAIM', False):
@@ -421,7 +787,11 @@ Total rewards = 21 OLAS [$52.5]""",
             call_kwargs = call_args_list[0].kwargs
             assert call_kwargs == {
                 "chat_id": call_kwargs['chat_id'],
-                "text": f"""\\[operator1-service] (Autoclaim) Sent the [withdrawal transaction](https://gnosisscan.io/tx/0x789ghi012jkl). 50 OLAS sent from the Safe to [0xwithdraw345](https://gnosisscan.io/address/0xwithdraw345) #withdraw
+                "text": f"""\\[operator1-service] (Autoclaim) Sent the claim of about 10.00 OLAS in this [transaction](https://gnosisscan.io/tx/0x123abc456def), to the Service Safe.
+
+\\[operator2-service] (Autoclaim) Sent the claim of about 10.00 OLAS in this [transaction](https://gnosisscan.io/tx/0x123abc456def), to the Service Safe.
+
+\\[operator1-service] (Autoclaim) Sent the [withdrawal transaction](https://gnosisscan.io/tx/0x789ghi012jkl). 50 OLAS sent from the Safe to [0xwithdraw345](https://gnosisscan.io/address/0xwithdraw345) #withdraw
 
 \\[operator2-service] (Autoclaim) Sent the [withdrawal transaction](https://gnosisscan.io/tx/0x789ghi012jkl). 50 OLAS sent from the Safe to [0xwithdraw345](https://gnosisscan.io/address/0xwithdraw345) #withdraw""",
                 "parse_mode": ParseMode.MARKDOWN,
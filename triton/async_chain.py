@@ -0,0 +1,512 @@
+"""Async Chain Module
+This module provides asyncio variants of the chain functions, backed by AsyncWeb3."""
+
+import asyncio
+import logging
+import weakref
+from http import HTTPStatus
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, cast
+
+import aiohttp
+import requests
+from operate.constants import IPFS_ADDRESS
+from web3 import AsyncWeb3
+from web3.contract import AsyncContract
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+from web3.types import FilterParams
+
+from triton.cache import mech_counters, metadata_cache
+from triton.chain import (
+    ContractCall,
+    SlotCounts,
+    StakingProgram,
+    build_staking_program,
+    decode_multicall,
+    encode_multicall,
+    find_mech_request_count_method,
+    format_staking_status,
+    get_available_slots,
+    get_balance_calls,
+    get_cached_slot_counts,
+    get_cached_staking_programs,
+    get_liveness_ratio_calls,
+    get_slot_calls,
+    get_slot_event_filter,
+    get_staking_contract_addresses,
+    get_staking_program_values,
+    get_staking_programs_calls,
+    get_staking_status_calls,
+    get_staking_status_values,
+    load_client_contract,
+    make_slot_counts,
+    make_staking_program,
+    program_status_values,
+    rpc_pool,
+    slot_capacity,
+    store_slot_counts,
+    store_staking_program,
+)
+from triton.constants import (
+    MULTICALL3_ADDRESS,
+    MULTICALL_BATCH_SIZE,
+    OLAS_TOKEN_ADDRESS_GNOSIS,
+    RPC_KEEPALIVE_TIMEOUT,
+    RPC_POOL_SIZE,
+    USE_MULTICALL,
+)
+from triton.rpc import PooledAsyncHTTPProvider
+
+logger = logging.getLogger("async_chain")
+
+# Instantiate the async web3 provider and ethereum client, on the first RPC endpoint
+provider = PooledAsyncHTTPProvider(rpc_pool)
+async_web3 = AsyncWeb3(provider)
+
+# One pooled session per event loop
+_sessions: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]"
+) = weakref.WeakKeyDictionary()
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Get the pooled HTTP session shared by the RPC provider and IPFS requests"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=RPC_POOL_SIZE, keepalive_timeout=RPC_KEEPALIVE_TIMEOUT
+            ),
+        )
+        _sessions[loop] = session
+        await provider.cache_async_session(session)
+
+    return session
+
+
+async def close_session() -> None:
+    """Close the HTTP session of the running event loop"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def load_contract(
+    contract_address: str, abi_file: str, has_abi_key: bool = True
+) -> AsyncContract:
+    """Load a smart contract"""
+    return cast(
+        AsyncContract,
+        load_client_contract(async_web3, contract_address, abi_file, has_abi_key),
+    )
+
+
+async def get_native_balance(address: str):
+    """Get the native balance"""
+    await get_session()
+    balance_wei = await async_web3.eth.get_balance(
+        async_web3.to_checksum_address(address)
+    )
+    return async_web3.from_wei(balance_wei, "ether")
+
+
+async def get_olas_balance(address: str) -> int:
+    """Get OLAS balance"""
+    await get_session()
+    olas_token_contract = load_contract(OLAS_TOKEN_ADDRESS_GNOSIS, "olas", False)
+    return await olas_token_contract.functions.balanceOf(address).call()
+
+
+async def get_balances(
+    native_addresses: Iterable[str], olas_addresses: Iterable[str]
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Get the native and OLAS balances of several addresses, reading each address once"""
+    native_addresses = list(native_addresses)
+    olas_addresses = list(olas_addresses)
+    to_checksum = async_web3.to_checksum_address
+    unique_native = list(dict.fromkeys(map(to_checksum, native_addresses)))
+    unique_olas = list(dict.fromkeys(map(to_checksum, olas_addresses)))
+    calls = get_balance_calls(unique_native, unique_olas)
+
+    results = await _try_multicall(calls) or [None] * len(calls)
+
+    # Addresses whose batched read failed are read concurrently, one call each
+    n_native = len(unique_native)
+
+    async def _native(address: str, balance: Optional[int]) -> Any:
+        if balance is None:
+            return await get_native_balance(address)
+        return async_web3.from_wei(balance, "ether")
+
+    async def _olas(address: str, balance: Optional[int]) -> int:
+        if balance is None:
+            return await get_olas_balance(address)
+        return balance
+
+    native_balances = dict(
+        zip(
+            unique_native,
+            await asyncio.gather(*map(_native, unique_native, results[:n_native])),
+        )
+    )
+    olas_balances = dict(
+        zip(
+            unique_olas,
+            await asyncio.gather(*map(_olas, unique_olas, results[n_native:])),
+        )
+    )
+
+    return (
+        {
+            address: native_balances[to_checksum(address)]
+            for address in native_addresses
+        },
+        {address: olas_balances[to_checksum(address)] for address in olas_addresses},
+    )
+
+
+async def get_mech_request_count(
+    mech_contract_address: str,
+    requester_address: str,
+    method: Optional[str] = None,
+) -> int:
+    """Get the number of requests made by a requester to a mech"""
+    method = method or await get_mech_request_count_method(
+        mech_contract_address, requester_address
+    )
+    mech_contract = load_contract(mech_contract_address, "mech", has_abi_key=False)
+    try:
+        return await mech_contract.get_function_by_name(method)(
+            requester_address
+        ).call()
+    except (ContractLogicError, BadFunctionCallOutput):
+        # A recorded counter that reverts is probed again on the next read
+        mech_counters.delete(async_web3.to_checksum_address(mech_contract_address))
+        raise
+
+
+async def get_mech_request_count_method(
+    mech_contract_address: str,
+    requester_address: str,
+) -> str:
+    """Find out which request counter a mech implements"""
+    mech_contract_address = async_web3.to_checksum_address(mech_contract_address)
+    method = mech_counters.get(mech_contract_address)
+    if method is not None:
+        return method
+
+    await get_session()
+    method = find_mech_request_count_method(
+        await async_web3.eth.get_code(mech_contract_address)
+    )
+    if method is None:
+        mech_contract = load_contract(mech_contract_address, "mech", has_abi_key=False)
+        try:
+            await mech_contract.functions.mapRequestsCounts(requester_address).call()
+        except (ContractLogicError, BadFunctionCallOutput):
+            # Other errors, like an RPC rate limit, say nothing about the mech
+            method = "mapRequestCounts"
+        else:
+            method = "mapRequestsCounts"
+
+    mech_counters.set(mech_contract_address, method)
+    return method
+
+
+async def multicall(calls: Sequence[ContractCall]) -> List[Optional[Any]]:
+    """Aggregate contract reads through Multicall3. Failed calls are returned as None"""
+    await get_session()
+    multicall_contract = load_contract(
+        MULTICALL3_ADDRESS, "multicall3", has_abi_key=False
+    )
+    batches = []
+    for start in range(0, len(calls), MULTICALL_BATCH_SIZE):
+        end = start + MULTICALL_BATCH_SIZE
+        batches.append(calls[start:end])
+    return_data = await asyncio.gather(
+        *(
+            multicall_contract.functions.aggregate3(encode_multicall(batch)).call()
+            for batch in batches
+        )
+    )
+
+    results: List[Optional[Any]] = []
+    for batch, batch_return_data in zip(batches, return_data):
+        results.extend(decode_multicall(batch, batch_return_data))
+    return results
+
+
+async def _try_multicall(
+    calls: Sequence[ContractCall],
+) -> Optional[List[Optional[Any]]]:
+    """Aggregate contract reads through Multicall3. Returns None if it is disabled or failed"""
+    # The callers fall back to direct reads on None
+    if not USE_MULTICALL:
+        return None
+    try:
+        return await multicall(calls)
+    except (ContractLogicError, BadFunctionCallOutput, ValueError) as e:
+        logger.warning("Multicall3 read failed, falling back to direct reads: %s", e)
+        return None
+
+
+async def fetch_staking_metadata(metadata_hash: str) -> dict:
+    """Fetch the staking program metadata from the IPFS gateway"""
+    session = await get_session()
+    ipfs_address = IPFS_ADDRESS.format(hash=metadata_hash)
+    async with session.get(
+        ipfs_address, timeout=aiohttp.ClientTimeout(total=30)
+    ) as response:
+        if response.status != HTTPStatus.OK:
+            raise requests.RequestException(
+                f"Failed to fetch data from {ipfs_address}: {response.status}"
+            )
+        return await response.json(content_type=None)
+
+
+async def get_staking_metadata(metadata_hash: str) -> dict:
+    """Get the staking program metadata, fetching it from IPFS when not cached"""
+    return await metadata_cache.get_async(metadata_hash, fetch_staking_metadata)
+
+
+async def _read_staking_program(staking_token_address: str) -> StakingProgram:
+    """Read the parameters of a staking contract, without Multicall3"""
+    await get_session()
+    functions = load_contract(staking_token_address, "staking_token").functions
+    activity_checker, liveness_period, checkpoint_ts, metadata_hash = (
+        await asyncio.gather(
+            functions.activityChecker().call(),
+            functions.livenessPeriod().call(),
+            functions.tsCheckpoint().call(),
+            functions.metadataHash().call(),
+        )
+    )
+    activity_checker_contract = load_contract(activity_checker, "mech_activity")
+    return make_staking_program(
+        {
+            "activity_checker": activity_checker,
+            "liveness_period": liveness_period,
+            "checkpoint_ts": checkpoint_ts,
+            "metadata_hash": metadata_hash,
+        },
+        await activity_checker_contract.functions.livenessRatio().call(),
+    )
+
+
+async def _read_staking_programs_multicall(
+    staking_token_addresses: Sequence[str],
+) -> Dict[str, StakingProgram]:
+    """Read the parameters of several staking contracts through Multicall3"""
+    # Contracts left out are read directly
+    results = await _try_multicall(get_staking_programs_calls(staking_token_addresses))
+    if results is None:
+        return {}
+    all_values = get_staking_program_values(staking_token_addresses, results)
+
+    # The liveness ratio lives in the activity checker, which is only known now
+    ratio_calls = get_liveness_ratio_calls(all_values)
+    ratio_results = await _try_multicall(ratio_calls)
+    if ratio_results is None:
+        return {}
+    ratios = dict(zip(ratio_calls, ratio_results))
+
+    async def _program(address: str, values: Dict[str, Any]) -> StakingProgram:
+        program = build_staking_program(values, ratios)
+        if program is None:
+            # Let the direct reads surface the actual error
+            return await _read_staking_program(address)
+        return program
+
+    return dict(
+        zip(
+            staking_token_addresses,
+            await asyncio.gather(*map(_program, staking_token_addresses, all_values)),
+        )
+    )
+
+
+async def get_staking_programs(
+    staking_token_addresses: Iterable[str],
+) -> Dict[str, StakingProgram]:
+    """Get the parameters of several staking contracts, only reading stale ones"""
+    programs = get_cached_staking_programs(staking_token_addresses)
+    missing = [address for address, program in programs.items() if program is None]
+    if not missing:
+        return cast(Dict[str, StakingProgram], programs)
+
+    loaded = await _read_staking_programs_multicall(missing)
+    unread = [address for address in missing if address not in loaded]
+    loaded.update(
+        zip(unread, await asyncio.gather(*map(_read_staking_program, unread)))
+    )
+    for address, program in loaded.items():
+        store_staking_program(address, program)
+        programs[address] = program
+    return cast(Dict[str, StakingProgram], programs)
+
+
+async def get_staking_program(staking_token_address: str) -> StakingProgram:
+    """Get the parameters of a staking contract"""
+    programs = await get_staking_programs([staking_token_address])
+    return programs[async_web3.to_checksum_address(staking_token_address)]
+
+
+async def get_staking_status(
+    mech_contract_address: str,
+    staking_token_address: str,
+    service_id: int,
+    safe_address: str,
+    mech_request_count_method: Optional[str] = None,
+) -> dict:
+    """Get the staking status"""
+    await get_session()
+    functions = load_contract(staking_token_address, "staking_token").functions
+
+    (program, map_service_info, mech_request_count, service_info) = (
+        await asyncio.gather(
+            get_staking_program(staking_token_address),
+            functions.mapServiceInfo(service_id).call(),
+            get_mech_request_count(
+                mech_contract_address=mech_contract_address,
+                requester_address=safe_address,
+                method=mech_request_count_method,
+            ),
+            functions.getServiceInfo(service_id).call(),
+        )
+    )
+
+    return format_staking_status(
+        reward=map_service_info[3],
+        mech_request_count=mech_request_count,
+        service_info=service_info,
+        **program_status_values(program),
+        metadata=await get_staking_metadata(program.metadata_hash),
+    )
+
+
+async def _get_staking_statuses_multicall(staking_params: List[dict]) -> List[Any]:
+    """Get the staking status of several services through Multicall3"""
+    service_calls = [get_staking_status_calls(**params) for params in staking_params]
+
+    # Reads shared between services are only made once
+    calls = list(
+        dict.fromkeys(call for calls in service_calls for call in calls.values())
+    )
+
+    try:
+        programs, call_results = await asyncio.gather(
+            get_staking_programs(
+                params["staking_token_address"] for params in staking_params
+            ),
+            _try_multicall(calls),
+        )
+    except (ContractLogicError, BadFunctionCallOutput, ValueError) as e:
+        logger.warning("Failed to read the staking contracts: %s", e)
+        call_results = None
+    if call_results is None:
+        # Each service surfaces its own error through the direct path
+        return list(
+            await asyncio.gather(
+                *(get_staking_status(**params) for params in staking_params),
+                return_exceptions=True,
+            )
+        )
+    results = dict(zip(calls, call_results))
+
+    async def _status(params: dict, calls_by_name: Dict[str, ContractCall]) -> dict:
+        values = get_staking_status_values(calls_by_name, results)
+        if values is None:
+            # Let the direct path surface the actual error
+            return await get_staking_status(**params)
+        program = programs[
+            async_web3.to_checksum_address(params["staking_token_address"])
+        ]
+        return format_staking_status(
+            **values,
+            **program_status_values(program),
+            metadata=await get_staking_metadata(program.metadata_hash),
+        )
+
+    return list(
+        await asyncio.gather(
+            *map(_status, staking_params, service_calls), return_exceptions=True
+        )
+    )
+
+
+async def get_staking_statuses(staking_params: List[dict]) -> List[Any]:
+    """Get the staking status of several services, in the same order as the given parameters"""
+    # A failed service gets its exception, without failing the others
+    if USE_MULTICALL:
+        return await _get_staking_statuses_multicall(staking_params)
+
+    return list(
+        await asyncio.gather(
+            *(get_staking_status(**params) for params in staking_params),
+            return_exceptions=True,
+        )
+    )
+
+
+async def _read_slot_counts(staking_token_addresses: Sequence[str]) -> SlotCounts:
+    """Count the staked services without Multicall3"""
+    await get_session()
+    block = await async_web3.eth.block_number
+    contracts = [
+        load_contract(address, "staking_token") for address in staking_token_addresses
+    ]
+    all_ids = await asyncio.gather(
+        *(
+            contract.functions.getServiceIds().call(block_identifier=block)
+            for contract in contracts
+        )
+    )
+    missing = [c for c in contracts if c.address not in slot_capacity]
+    capacities = await asyncio.gather(
+        *(contract.functions.maxNumServices().call() for contract in missing)
+    )
+    for contract, capacity in zip(missing, capacities):
+        slot_capacity[contract.address] = capacity
+    return SlotCounts(
+        block=block,
+        staked={
+            contract.address: len(ids) for contract, ids in zip(contracts, all_ids)
+        },
+    )
+
+
+async def _slots_changed(
+    staking_token_addresses: Sequence[str], counts: SlotCounts
+) -> bool:
+    """Whether services were staked or unstaked after the counts were read"""
+    await get_session()
+    try:
+        logs = await async_web3.eth.get_logs(
+            cast(
+                FilterParams,
+                get_slot_event_filter(staking_token_addresses, counts.block + 1),
+            )
+        )
+    except ValueError as e:
+        # For example, once the block range grows past the RPC's limit
+        logger.warning("Failed to read the staking events: %s", e)
+        return True
+    return bool(logs)
+
+
+async def _count_slots(staking_token_addresses: Sequence[str]) -> SlotCounts:
+    """Count the staked services, through Multicall3 when possible"""
+    calls = get_slot_calls(staking_token_addresses)
+    results = await _try_multicall(calls)
+    counts = make_slot_counts(calls, results) if results is not None else None
+    return counts or await _read_slot_counts(staking_token_addresses)
+
+
+async def get_slots() -> dict:
+    """Get the available slots in all staking contracts"""
+    addresses = get_staking_contract_addresses()
+    counts = get_cached_slot_counts()
+    if counts is None or await _slots_changed(addresses, counts):
+        counts = await _count_slots(addresses)
+        store_slot_counts(counts)
+    return get_available_slots(counts)
@@ -0,0 +1,363 @@
+"""Cache Module
+This module caches chain and IPFS data in memory and on disk."""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from triton.constants import TRITON_DATA_DIR
+
+logger = logging.getLogger("cache")
+
+_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+T = TypeVar("T")
+
+
+def write_json(path: Path, content: Any) -> None:
+    """Write a JSON file atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first so readers never see partial files
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, suffix=".tmp", delete=False, encoding="utf-8"
+    ) as tmp_file:
+        json.dump(content, tmp_file)
+    os.replace(tmp_file.name, path)
+
+
+def open_database(path: Path) -> sqlite3.Connection:
+    """Open a SQLite database, creating its directory when needed"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    # Readers are not blocked while a background task writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class SqliteStore:  # pylint: disable=too-few-public-methods
+    """SQLite database whose tables are created on first use"""
+
+    schema = ""
+
+    def __init__(self, path: Path) -> None:
+        """Constructor"""
+        self.path = path
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating its tables when needed"""
+        connection = open_database(self.path)
+        if not self._schema_ready:
+            connection.executescript(self.schema)
+            self._schema_ready = True
+        return connection
+
+
+class ContentCache:
+    """Content-addressed cache with an on-disk backing store"""
+
+    def __init__(self, directory: Path) -> None:
+        """Constructor"""
+        self.directory = directory
+        self._memory: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_async: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _key(content_hash: str) -> str:
+        """Normalize a content hash into a cache key"""
+        key = content_hash.lower().removeprefix("0x")
+        if not _HASH_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid content hash: {content_hash}")
+        return key
+
+    def _path(self, key: str) -> Path:
+        """Get the on-disk path of a cache key"""
+        return self.directory / f"{key}.json"
+
+    def lookup(self, content_hash: str) -> Optional[Any]:
+        """Get cached content from memory or disk, without fetching it"""
+        key = self._key(content_hash)
+        if key in self._memory:
+            return self._memory[key]
+
+        try:
+            content = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", key, e)
+            return None
+
+        self._memory[key] = content
+        return content
+
+    def store(self, content_hash: str, content: Any) -> None:
+        """Store content in memory and on disk"""
+        key = self._key(content_hash)
+        self._memory[key] = content
+        try:
+            write_json(self._path(key), content)
+        except OSError as e:
+            logger.warning("Failed to persist cache entry %s: %s", key, e)
+
+    def get(self, content_hash: str, fetch: Callable[[str], Any]) -> Any:
+        """Get content, fetching it once when it is not cached"""
+        content = self.lookup(content_hash)
+        if content is not None:
+            return content
+
+        # Concurrent callers for the same hash wait for a single fetch
+        key = self._key(content_hash)
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        assert future is not None  # nosec
+
+        if not owner:
+            return future.result()
+
+        try:
+            content = self.lookup(content_hash)
+            if content is None:
+                content = fetch(content_hash)
+                self.store(content_hash, content)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def get_async(
+        self, content_hash: str, fetch: Callable[[str], Awaitable[Any]]
+    ) -> Any:
+        """Like get, for coroutine fetch functions"""
+        content = self.lookup(content_hash)
+        if content is not None:
+            return content
+
+        key = self._key(content_hash)
+        future = self._in_flight_async.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight_async[key] = future
+        try:
+            content = await fetch(content_hash)
+            self.store(content_hash, content)
+            future.set_result(content)
+            return content
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the exception, nobody else needs to retrieve it
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._in_flight_async.get(key) is future:
+                del self._in_flight_async[key]
+
+    def clear(self) -> None:
+        """Clear the in-memory entries"""
+        self._memory.clear()
+
+
+class LruCache(Generic[T]):
+    """Thread-safe cache dropping the least recently used entries beyond its size"""
+
+    def __init__(self, size: int = 0) -> None:
+        """Constructor"""
+        self.size = size  # 0 is unbounded
+        self._entries: "OrderedDict[Hashable, T]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, create: Callable[[], T]) -> T:
+        """Get an entry, creating it outside the lock when missing"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = create()
+        with self._lock:
+            self._entries[key] = value
+            if self.size and len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+class RefreshingValue(Generic[T]):
+    """Value with a TTL that is served stale while it is being refreshed"""
+
+    def __init__(self, fetch: Callable[[], Optional[T]], ttl: float) -> None:
+        """Constructor"""
+        self.ttl = ttl
+        self._fetch = fetch
+        self._value: Optional[T] = None
+        self._updated_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the value was last fetched"""
+        if self._updated_at is None:
+            return None
+        return time.monotonic() - self._updated_at
+
+    def _update(self) -> Optional[T]:
+        """Fetch the value, keeping the previous one on failure"""
+        try:
+            value = self._fetch()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Failed to refresh a cached value: %s", e)
+            value = None
+
+        if value is not None:
+            self._value = value
+            self._updated_at = time.monotonic()
+        return self._value
+
+    def refresh(self) -> Optional[T]:
+        """Fetch the value now"""
+        with self._refresh_lock:
+            return self._update()
+
+    def _revalidate(self) -> None:
+        """Refresh the value in the background, unless a refresh is running"""
+        if not self._refresh_lock.acquire(  # pylint: disable=consider-using-with
+            blocking=False
+        ):
+            return
+
+        def _run() -> None:
+            try:
+                self._update()
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=_run, name="revalidate", daemon=True).start()
+
+    def get(self) -> Optional[T]:
+        """Get the value, only waiting for the fetch when nothing is cached"""
+        if self._value is None:
+            return self.refresh()
+
+        age = self.age
+        if age is not None and age > self.ttl:
+            self._revalidate()
+        return self._value
+
+
+class JsonRecord:
+    """Small key-value record persisted as a JSON file"""
+
+    def __init__(self, path: Path) -> None:
+        """Constructor"""
+        self.path = path
+        self._data: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        """Read the record from disk on first use"""
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._data = {}
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable record %s: %s", self.path, e)
+                self._data = {}
+        return cast(Dict[str, Any], self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a recorded value"""
+        with self._lock:
+            return self._load().get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        """Record a value and persist the record"""
+        with self._lock:
+            data = self._load()
+            if data.get(key) == value:
+                return
+            data[key] = value
+            try:
+                write_json(self.path, data)
+            except OSError as e:
+                logger.warning("Failed to persist record %s: %s", self.path, e)
+
+    def update(self, values: Dict[str, Any]) -> None:
+        """Record several values and persist the record once"""
+        with self._lock:
+            data = self._load()
+            changed = {
+                key: value for key, value in values.items() if data.get(key) != value
+            }
+            if not changed:
+                return
+            data.update(changed)
+            try:
+                write_json(self.path, data)
+            except OSError as e:
+                logger.warning("Failed to persist record %s: %s", self.path, e)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Get a snapshot of the recorded values"""
+        with self._lock:
+            return list(self._load().items())
+
+    def delete(self, key: str) -> None:
+        """Forget a value and persist the record"""
+        with self._lock:
+            data = self._load()
+            if key not in data:
+                return
+            del data[key]
+            try:
+                write_json(self.path, data)
+            except OSError as e:
+                logger.warning("Failed to persist record %s: %s", self.path, e)
+
+    def reset(self) -> None:
+        """Forget the in-memory copy, so that the record is read again"""
+        with self._lock:
+            self._data = None
+
+
+metadata_cache = ContentCache(Path(TRITON_DATA_DIR) / "ipfs")
+mech_counters = JsonRecord(Path(TRITON_DATA_DIR) / "mech_counters.json")
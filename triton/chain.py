@@ -2,39 +2,70 @@
 This module provides functions to interact with the blockchain."""
 
 import datetime
+import functools
 import json
 import logging
 import math
 import os
+import threading
+import time
 from http import HTTPStatus
 from pathlib import Path
-from typing import cast
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 from urllib.parse import urlencode
 
 import dotenv
 import pytz
 import requests
+from eth_abi.exceptions import DecodingError
+from eth_utils.abi import (
+    collapse_if_tuple,
+    event_abi_to_log_topic,
+    function_abi_to_4byte_selector,
+)
 from operate.constants import IPFS_ADDRESS
-from web3 import Web3
+from web3 import AsyncWeb3, Web3
 from web3.contract import Contract
-from web3.exceptions import ABIFunctionNotFound, ContractLogicError
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+from web3.types import FilterParams
 
+from triton.cache import LruCache, RefreshingValue, mech_counters, metadata_cache
 from triton.constants import (
+    CONTRACT_CACHE_SIZE,
     LOCAL_TIMEZONE,
+    MULTICALL3_ADDRESS,
+    MULTICALL_BATCH_SIZE,
+    OLAS_PRICE_TTL,
     OLAS_TOKEN_ADDRESS_GNOSIS,
     STAKING_CONTRACTS,
+    STAKING_PROGRAM_RECHECK,
+    USE_MULTICALL,
 )
+from triton.rpc import PooledHTTPProvider, RpcPool, parse_endpoints
 from triton.tools import wei_to_olas
 
 logger = logging.getLogger("chain")
 
 dotenv.load_dotenv(override=True)
 
-GNOSIS_RPC = os.getenv("GNOSIS_RPC")
+GNOSIS_RPC_ENDPOINTS = parse_endpoints(os.getenv("GNOSIS_RPC"))
+GNOSIS_RPC = GNOSIS_RPC_ENDPOINTS[0]
 COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY")
 
 # Instantiate the web3 provider and ethereum client
-web3 = Web3(Web3.HTTPProvider(GNOSIS_RPC))
+rpc_pool = RpcPool(GNOSIS_RPC_ENDPOINTS)
+web3 = Web3(PooledHTTPProvider(rpc_pool))
 
 
 def get_native_balance(address: str):
@@ -44,19 +75,171 @@ def get_native_balance(address: str):
     return balance_ether
 
 
-def load_contract(
-    contract_address: str, abi_file: str, has_abi_key: bool = True
-) -> Contract:
-    """Load a smart contract"""
+class FunctionSpec(NamedTuple):
+    """Precompiled ABI data of a contract function"""
+
+    selector: bytes
+    input_types: Tuple[str, ...]
+    output_types: Tuple[str, ...]
+
+
+class ContractCall(NamedTuple):
+    """A contract read to be aggregated through Multicall3"""
+
+    address: str
+    abi_file: str
+    fn_name: str
+    args: tuple = ()
+    has_abi_key: bool = True
+
+
+@functools.lru_cache(maxsize=None)
+def load_abi(abi_file: str, has_abi_key: bool = True) -> list:
+    """Load and parse a contract ABI"""
     with open(Path("abis", f"{abi_file}.json"), "r", encoding="utf-8") as f:
         contract_abi = json.load(f)
         if has_abi_key:
             contract_abi = contract_abi["abi"]
+    return contract_abi
+
+
+@functools.lru_cache(maxsize=None)
+def get_function_specs(
+    abi_file: str, has_abi_key: bool = True
+) -> Dict[str, FunctionSpec]:
+    """Precompile the selectors and argument types of the functions in an ABI"""
+    functions = [
+        item for item in load_abi(abi_file, has_abi_key) if item["type"] == "function"
+    ]
+    names = [function["name"] for function in functions]
+    return {
+        function["name"]: FunctionSpec(
+            selector=function_abi_to_4byte_selector(function),
+            input_types=tuple(collapse_if_tuple(i) for i in function["inputs"]),
+            output_types=tuple(collapse_if_tuple(o) for o in function["outputs"]),
+        )
+        for function in functions
+        # Overloaded functions need web3's argument matching
+        if names.count(function["name"]) == 1
+    }
+
 
-    contract = web3.eth.contract(
-        address=web3.to_checksum_address(contract_address), abi=contract_abi
+# Contracts of the sync and async clients, bounded together by CONTRACT_CACHE_SIZE
+_contracts: LruCache[Any] = LruCache(CONTRACT_CACHE_SIZE)
+
+
+def load_client_contract(
+    client: Union[Web3, AsyncWeb3],
+    contract_address: str,
+    abi_file: str,
+    has_abi_key: bool = True,
+) -> Any:
+    """Load a smart contract on a web3 client, through the shared contract cache"""
+    address = client.to_checksum_address(contract_address)
+    return _contracts.get(
+        (type(client), address, abi_file, has_abi_key),
+        lambda: client.eth.contract(
+            address=address, abi=load_abi(abi_file, has_abi_key)
+        ),
     )
-    return contract
+
+
+def load_contract(
+    contract_address: str, abi_file: str, has_abi_key: bool = True
+) -> Contract:
+    """Load a smart contract"""
+    return load_client_contract(web3, contract_address, abi_file, has_abi_key)
+
+
+def clear_contract_cache() -> None:
+    """Clear the ABI and contract caches"""
+    _contracts.clear()
+    load_abi.cache_clear()
+    get_function_specs.cache_clear()
+
+
+def preload_contracts() -> None:
+    """Parse the ABIs and instantiate the well-known contracts"""
+    for abi_file, has_abi_key in (
+        ("mech", False),
+        ("mech_activity", True),
+        ("multicall3", False),
+        ("olas", False),
+        ("staking_token", True),
+    ):
+        get_function_specs(abi_file, has_abi_key)
+
+    load_contract(MULTICALL3_ADDRESS, "multicall3", has_abi_key=False)
+    load_contract(OLAS_TOKEN_ADDRESS_GNOSIS, "olas", has_abi_key=False)
+    for contract_data in STAKING_CONTRACTS.values():
+        load_contract(contract_data["address"], "staking_token")
+
+
+def encode_multicall(calls: Sequence[ContractCall]) -> List[tuple]:
+    """Encode contract reads as Multicall3 aggregate3 calls"""
+    encoded_calls = []
+    for call in calls:
+        spec = get_function_specs(call.abi_file, call.has_abi_key)[call.fn_name]
+        encoded_calls.append(
+            (
+                web3.to_checksum_address(call.address),
+                True,  # allowFailure
+                spec.selector + web3.codec.encode(spec.input_types, call.args),
+            )
+        )
+    return encoded_calls
+
+
+def decode_multicall(
+    calls: Sequence[ContractCall], return_data: Sequence[tuple]
+) -> List[Optional[Any]]:
+    """Decode the results of a Multicall3 aggregate3 call. Failed calls are returned as None"""
+    results: List[Optional[Any]] = []
+    for call, (success, data) in zip(calls, return_data):
+        if not success:
+            results.append(None)
+            continue
+        spec = get_function_specs(call.abi_file, call.has_abi_key)[call.fn_name]
+        try:
+            decoded = tuple(web3.codec.decode(spec.output_types, data))
+        except DecodingError:
+            # Calls to addresses without code succeed with empty data
+            results.append(None)
+            continue
+        results.append(decoded[0] if len(decoded) == 1 else decoded)
+    return results
+
+
+def multicall(calls: Sequence[ContractCall]) -> List[Optional[Any]]:
+    """Aggregate contract reads through Multicall3. Failed calls are returned as None"""
+    multicall_contract = load_contract(
+        MULTICALL3_ADDRESS, "multicall3", has_abi_key=False
+    )
+
+    results: List[Optional[Any]] = []
+    for start in range(0, len(calls), MULTICALL_BATCH_SIZE):
+        end = start + MULTICALL_BATCH_SIZE
+        batch = calls[start:end]
+        return_data = multicall_contract.functions.aggregate3(
+            encode_multicall(batch)
+        ).call()
+        results.extend(decode_multicall(batch, return_data))
+
+    return results
+
+
+def _try_multicall(calls: Sequence[ContractCall]) -> Optional[List[Optional[Any]]]:
+    """Aggregate contract reads through Multicall3. Returns None if it is disabled or failed"""
+    # The callers fall back to sequential reads on None
+    if not USE_MULTICALL:
+        return None
+    try:
+        return multicall(calls)
+    except (ContractLogicError, BadFunctionCallOutput, ValueError) as e:
+        logger.warning(
+            "Multicall3 read failed, falling back to sequential reads: %s", e
+        )
+        return None
 
 
 def get_olas_balance(address: str):
@@ -66,51 +249,151 @@ def get_olas_balance(address: str):
     return olas_balance
 
 
+def get_balances(
+    native_addresses: Iterable[str], olas_addresses: Iterable[str]
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Get the native and OLAS balances of several addresses, reading each address once"""
+    native_addresses = list(native_addresses)
+    olas_addresses = list(olas_addresses)
+    unique_native = list(dict.fromkeys(map(web3.to_checksum_address, native_addresses)))
+    unique_olas = list(dict.fromkeys(map(web3.to_checksum_address, olas_addresses)))
+    calls = get_balance_calls(unique_native, unique_olas)
+
+    results = _try_multicall(calls) or [None] * len(calls)
+
+    # Addresses whose batched read failed are read one by one
+    n_native = len(unique_native)
+    native_wei = dict(zip(unique_native, results[:n_native]))
+    olas_wei = dict(zip(unique_olas, results[n_native:]))
+    native_balances = {
+        address: (
+            web3.from_wei(balance, "ether")
+            if balance is not None
+            else get_native_balance(address)
+        )
+        for address, balance in native_wei.items()
+    }
+    olas_balances = {
+        address: balance if balance is not None else get_olas_balance(address)
+        for address, balance in olas_wei.items()
+    }
+
+    return (
+        {
+            address: native_balances[web3.to_checksum_address(address)]
+            for address in native_addresses
+        },
+        {
+            address: olas_balances[web3.to_checksum_address(address)]
+            for address in olas_addresses
+        },
+    )
+
+
+def get_balance_calls(
+    native_addresses: Sequence[str], olas_addresses: Sequence[str]
+) -> List[ContractCall]:
+    """Get the Multicall3 reads of the native and OLAS balances of several addresses"""
+    return [
+        ContractCall(
+            MULTICALL3_ADDRESS, "multicall3", "getEthBalance", (address,), False
+        )
+        for address in native_addresses
+    ] + [
+        ContractCall(OLAS_TOKEN_ADDRESS_GNOSIS, "olas", "balanceOf", (address,), False)
+        for address in olas_addresses
+    ]
+
+
+# Older mechs use mapRequestsCounts, newer ones mapRequestCounts
+MECH_REQUEST_COUNT_METHODS = ("mapRequestsCounts", "mapRequestCounts")
+
+
 def get_mech_request_count(
     mech_contract_address: str,
     requester_address: str,
+    method: Optional[str] = None,
 ) -> int:
     """Get the number of requests made by a requester to a mech"""
+    method = method or get_mech_request_count_method(
+        mech_contract_address, requester_address
+    )
     mech_contract = load_contract(mech_contract_address, "mech", has_abi_key=False)
     try:
-        mech_request_count = mech_contract.functions.mapRequestsCounts(
-            requester_address
-        ).call()
-    except (ContractLogicError, ABIFunctionNotFound, ValueError):
-        # Use mapRequestCounts for newer mechs
-        mech_request_count = mech_contract.functions.mapRequestCounts(
-            requester_address
-        ).call()
-
-    return mech_request_count
+        return mech_contract.get_function_by_name(method)(requester_address).call()
+    except (ContractLogicError, BadFunctionCallOutput):
+        # A recorded counter that reverts is probed again on the next read
+        mech_counters.delete(web3.to_checksum_address(mech_contract_address))
+        raise
+
+
+def find_mech_request_count_method(mech_code: bytes) -> Optional[str]:
+    """Find the request counter a mech implements from its bytecode"""
+    # Selectors are pushed as immediates by the dispatcher, proxies have none of them
+    specs = get_function_specs("mech", has_abi_key=False)
+    implemented = [
+        method
+        for method in MECH_REQUEST_COUNT_METHODS
+        if specs[method].selector in mech_code
+    ]
+    return implemented[0] if len(implemented) == 1 else None
 
 
-def get_staking_status(  # pylint: disable=too-many-locals
+def get_mech_request_count_method(
     mech_contract_address: str,
-    staking_token_address: str,
-    activity_checker_address: str,
-    service_id: int,
-    safe_address: str,
-) -> dict:
-    """Get the staking status"""
-    staking_token_contract = load_contract(staking_token_address, "staking_token")
-    activity_checker_contract = load_contract(activity_checker_address, "mech_activity")
+    requester_address: str,
+) -> str:
+    """Find out which request counter a mech implements"""
+    mech_contract_address = web3.to_checksum_address(mech_contract_address)
+    method = mech_counters.get(mech_contract_address)
+    if method is not None:
+        return method
+
+    method = find_mech_request_count_method(web3.eth.get_code(mech_contract_address))
+    if method is None:
+        mech_contract = load_contract(mech_contract_address, "mech", has_abi_key=False)
+        try:
+            mech_contract.functions.mapRequestsCounts(requester_address).call()
+            method = "mapRequestsCounts"
+        except (ContractLogicError, BadFunctionCallOutput):
+            # Other errors, like an RPC rate limit, say nothing about the mech
+            method = "mapRequestCounts"
+
+    mech_counters.set(mech_contract_address, method)
+    return method
+
+
+def fetch_staking_metadata(metadata_hash: str) -> dict:
+    """Fetch the staking program metadata from the IPFS gateway"""
+    ipfs_address = IPFS_ADDRESS.format(hash=metadata_hash)
+    response = requests.get(ipfs_address, timeout=30)
+    if response.status_code != HTTPStatus.OK:
+        raise requests.RequestException(
+            f"Failed to fetch data from {ipfs_address}: {response.status_code}"
+        )
+    return response.json()
 
-    # Rewards
-    service_info = staking_token_contract.functions.mapServiceInfo(service_id).call()
-    accrued_rewards = wei_to_olas(service_info[3])
 
-    # Request count (total)
-    mech_request_count = get_mech_request_count(
-        mech_contract_address=mech_contract_address,
-        requester_address=safe_address,
-    )
+def get_staking_metadata(metadata_hash: str) -> dict:
+    """Get the staking program metadata, fetching it from IPFS when not cached"""
+    return metadata_cache.get(metadata_hash, fetch_staking_metadata)
+
+
+def format_staking_status(  # pylint: disable=too-many-arguments
+    *,
+    reward: int,
+    mech_request_count: int,
+    service_info: tuple,
+    liveness_ratio: int,
+    liveness_period: int,
+    checkpoint_ts: int,
+    metadata: dict,
+) -> dict:
+    """Build the staking status from the raw contract reads"""
 
     # Request count (last checkpoint)
-    service_info = (staking_token_contract.functions.getServiceInfo(service_id).call())[
-        2
-    ]
-    mech_request_count_on_last_checkpoint = service_info[1] if service_info else 0
+    nonces = service_info[2]
+    mech_request_count_on_last_checkpoint = nonces[1] if nonces else 0
 
     # Request count (current epoch)
     mech_requests_this_epoch = (
@@ -118,35 +401,417 @@ def get_staking_status(  # pylint: disable=too-many-locals
     )
 
     # Required requests
-    liveness_ratio = activity_checker_contract.functions.livenessRatio().call()
     mech_requests_24h_threshold = math.ceil((liveness_ratio * 60 * 60 * 24) / 10**18)
 
     # Epoch end
-    liveness_period = staking_token_contract.functions.livenessPeriod().call()
-    checkpoint_ts = staking_token_contract.functions.tsCheckpoint().call()
     epoch_end = datetime.datetime.fromtimestamp(
         checkpoint_ts + liveness_period,
         pytz.timezone(LOCAL_TIMEZONE),
     )
 
-    metadata_hash = staking_token_contract.functions.metadataHash().call().hex()
-    ipfs_address = IPFS_ADDRESS.format(hash=metadata_hash)
-    response = requests.get(ipfs_address, timeout=30)
-    if response.status_code != HTTPStatus.OK:
-        raise requests.RequestException(
-            f"Failed to fetch data from {ipfs_address}: {response.status_code}"
-        )
-    metadata = response.json()
-
     return {
-        "accrued_rewards": accrued_rewards,
+        "accrued_rewards": wei_to_olas(reward),
         "mech_requests_this_epoch": mech_requests_this_epoch,
         "required_mech_requests": mech_requests_24h_threshold,
         "epoch_end": epoch_end.strftime("%Y-%m-%d %H:%M:%S %Z"),
+        "checkpoint_ts": checkpoint_ts,
+        "epoch_end_ts": checkpoint_ts + liveness_period,
         "metadata": metadata,
     }
 
 
+class StakingProgram(NamedTuple):
+    """Staking contract parameters that only change at checkpoints"""
+
+    activity_checker: str
+    liveness_ratio: int
+    liveness_period: int
+    checkpoint_ts: int
+    metadata_hash: str
+    loaded_at: float
+
+    @property
+    def epoch_end(self) -> int:
+        """Timestamp after which the next checkpoint can be called"""
+        return self.checkpoint_ts + self.liveness_period
+
+    def is_stale(self, now: float) -> bool:
+        """Whether the parameters must be read again"""
+        if now < self.epoch_end:
+            return False
+        # Until someone calls the checkpoint, tsCheckpoint keeps its old value
+        return now - self.loaded_at >= STAKING_PROGRAM_RECHECK
+
+
+_staking_programs: Dict[str, StakingProgram] = {}
+_staking_programs_lock = threading.Lock()
+
+
+def get_cached_staking_program(staking_token_address: str) -> Optional[StakingProgram]:
+    """Get the cached parameters of a staking contract, unless they are stale"""
+    program = _staking_programs.get(web3.to_checksum_address(staking_token_address))
+    if program is None or program.is_stale(time.time()):
+        return None
+    return program
+
+
+def store_staking_program(staking_token_address: str, program: StakingProgram) -> None:
+    """Cache the parameters of a staking contract"""
+    with _staking_programs_lock:
+        _staking_programs[web3.to_checksum_address(staking_token_address)] = program
+
+
+def invalidate_staking_program(staking_token_address: Optional[str] = None) -> None:
+    """Drop the cached parameters of a staking contract, e.g. on a Checkpoint event"""
+    with _staking_programs_lock:
+        if staking_token_address is None:
+            _staking_programs.clear()
+        else:
+            _staking_programs.pop(web3.to_checksum_address(staking_token_address), None)
+
+
+def get_cached_staking_programs(
+    staking_token_addresses: Iterable[str],
+) -> Dict[str, Optional[StakingProgram]]:
+    """Get the cached parameters of several staking contracts, None for stale ones"""
+    return {
+        address: get_cached_staking_program(address)
+        for address in dict.fromkeys(
+            map(web3.to_checksum_address, staking_token_addresses)
+        )
+    }
+
+
+def get_staking_program_calls(staking_token_address: str) -> Dict[str, ContractCall]:
+    """Get the contract reads of the staking contract parameters"""
+    staking_token_address = web3.to_checksum_address(staking_token_address)
+    return {
+        name: ContractCall(staking_token_address, "staking_token", fn_name)
+        for name, fn_name in (
+            ("activity_checker", "activityChecker"),
+            ("liveness_period", "livenessPeriod"),
+            ("checkpoint_ts", "tsCheckpoint"),
+            ("metadata_hash", "metadataHash"),
+        )
+    }
+
+
+def get_liveness_ratio_call(activity_checker_address: str) -> ContractCall:
+    """Get the contract read of the liveness ratio of an activity checker"""
+    return ContractCall(
+        web3.to_checksum_address(activity_checker_address),
+        "mech_activity",
+        "livenessRatio",
+    )
+
+
+def make_staking_program(values: Dict[str, Any], liveness_ratio: int) -> StakingProgram:
+    """Build the staking contract parameters from their reads"""
+    return StakingProgram(
+        activity_checker=values["activity_checker"],
+        liveness_ratio=liveness_ratio,
+        liveness_period=values["liveness_period"],
+        checkpoint_ts=values["checkpoint_ts"],
+        metadata_hash=values["metadata_hash"].hex(),
+        loaded_at=time.time(),
+    )
+
+
+def get_staking_programs_calls(
+    staking_token_addresses: Sequence[str],
+) -> List[ContractCall]:
+    """Get the contract reads of the parameters of several staking contracts"""
+    return [
+        call
+        for address in staking_token_addresses
+        for call in get_staking_program_calls(address).values()
+    ]
+
+
+def get_staking_program_values(
+    staking_token_addresses: Sequence[str], results: Sequence[Any]
+) -> List[Dict[str, Any]]:
+    """Pick the parameter reads of several staking contracts from the multicall results"""
+    by_call = dict(zip(get_staking_programs_calls(staking_token_addresses), results))
+    return [
+        {
+            name: by_call[call]
+            for name, call in get_staking_program_calls(address).items()
+        }
+        for address in staking_token_addresses
+    ]
+
+
+def get_liveness_ratio_calls(all_values: List[Dict[str, Any]]) -> List[ContractCall]:
+    """Get the liveness ratio reads of the activity checkers that were read"""
+    return [
+        get_liveness_ratio_call(values["activity_checker"])
+        for values in all_values
+        if values["activity_checker"] is not None
+    ]
+
+
+def build_staking_program(
+    values: Dict[str, Any], ratios: Dict[ContractCall, Any]
+) -> Optional[StakingProgram]:
+    """Build the staking contract parameters from batched reads. Returns None if any of them failed"""
+    if any(value is None for value in values.values()):
+        return None
+    liveness_ratio = ratios.get(get_liveness_ratio_call(values["activity_checker"]))
+    if liveness_ratio is None:
+        return None
+    return make_staking_program(values, liveness_ratio)
+
+
+def _read_staking_program(staking_token_address: str) -> StakingProgram:
+    """Read the parameters of a staking contract one call at a time"""
+    functions = load_contract(staking_token_address, "staking_token").functions
+    activity_checker = functions.activityChecker().call()
+    activity_checker_contract = load_contract(activity_checker, "mech_activity")
+    return make_staking_program(
+        {
+            "activity_checker": activity_checker,
+            "liveness_period": functions.livenessPeriod().call(),
+            "checkpoint_ts": functions.tsCheckpoint().call(),
+            "metadata_hash": functions.metadataHash().call(),
+        },
+        activity_checker_contract.functions.livenessRatio().call(),
+    )
+
+
+def _read_staking_programs_multicall(
+    staking_token_addresses: Sequence[str],
+) -> Dict[str, StakingProgram]:
+    """Read the parameters of several staking contracts through Multicall3"""
+    # Contracts left out are read one call at a time
+    results = _try_multicall(get_staking_programs_calls(staking_token_addresses))
+    if results is None:
+        return {}
+    all_values = get_staking_program_values(staking_token_addresses, results)
+
+    # The liveness ratio lives in the activity checker, which is only known now
+    ratio_calls = get_liveness_ratio_calls(all_values)
+    ratio_results = _try_multicall(ratio_calls)
+    if ratio_results is None:
+        return {}
+    ratios = dict(zip(ratio_calls, ratio_results))
+
+    programs = {}
+    for address, values in zip(staking_token_addresses, all_values):
+        # Let the direct reads surface the actual error of failed reads
+        programs[address] = build_staking_program(
+            values, ratios
+        ) or _read_staking_program(address)
+    return programs
+
+
+def get_staking_programs(
+    staking_token_addresses: Iterable[str],
+) -> Dict[str, StakingProgram]:
+    """Get the parameters of several staking contracts, only reading stale ones"""
+    programs = get_cached_staking_programs(staking_token_addresses)
+    missing = [address for address, program in programs.items() if program is None]
+    if missing:
+        loaded = _read_staking_programs_multicall(missing)
+        for address in missing:
+            program = loaded.get(address) or _read_staking_program(address)
+            store_staking_program(address, program)
+            programs[address] = program
+
+    return cast(Dict[str, StakingProgram], programs)
+
+
+def get_staking_program(staking_token_address: str) -> StakingProgram:
+    """Get the parameters of a staking contract"""
+    return get_staking_programs([staking_token_address])[
+        web3.to_checksum_address(staking_token_address)
+    ]
+
+
+def get_staking_status(
+    mech_contract_address: str,
+    staking_token_address: str,
+    service_id: int,
+    safe_address: str,
+    mech_request_count_method: Optional[str] = None,
+) -> dict:
+    """Get the staking status"""
+    staking_token_contract = load_contract(staking_token_address, "staking_token")
+    program = get_staking_program(staking_token_address)
+
+    # Rewards
+    service_info = staking_token_contract.functions.mapServiceInfo(service_id).call()
+
+    # Request count (total)
+    mech_request_count = get_mech_request_count(
+        mech_contract_address=mech_contract_address,
+        requester_address=safe_address,
+        method=mech_request_count_method,
+    )
+
+    return format_staking_status(
+        reward=service_info[3],
+        mech_request_count=mech_request_count,
+        service_info=staking_token_contract.functions.getServiceInfo(service_id).call(),
+        liveness_ratio=program.liveness_ratio,
+        liveness_period=program.liveness_period,
+        checkpoint_ts=program.checkpoint_ts,
+        metadata=get_staking_metadata(program.metadata_hash),
+    )
+
+
+def get_staking_status_calls(
+    mech_contract_address: str,
+    staking_token_address: str,
+    service_id: int,
+    safe_address: str,
+    mech_request_count_method: Optional[str] = None,
+) -> Dict[str, ContractCall]:
+    """Get the per-service contract reads needed to build the staking status"""
+    staking_token_address = web3.to_checksum_address(staking_token_address)
+    mech_contract_address = web3.to_checksum_address(mech_contract_address)
+    safe_address = web3.to_checksum_address(safe_address)
+    calls = {
+        "map_service_info": ContractCall(
+            staking_token_address, "staking_token", "mapServiceInfo", (service_id,)
+        ),
+        "service_info": ContractCall(
+            staking_token_address, "staking_token", "getServiceInfo", (service_id,)
+        ),
+    }
+    # Without a known request counter, both are read and the one that works is used
+    mech_request_count_method = mech_request_count_method or mech_counters.get(
+        mech_contract_address
+    )
+    for method in (
+        MECH_REQUEST_COUNT_METHODS
+        if mech_request_count_method is None
+        else (mech_request_count_method,)
+    ):
+        calls[method] = ContractCall(
+            mech_contract_address, "mech", method, (safe_address,), has_abi_key=False
+        )
+    return calls
+
+
+def get_staking_status_values(
+    calls: Dict[str, ContractCall], results: Dict[ContractCall, Any]
+) -> Optional[Dict[str, Any]]:
+    """Pick the staking status reads of a service. Returns None if any of them failed"""
+    values = {name: results[call] for name, call in calls.items()}
+    values["mech_request_count"] = None
+    methods = [method for method in MECH_REQUEST_COUNT_METHODS if method in values]
+    for method in methods:
+        count = values.pop(method)
+        if count is None and len(methods) == 1:
+            # The recorded counter failed, so the fallback read probes the mech again
+            mech_counters.delete(calls[method].address)
+        elif count is not None and values["mech_request_count"] is None:
+            values["mech_request_count"] = count
+            mech_counters.set(calls[method].address, method)
+    if any(value is None for value in values.values()):
+        return None
+
+    values["reward"] = values.pop("map_service_info")[3]
+    return values
+
+
+def program_status_values(program: StakingProgram) -> Dict[str, Any]:
+    """Get the staking status values shared by the services of a staking contract"""
+    return {
+        "liveness_ratio": program.liveness_ratio,
+        "liveness_period": program.liveness_period,
+        "checkpoint_ts": program.checkpoint_ts,
+    }
+
+
+def _get_staking_status_or_error(params: dict) -> Any:
+    """Get the staking status of a service, or the error that prevented it"""
+    try:
+        return get_staking_status(**params)
+    except Exception as e:  # pylint: disable=broad-except
+        return e
+
+
+def _get_staking_statuses_multicall(staking_params: List[dict]) -> List[Any]:
+    """Get the staking status of several services through Multicall3"""
+    try:
+        programs = get_staking_programs(
+            params["staking_token_address"] for params in staking_params
+        )
+    except (ContractLogicError, BadFunctionCallOutput, ValueError) as e:
+        # Each service surfaces its own error through the sequential path
+        logger.warning("Failed to read the staking contracts: %s", e)
+        return [_get_staking_status_or_error(params) for params in staking_params]
+
+    service_calls = [get_staking_status_calls(**params) for params in staking_params]
+    # Reads shared between services are only made once
+    calls = list(
+        dict.fromkeys(call for calls in service_calls for call in calls.values())
+    )
+    call_results = _try_multicall(calls)
+    if call_results is None:
+        return [_get_staking_status_or_error(params) for params in staking_params]
+    results = dict(zip(calls, call_results))
+
+    statuses: List[Any] = []
+    for params, calls_by_name in zip(staking_params, service_calls):
+        values = get_staking_status_values(calls_by_name, results)
+        if values is None:
+            # Let the sequential path surface the actual error
+            statuses.append(_get_staking_status_or_error(params))
+            continue
+
+        program = programs[web3.to_checksum_address(params["staking_token_address"])]
+        try:
+            metadata = get_staking_metadata(program.metadata_hash)
+        except Exception as e:  # pylint: disable=broad-except
+            statuses.append(e)
+            continue
+        statuses.append(
+            format_staking_status(
+                **values, **program_status_values(program), metadata=metadata
+            )
+        )
+
+    return statuses
+
+
+def get_staking_statuses(staking_params: List[dict]) -> List[Any]:
+    """Get the staking status of several services, in the same order as the given parameters"""
+    # A failed service gets its exception, without failing the others
+    if USE_MULTICALL:
+        return _get_staking_statuses_multicall(staking_params)
+
+    return [_get_staking_status_or_error(params) for params in staking_params]
+
+
+def get_staking_rewards(services: Sequence[Tuple[str, int]]) -> List[int]:
+    """Get the rewards of several (staking contract, service id) pairs, as of a checkpoint now"""
+    calls = [
+        ContractCall(
+            web3.to_checksum_address(staking_token_address),
+            "staking_token",
+            "calculateStakingReward",
+            (service_id,),
+        )
+        for staking_token_address, service_id in services
+    ]
+    results = _try_multicall(calls) or [None] * len(calls)
+
+    # Rewards whose batched read failed are read one by one
+    return [
+        (
+            reward
+            if reward is not None
+            else load_contract(call.address, "staking_token")
+            .functions.calculateStakingReward(*call.args)
+            .call()
+        )
+        for call, reward in zip(calls, results)
+    ]
+
+
 def get_olas_price() -> float | None:
     """Get OLAS price"""
     url = "https://api.coingecko.com/api/v3/simple/price?" + urlencode(
@@ -165,15 +830,169 @@ def get_olas_price() -> float | None:
     return price
 
 
-def get_slots() -> dict:
-    """Get the available slots in all staking contracts"""
-    slots = {}
+class PriceQuote(NamedTuple):
+    """Cached price and its age in seconds"""
+
+    price: Optional[float]
+    age: Optional[float]
+
+
+olas_price = RefreshingValue(get_olas_price, ttl=OLAS_PRICE_TTL)
+
+
+def get_olas_price_quote() -> PriceQuote:
+    """Get the cached OLAS price, refreshing it in the background when stale"""
+    price = olas_price.get()
+    return PriceQuote(price=price, age=olas_price.age)
+
+
+# Events that change the number of services staked in a staking contract
+SLOT_EVENTS = ("ServiceStaked", "ServiceUnstaked", "ServicesEvicted")
+
+
+class SlotCounts(NamedTuple):
+    """Number of services staked in each staking contract, as of a block"""
+
+    block: int
+    staked: Dict[str, int]
+
+
+slot_capacity: Dict[str, int] = {}
+_slot_counts: Optional[SlotCounts] = None  # pylint: disable=invalid-name
+
 
-    for contract_name, contract_data in STAKING_CONTRACTS.items():
-        staking_token_contract = load_contract(
-            cast(str, contract_data["address"]), "staking_token"
+def get_cached_slot_counts() -> Optional[SlotCounts]:
+    """Get the cached slot counts"""
+    return _slot_counts
+
+
+def store_slot_counts(counts: Optional[SlotCounts]) -> None:
+    """Cache the slot counts"""
+    global _slot_counts  # pylint: disable=global-statement
+    _slot_counts = counts
+
+
+def invalidate_slots() -> None:
+    """Drop the cached slot counts, e.g. on a ServiceStaked or ServiceUnstaked event"""
+    store_slot_counts(None)
+
+
+def get_staking_contract_addresses() -> List[str]:
+    """Get the checksum addresses of the known staking contracts"""
+    return [
+        web3.to_checksum_address(contract_data["address"])
+        for contract_data in STAKING_CONTRACTS.values()
+    ]
+
+
+def get_slot_calls(staking_token_addresses: Sequence[str]) -> List[ContractCall]:
+    """Get the reads needed to count the slots, skipping the known capacities"""
+    calls = [
+        ContractCall(
+            MULTICALL3_ADDRESS, "multicall3", "getBlockNumber", has_abi_key=False
         )
-        ids = staking_token_contract.functions.getServiceIds().call()
-        slots[contract_name] = cast(int, contract_data["slots"]) - len(ids)
+    ]
+    for address in staking_token_addresses:
+        # The contract has no count getter, so slots are counted with len() of the full
+        # array. It is only read again once a SLOT_EVENTS event shows up after the cache
+        calls.append(ContractCall(address, "staking_token", "getServiceIds"))
+        if address not in slot_capacity:
+            calls.append(ContractCall(address, "staking_token", "maxNumServices"))
+    return calls
+
+
+def make_slot_counts(
+    calls: Sequence[ContractCall], results: Sequence[Any]
+) -> Optional[SlotCounts]:
+    """Build the slot counts from their reads. Returns None if any of them failed"""
+    if any(result is None for result in results):
+        return None
+
+    block = 0
+    staked = {}
+    for call, result in zip(calls, results):
+        if call.fn_name == "getBlockNumber":
+            block = result
+        elif call.fn_name == "getServiceIds":
+            staked[call.address] = len(result)
+        else:
+            # The capacity is set when the staking contract is deployed
+            slot_capacity[call.address] = result
+    return SlotCounts(block=block, staked=staked)
+
+
+def get_slot_event_filter(
+    staking_token_addresses: Sequence[str], from_block: int
+) -> Dict[str, Any]:
+    """Get the log filter of the events that change the slot counts"""
+    events = {
+        item["name"]: item
+        for item in load_abi("staking_token")
+        if item["type"] == "event"
+    }
+    return {
+        "address": list(staking_token_addresses),
+        "fromBlock": from_block,
+        "toBlock": "latest",
+        "topics": [
+            ["0x" + event_abi_to_log_topic(events[name]).hex() for name in SLOT_EVENTS]
+        ],
+    }
 
-    return slots
+
+def get_available_slots(counts: SlotCounts) -> dict:
+    """Get the available slots of the known staking contracts"""
+    return {
+        contract_name: slot_capacity[address] - counts.staked[address]
+        for contract_name, address in zip(
+            STAKING_CONTRACTS, get_staking_contract_addresses()
+        )
+    }
+
+
+def _read_slot_counts(staking_token_addresses: Sequence[str]) -> SlotCounts:
+    """Count the staked services one call at a time"""
+    block = web3.eth.block_number
+    staked = {}
+    for address in staking_token_addresses:
+        functions = load_contract(address, "staking_token").functions
+        staked[address] = len(functions.getServiceIds().call(block_identifier=block))
+        if address not in slot_capacity:
+            slot_capacity[address] = functions.maxNumServices().call()
+    return SlotCounts(block=block, staked=staked)
+
+
+def _slots_changed(staking_token_addresses: Sequence[str], counts: SlotCounts) -> bool:
+    """Whether services were staked or unstaked after the counts were read"""
+    try:
+        return bool(
+            web3.eth.get_logs(
+                cast(
+                    FilterParams,
+                    get_slot_event_filter(staking_token_addresses, counts.block + 1),
+                )
+            )
+        )
+    except ValueError as e:
+        # For example, once the block range grows past the RPC's limit
+        logger.warning("Failed to read the staking events: %s", e)
+        return True
+
+
+def get_slots() -> dict:
+    """Get the available slots in all staking contracts"""
+    addresses = get_staking_contract_addresses()
+    counts = get_cached_slot_counts()
+    if counts is not None and _slots_changed(addresses, counts):
+        counts = None
+
+    if counts is None:
+        calls = get_slot_calls(addresses)
+        results = _try_multicall(calls)
+        if results is not None:
+            counts = make_slot_counts(calls, results)
+        if counts is None:
+            counts = _read_slot_counts(addresses)
+        store_slot_counts(counts)
+
+    return get_available_slots(counts)
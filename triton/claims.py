@@ -0,0 +1,97 @@
+"""Claims Module
+This module plans the claims of several services, and sends them through the master Safes.
+"""
+
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from aea.crypto.base import Crypto
+
+from triton.chain import get_staking_programs, get_staking_rewards, load_contract, web3
+from triton.constants import CHECKPOINT_GAS_LIMIT, CLAIM_GAS_LIMIT
+from triton.executor import run_blocking
+from triton.transactions import SafeTransaction, send_all
+
+
+class ClaimRequest(NamedTuple):
+    """Claim of the staking rewards of a service, executed by the master Safe"""
+
+    name: str
+    service_id: int
+    staking_contract: str
+    safe: str
+    crypto: Crypto
+    # Whether the epoch ended, so that the checkpoint is called before claiming
+    checkpoint: bool = False
+
+    @property
+    def signer(self) -> str:
+        """Address of the master EOA, which signs the claim"""
+        return self.crypto.address
+
+    @property
+    def transaction(self) -> SafeTransaction:
+        """Get the Safe transaction of the claim"""
+        data = load_contract(self.staking_contract, "staking_token").encodeABI(
+            fn_name="checkpointAndClaim" if self.checkpoint else "claim",
+            args=[self.service_id],
+        )
+        return SafeTransaction(
+            name=self.name,
+            safe=self.safe,
+            to=self.staking_contract,
+            data=data,
+            crypto=self.crypto,
+            gas=CHECKPOINT_GAS_LIMIT if self.checkpoint else CLAIM_GAS_LIMIT,
+        )
+
+
+class ClaimOutcome(NamedTuple):
+    """What happened to the claim of a service"""
+
+    reward: Optional[int] = None  # wei, read before the claim
+    tx_hash: Optional[str] = None
+    error: Optional[BaseException] = None
+
+
+def plan_claims(
+    requests: Sequence[ClaimRequest], now: Optional[float] = None
+) -> Tuple[List[ClaimRequest], List[int]]:
+    """Read the rewards of several services, and call the checkpoint where the epoch ended"""
+    now = time.time() if now is None else now
+    rewards = get_staking_rewards(
+        [(request.staking_contract, request.service_id) for request in requests]
+    )
+    programs = get_staking_programs(request.staking_contract for request in requests)
+    # Once one claim called the checkpoint, it is a no-op for the other services
+    planned = [
+        request._replace(
+            checkpoint=programs[
+                web3.to_checksum_address(request.staking_contract)
+            ].epoch_end
+            <= now
+        )
+        for request in requests
+    ]
+    return planned, rewards
+
+
+async def run_claims(
+    requests: Sequence[ClaimRequest], min_reward: float = 0
+) -> List[ClaimOutcome]:
+    """Claim the rewards of the services above a minimum reward in OLAS"""
+    planned, rewards = await run_blocking(plan_claims, requests)
+    claimable = [
+        index
+        for index, reward in enumerate(rewards)
+        if reward > 0 and reward >= min_reward * 1e18
+    ]
+    outcomes = [ClaimOutcome(reward=reward) for reward in rewards]
+    tx_hashes = await send_all([planned[index].transaction for index in claimable])
+    for index, tx_hash in zip(claimable, tx_hashes):
+        outcomes[index] = (
+            outcomes[index]._replace(error=tx_hash)
+            if isinstance(tx_hash, BaseException)
+            else outcomes[index]._replace(tx_hash=tx_hash)
+        )
+    return outcomes
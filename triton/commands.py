@@ -0,0 +1,522 @@
+"""Commands Module
+This module answers the Telegram commands, and holds the helpers they share with the bot tasks.
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from operator import methodcaller
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pytz
+from operate.operate_types import Chain
+from telegram import Message, Update
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from triton import async_chain
+from triton.chain import get_olas_price_quote, get_slots, get_staking_statuses, rpc_pool
+from triton.claims import ClaimOutcome, run_claims
+from triton.constants import (
+    ASYNC_WEB3,
+    BALANCE_HISTORY_WINDOW_DAYS,
+    GNOSISSCAN_ADDRESS_URL,
+    GNOSISSCAN_TX_URL,
+    LOCAL_TIMEZONE,
+    MANUAL_CLAIM,
+    OLAS_PRICE_TTL,
+    SERVICE_TIMEOUT,
+)
+from triton.executor import map_concurrently, run_blocking
+from triton.history import balance_history
+from triton.receipts import TrackedMessage, TrackedTransaction, receipt_tracker
+from triton.rpc import format_rpc_stats
+from triton.scheduler import PollScheduler
+from triton.service import (
+    TritonService,
+    check_balances,
+    check_balances_async,
+    withdraw_all,
+)
+from triton.tools import escape_markdown_v2, wei_to_olas
+
+logger = logging.getLogger("commands")
+
+# Balances shown by /history: (label, address role, asset)
+HISTORY_BALANCES = (
+    ("Agent EOA", "agent_eoa", "xDAI"),
+    ("Service Safe", "service_safe", "xDAI"),
+    ("Service Safe", "service_safe", "OLAS"),
+    ("Master EOA", "master_eoa", "xDAI"),
+    ("Master Safe", "master_safe", "xDAI"),
+)
+
+# Claims of the same master wallet use local nonces, so they are not sent concurrently
+claim_lock = asyncio.Lock()
+
+
+async def claim_rewards(
+    services: Sequence[TritonService], min_reward: float = 0
+) -> List[ClaimOutcome]:
+    """Claim the rewards of several services, returning the outcome of each"""
+    requests = await map_concurrently(methodcaller("get_claim_request"), services)
+    outcomes = [
+        ClaimOutcome(error=request if isinstance(request, BaseException) else None)
+        for request in requests
+    ]
+    claimable = [
+        index
+        for index, request in enumerate(requests)
+        if not isinstance(request, BaseException)
+    ]
+    try:
+        async with claim_lock:
+            claimed = await run_claims(
+                [requests[index] for index in claimable], min_reward=min_reward
+            )
+    except Exception as e:  # pylint: disable=broad-except
+        claimed = [ClaimOutcome(error=e)] * len(claimable)
+    for index, outcome in zip(claimable, claimed):
+        outcomes[index] = outcome
+    return outcomes
+
+
+async def withdraw_rewards(services: Sequence[TritonService]) -> List[Any]:
+    """Withdraw the rewards of several services, returning the result or the error of each"""
+    try:
+        return await withdraw_all(services)
+    except Exception as e:  # pylint: disable=broad-except
+        # The batched balance read failed, so none of them was withdrawn
+        return [e] * len(services)
+
+
+def format_claim(outcome: ClaimOutcome, min_reward: float = 0) -> str:
+    """Describe the outcome of a claim"""
+    if outcome.error is not None or outcome.reward is None:
+        return "Failed to claim the rewards"
+    if not outcome.reward:
+        return "No rewards to claim"
+    if outcome.tx_hash is None:
+        return (
+            f"Skipped the claim of {wei_to_olas(outcome.reward)}, "
+            f"below the {min_reward:g} OLAS minimum"
+        )
+    # The reward is read before the claim. The OLAS actually claimed are taken from the
+    # Transfer log of the receipt, and added to the line by the receipt tracker
+    return (
+        f"Sent the claim of about {wei_to_olas(outcome.reward)} in this "
+        f"[transaction]({GNOSISSCAN_TX_URL.format(tx_hash=outcome.tx_hash)}), "
+        "to the Service Safe."
+    )
+
+
+def withdrawal_result(
+    service_name: str, withdrawal: Any
+) -> Tuple[Optional[str], float]:
+    """Unpack a withdrawal result, treating failures as no withdrawal"""
+    if isinstance(withdrawal, BaseException):
+        logger.error("[%s] Failed to withdraw: %s", service_name, withdrawal)
+        return None, 0
+    return withdrawal
+
+
+def tracked_transaction(tx_hash: str, line: int, recipient: str) -> TrackedTransaction:
+    """Track a transaction reported in a line of a message"""
+    return TrackedTransaction(
+        tx_hash=tx_hash, line=line, recipient=recipient, sent_at=time.time()
+    )
+
+
+def markdown_prefix(tag: str) -> Callable[[str], str]:
+    """Start the Markdown lines of a service with its name and a tag"""
+    return lambda service_name: r"\[" + escape_markdown_v2(service_name) + r"] " + tag
+
+
+class TransactionReport:
+    """Lines of a message reporting transactions, and the transactions to follow up"""
+
+    def __init__(self) -> None:
+        """Initialize an empty report"""
+        self.lines: List[str] = []
+        self.transactions: List[TrackedTransaction] = []
+
+    def add_claims(
+        self,
+        service_items: List[Tuple[str, TritonService]],
+        outcomes: List[ClaimOutcome],
+        prefix: Callable[[str], str],
+        min_reward: float = 0,
+    ) -> None:
+        """Add a line per claim outcome"""
+        for (service_name, service), outcome in zip(service_items, outcomes):
+            if outcome.error is not None:
+                logger.error("[%s] Failed to claim: %s", service_name, outcome.error)
+            if outcome.tx_hash:
+                self.transactions.append(
+                    tracked_transaction(
+                        outcome.tx_hash, len(self.lines), service.service_safe
+                    )
+                )
+            self.lines.append(prefix(service_name) + format_claim(outcome, min_reward))
+
+    def add_withdrawals(
+        self,
+        service_items: List[Tuple[str, TritonService]],
+        withdrawals: List[Any],
+        prefix: Callable[[str], str],
+        safe_label: str = "Service Safe",
+    ) -> None:
+        """Add a Markdown line per withdrawal"""
+        for (service_name, service), withdrawal in zip(service_items, withdrawals):
+            tx_hash, value = withdrawal_result(service_name, withdrawal)
+            if not tx_hash:
+                self.lines.append(prefix(service_name) + "Cannot withdraw rewards")
+                continue
+
+            self.transactions.append(
+                tracked_transaction(
+                    tx_hash, len(self.lines), str(service.withdrawal_address)
+                )
+            )
+            self.lines.append(
+                prefix(service_name)
+                + f"Sent the [withdrawal transaction]({GNOSISSCAN_TX_URL.format(tx_hash=tx_hash)}). "
+                + f"{value:g} OLAS sent from the {safe_label} to [{service.withdrawal_address}]"
+                + f"({GNOSISSCAN_ADDRESS_URL.format(address=service.withdrawal_address)}) #withdraw"
+            )
+
+    def track(
+        self, message: Message, separator: str, parse_mode: Optional[str]
+    ) -> None:
+        """Follow up the transactions of the sent message until they are mined"""
+        receipt_tracker.track(
+            TrackedMessage(
+                chat_id=message.chat_id,
+                message_id=message.message_id,
+                lines=self.lines,
+                separator=separator,
+                parse_mode=parse_mode,
+                transactions=self.transactions,
+            )
+        )
+
+
+async def gather_balances(services: List[TritonService]) -> List[Any]:
+    """Check the balances of several services with one batched read"""
+    try:
+        if ASYNC_WEB3:
+            return await asyncio.wait_for(
+                check_balances_async(services), SERVICE_TIMEOUT
+            )
+        return await run_blocking(check_balances, services)
+    except Exception as e:  # pylint: disable=broad-except
+        # A failed batch fails every service, like individual failures would
+        logger.error("Failed to check balances: %s", e)
+        return [e] * len(services)
+
+
+async def gather_staking_statuses(services: List[TritonService]) -> List[Any]:
+    """Get the staking status of several services. Failed services get their exception"""
+    staking_params = await map_concurrently(
+        methodcaller("get_staking_params"), services
+    )
+    valid_staking_params = [
+        params for params in staking_params if not isinstance(params, BaseException)
+    ]
+    try:
+        if ASYNC_WEB3:
+            batch = await asyncio.wait_for(
+                async_chain.get_staking_statuses(valid_staking_params), SERVICE_TIMEOUT
+            )
+        else:
+            batch = await run_blocking(get_staking_statuses, valid_staking_params)
+    except Exception as e:  # pylint: disable=broad-except
+        # A failed batch fails every service, like individual failures would
+        logger.error("Failed to get the staking statuses: %s", e)
+        batch = [e] * len(valid_staking_params)
+    statuses = iter(batch)
+    return [
+        params if isinstance(params, BaseException) else next(statuses)
+        for params in staking_params
+    ]
+
+
+def format_history(service_name: str, service: TritonService, days: float) -> str:
+    """Describe the balance trends of a service"""
+    lines = [f"[{service_name}] Last {days:g} days"]
+    addresses = service.balance_addresses()
+    for label, role, asset in HISTORY_BALANCES:
+        trend = balance_history.get_trend(addresses[role], asset, days)
+        if trend is None:
+            lines.append(f"{label}: not enough samples yet")
+            continue
+
+        line = f"{label}: {trend.balance:g} {asset} ({trend.change_per_day:+.4g}/day)"
+        if asset == "xDAI":
+            line += f", burning {trend.burn_per_day:.4g} xDAI/day"
+            if trend.days_to_empty is not None:
+                line += f", empty in {trend.days_to_empty:.1f} days"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class Commands:
+    """Telegram command handlers"""
+
+    def __init__(
+        self,
+        get_services: Callable[[], Dict[str, TritonService]],
+        poll_scheduler: PollScheduler,
+    ) -> None:
+        """Initialize the handlers"""
+        # Read on every command, so reloaded configurations are picked up
+        self.get_services = get_services
+        self.poll_scheduler = poll_scheduler
+
+    async def staking_status(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,  # pylint: disable=unused-argument
+    ) -> None:
+        """Staking status"""
+        services = self.get_services()
+        messages = []
+        total_rewards = 0.0
+        service_names = list(services)
+        statuses, price_quote = await asyncio.gather(
+            gather_staking_statuses(list(services.values())),
+            run_blocking(get_olas_price_quote),
+        )
+        for service_name, status in zip(service_names, statuses):
+            if isinstance(status, BaseException):
+                logger.error(
+                    "[%s] Failed to get the staking status: %s", service_name, status
+                )
+                messages.append(f"[{service_name}] Cannot get the staking status")
+                continue
+
+            # Poll the service more often near the epoch end while it is behind
+            self.poll_scheduler.set_epoch_deadline(
+                service_name,
+                (
+                    status["epoch_end_ts"]
+                    if status["mech_requests_this_epoch"]
+                    < status["required_mech_requests"]
+                    else None
+                ),
+            )
+            total_rewards += float(status["accrued_rewards"].split(" ")[0])
+            messages.append(
+                f"[{service_name}] {status['accrued_rewards']} "
+                f"""[{status['mech_requests_this_epoch']}/{status['required_mech_requests']}]
+Staking program: {status['metadata']['name']}
+Next epoch: {status['epoch_end']}"""
+            )
+
+        rewards_value = total_rewards * price_quote.price if price_quote.price else None
+        message = f"Total rewards = {total_rewards:g} OLAS"
+        if rewards_value:
+            message += f" [${rewards_value:g}]"
+            if price_quote.age is not None and price_quote.age > OLAS_PRICE_TTL:
+                message += f" (price from {price_quote.age / 60:.0f} min ago)"
+        messages.append(message)
+
+        if update.message is None:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        await update.message.reply_text(text=("\n\n").join(messages))
+
+    async def balance(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):  # pylint: disable=unused-argument
+        """Wallet balances"""
+        messages = []
+        service_items = list(self.get_services().items())
+        all_balances = await gather_balances([service for _, service in service_items])
+        for (service_name, service), balances in zip(service_items, all_balances):
+            if isinstance(balances, BaseException):
+                logger.error(
+                    "[%s] Failed to check the balances: %s", service_name, balances
+                )
+                messages.append(
+                    r"\["
+                    + escape_markdown_v2(service_name)
+                    + r"] Cannot check balances"
+                )
+                continue
+
+            agent_native_balance = balances["agent_eoa_native_balance"]
+            safe_native_balance = balances["service_safe_native_balance"]
+            safe_olas_balance = balances["service_safe_olas_balance"]
+            master_eoa_native_balance = balances["master_eoa_native_balance"]
+            master_safe_native_balance = balances["master_safe_native_balance"]
+
+            if service.master_wallet.safes is None:
+                raise ValueError("Master wallet safes not found")
+
+            message = (
+                r"\["
+                + escape_markdown_v2(service_name)
+                + r"]"
+                + f"\n[Agent EOA]({GNOSISSCAN_ADDRESS_URL.format(address=service.agent_address)}) = {agent_native_balance:g} xDAI"  # noqa: E501
+                + f"\n[Service Safe]({GNOSISSCAN_ADDRESS_URL.format(address=service.service_safe)}) = {safe_native_balance:g} xDAI  {safe_olas_balance:g} OLAS"  # noqa: E501
+                + f"\n[Master EOA]({GNOSISSCAN_ADDRESS_URL.format(address=service.master_wallet.address)}) = {master_eoa_native_balance:g} xDAI"  # noqa: E501
+                + f"\n[Master Safe]({GNOSISSCAN_ADDRESS_URL.format(address=service.master_wallet.safes[Chain.from_string(service.service.home_chain)])}) = {master_safe_native_balance:g} xDAI"  # type: ignore[attr-defined]  # noqa: E501
+            )
+
+            messages.append(message)
+
+        if update.message is None:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        await update.message.reply_text(
+            text=("\n\n").join(messages),
+            parse_mode=ParseMode.MARKDOWN,
+            disable_web_page_preview=True,
+        )
+
+    async def history(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Balance trends from the local balance history"""
+        if not update.message:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        days = BALANCE_HISTORY_WINDOW_DAYS
+        if context.args:
+            try:
+                days = float(context.args[0])
+            except ValueError:
+                await update.message.reply_text(text="Usage: /history [days]")
+                return
+
+        messages = []
+        for service_name, service in self.get_services().items():
+            try:
+                messages.append(
+                    await run_blocking(format_history, service_name, service, days)
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("[%s] Failed to read the history: %s", service_name, e)
+                messages.append(f"[{service_name}] Cannot read the balance history")
+
+        await update.message.reply_text(text=("\n\n").join(messages))
+
+    async def claim(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):  # pylint: disable=unused-argument
+        """Claim rewards"""
+
+        if not update.message:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        if not MANUAL_CLAIM:
+            await update.message.reply_text(text="Manual claim is disabled")
+            return
+
+        if claim_lock.locked():
+            await update.message.reply_text(text="Claims are already being sent")
+            return
+
+        report = TransactionReport()
+        service_items = list(self.get_services().items())
+        outcomes = await claim_rewards([service for _, service in service_items])
+        report.add_claims(
+            service_items, outcomes, lambda service_name: f"[{service_name}] "
+        )
+
+        sent = await update.message.reply_text(
+            text=("\n").join(report.lines),
+        )
+        report.track(sent, "\n", None)
+
+    async def withdraw(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):  # pylint: disable=unused-argument
+        """Withdraw rewards"""
+        if not update.message:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        report = TransactionReport()
+        service_items = list(self.get_services().items())
+        withdrawals = await withdraw_rewards([service for _, service in service_items])
+        report.add_withdrawals(service_items, withdrawals, markdown_prefix(""))
+
+        sent = await update.message.reply_text(
+            text=("\n\n").join(report.lines),
+            parse_mode=ParseMode.MARKDOWN,
+            disable_web_page_preview=True,
+        )
+        report.track(sent, "\n\n", ParseMode.MARKDOWN)
+
+    async def slots(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):  # pylint: disable=unused-argument
+        """Available staking slots"""
+        if not update.message:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        slots = await (
+            async_chain.get_slots() if ASYNC_WEB3 else run_blocking(get_slots)
+        )
+
+        messages = [
+            f"[{contract_name}] {n_slots} available slots"
+            for contract_name, n_slots in slots.items()
+        ]
+
+        await update.message.reply_text(
+            text=("\n").join(messages),
+        )
+
+    async def scheduled_jobs(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Scheduled jobs and balance checks"""
+        if not update.message:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        jobs = context.job_queue.jobs() if context.job_queue else []
+
+        if not jobs:
+            await update.message.reply_text("No scheduled jobs")
+            return
+
+        message = ""
+        for job in jobs:
+            next_execution = (
+                job.next_t.astimezone(pytz.timezone(LOCAL_TIMEZONE)).strftime(
+                    "%Y-%m-%d %H:%M:%S %Z"
+                )
+                if job.next_t
+                else "N/A"
+            )
+            message += f"• {job.name}: {next_execution}\n"
+
+        schedules = self.poll_scheduler.schedules()
+        if schedules:
+            message += "\nBalance checks:\n"
+        for schedule in schedules:
+            if not schedule.interval:
+                message += f"• {schedule.name}: at the next tick\n"
+                continue
+            next_check = datetime.datetime.fromtimestamp(
+                schedule.next_check, pytz.timezone(LOCAL_TIMEZONE)
+            ).strftime("%Y-%m-%d %H:%M:%S %Z")
+            message += f"• {schedule.name}: {next_check} (every {schedule.interval / 60:.0f} min)\n"  # noqa: E501
+
+        await update.message.reply_text(message)
+
+    async def rpc_stats(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):  # pylint: disable=unused-argument
+        """RPC endpoints, rate limit queue and waits"""
+        if not update.message:
+            logger.error("Cannot send message, update.message is None")
+            return
+
+        await update.message.reply_text(format_rpc_stats(rpc_pool))
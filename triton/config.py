@@ -0,0 +1,70 @@
+"""Config Module
+This module loads config.yaml, and notices when its operators change."""
+
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import yaml
+
+logger = logging.getLogger("config")
+
+
+class OperatorsDiff(NamedTuple):
+    """Operators added to and removed from the configuration"""
+
+    added: Dict[str, str]
+    removed: List[str]
+
+
+def load_operators(path: Union[str, Path]) -> Dict[str, str]:
+    """Read the operate path of each operator of a configuration file"""
+    with open(path, "r", encoding="utf-8") as config_file:
+        config = yaml.safe_load(config_file)
+    return dict(config["operators"])
+
+
+def diff_operators(old: Dict[str, str], new: Dict[str, str]) -> OperatorsDiff:
+    """Get the operators to load and to drop to go from one configuration to another"""
+    # An operator pointed to another folder is dropped, then loaded from its new path
+    return OperatorsDiff(
+        added={name: path for name, path in new.items() if old.get(name) != path},
+        removed=[name for name, path in old.items() if new.get(name) != path],
+    )
+
+
+class ConfigWatcher:
+    """Configuration file, read again whenever it is modified"""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """Constructor"""
+        self.path = Path(path)
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        """Get the modification time and size of the file, or None if it is missing"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> Dict[str, str]:
+        """Read the operators of the configuration"""
+        self._signature = self._stat()
+        return load_operators(self.path)
+
+    def poll(self) -> Optional[Dict[str, str]]:
+        """Read the operators again if the file was modified since the last read, or get None"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+
+        # A file saved halfway is read again at its next modification
+        self._signature = signature
+        try:
+            return load_operators(self.path)
+        except (OSError, yaml.YAMLError, KeyError, TypeError, ValueError) as e:
+            logger.warning("Ignoring invalid configuration %s: %s", self.path, e)
+            return None
@@ -17,6 +17,51 @@ SAFE_BALANCE_THRESHOLD = float(os.getenv("SAFE_BALANCE_THRESHOLD", "1"))
 AUTOCLAIM = str_to_bool(os.getenv("AUTOCLAIM", "false"))
 MANUAL_CLAIM = str_to_bool(os.getenv("MANUAL_CLAIM", "true"))
 OLAS_TOKEN_ADDRESS_GNOSIS = "0xcE11e14225575945b8E6Dc0D4F2dD4C570f79d9f"
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+USE_MULTICALL = str_to_bool(os.getenv("USE_MULTICALL", "true"))
+MULTICALL_BATCH_SIZE = int(os.getenv("MULTICALL_BATCH_SIZE", "200"))
+ASYNC_WEB3 = str_to_bool(os.getenv("ASYNC_WEB3", "false"))
+RPC_HEDGE = str_to_bool(os.getenv("RPC_HEDGE", "true"))
+RPC_RATE_LIMIT = float(os.getenv("RPC_RATE_LIMIT", "20"))  # requests per second
+RPC_RATE_BURST = float(os.getenv("RPC_RATE_BURST", "20"))  # requests
+RPC_THROTTLE_RETRIES = int(os.getenv("RPC_THROTTLE_RETRIES", "3"))
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "20"))
+RPC_KEEPALIVE_TIMEOUT = float(os.getenv("RPC_KEEPALIVE_TIMEOUT", "30"))  # seconds
+SERVICE_CONCURRENCY = int(os.getenv("SERVICE_CONCURRENCY", "8"))
+SERVICE_TIMEOUT = float(os.getenv("SERVICE_TIMEOUT", "60"))  # seconds
+CONTRACT_CACHE_SIZE = int(os.getenv("CONTRACT_CACHE_SIZE", "0"))  # 0 = unbounded
+TRITON_DATA_DIR = os.getenv("TRITON_DATA_DIR", ".triton")
+OLAS_PRICE_TTL = float(os.getenv("OLAS_PRICE_TTL", "300"))  # seconds
+STAKING_PROGRAM_RECHECK = float(os.getenv("STAKING_PROGRAM_RECHECK", "300"))  # seconds
+STAKING_RESOLUTION_TTL = float(os.getenv("STAKING_RESOLUTION_TTL", "3600"))  # seconds
+BALANCE_ALERT_HORIZON = float(os.getenv("BALANCE_ALERT_HORIZON", "24"))  # hours
+BURN_RATE_HALF_LIFE = float(os.getenv("BURN_RATE_HALF_LIFE", "24"))  # hours
+EPOCH_MONITOR = str_to_bool(os.getenv("EPOCH_MONITOR", "true"))
+EPOCH_RISK_HORIZON = float(os.getenv("EPOCH_RISK_HORIZON", "8"))  # hours
+POLL_TICK = float(os.getenv("POLL_TICK", "60"))  # seconds
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "3600"))  # seconds
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "300"))  # seconds
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "14400"))  # seconds
+RPC_BUDGET_PER_MINUTE = float(os.getenv("RPC_BUDGET_PER_MINUTE", "60"))
+BALANCE_HISTORY = str_to_bool(os.getenv("BALANCE_HISTORY", "true"))
+BALANCE_HISTORY_WINDOW_DAYS = float(os.getenv("BALANCE_HISTORY_WINDOW_DAYS", "7"))
+BALANCE_HISTORY_FULL_RESOLUTION_DAYS = float(
+    os.getenv("BALANCE_HISTORY_FULL_RESOLUTION_DAYS", "30")
+)
+BALANCE_HISTORY_RETENTION_DAYS = float(
+    os.getenv("BALANCE_HISTORY_RETENTION_DAYS", "365")
+)
+CONFIG_RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", "30"))  # seconds
+EVENT_INDEXER = str_to_bool(os.getenv("EVENT_INDEXER", "true"))
+EVENT_INDEXER_INTERVAL = float(os.getenv("EVENT_INDEXER_INTERVAL", "60"))  # seconds
+EVENT_INDEXER_CHUNK_SIZE = int(os.getenv("EVENT_INDEXER_CHUNK_SIZE", "10000"))  # blocks
+EVENT_INDEXER_LOOKBACK = int(os.getenv("EVENT_INDEXER_LOOKBACK", "518400"))  # blocks
+CLAIM_GAS_LIMIT = int(os.getenv("CLAIM_GAS_LIMIT", "500000"))
+CHECKPOINT_GAS_LIMIT = int(os.getenv("CHECKPOINT_GAS_LIMIT", "2000000"))
+CLAIM_MIN_REWARD = float(os.getenv("CLAIM_MIN_REWARD", "0"))  # OLAS
+WITHDRAWAL_GAS_LIMIT = int(os.getenv("WITHDRAWAL_GAS_LIMIT", "200000"))
+TX_RECEIPT_TIMEOUT = float(os.getenv("TX_RECEIPT_TIMEOUT", "300"))  # seconds
+TX_RETRIES = int(os.getenv("TX_RETRIES", "2"))
 AUTOCLAIM_DAY = int(os.getenv("AUTOCLAIM_DAY", "1"))
 AUTOCLAIM_HOUR_UTC = int(os.getenv("AUTOCLAIM_HOUR_UTC", "9"))
 LOCAL_TIMEZONE = os.getenv("LOCAL_TIMEZONE", "UTC")
@@ -24,39 +69,30 @@ OPERATE_USER_PASSWORD = os.getenv("OPERATE_USER_PASSWORD")
 STAKING_CONTRACTS = {
     "Hobbyist (100 OLAS)": {
         "address": "0x389b46c259631acd6a69bde8b6cee218230bae8c",
-        "slots": 100,
     },
     "Hobbyist 2 (500 OLAS)": {
         "address": "0x238eb6993b90a978ec6aad7530d6429c949c08da",
-        "slots": 50,
     },
     "Expert (1k OLAS)": {
         "address": "0x5344b7dd311e5d3dddd46a4f71481bd7b05aaa3e",
-        "slots": 20,
     },
     "Expert 2 (1k OLAS)": {
         "address": "0xb964e44c126410df341ae04b13ab10a985fe3513",
-        "slots": 40,
     },
     "Expert 3 (2k OLAS)": {
         "address": "0x80fad33cadb5f53f9d29f02db97d682e8b101618",
-        "slots": 20,
     },
     "Expert 4 (10k OLAS)": {
         "address": "0xad9d891134443b443d7f30013c7e14fe27f2e029",
-        "slots": 26,
     },
     "Expert 5 (10k OLAS)": {
         "address": "0xe56df1e563de1b10715cb313d514af350d207212",
-        "slots": 26,
     },
     "Expert 6 (1k OLAS)": {
         "address": "0x2546214aee7eea4bee7689c81231017ca231dc93",
-        "slots": 40,
     },
     "Expert 7 (10k OLAS)": {
         "address": "0xd7a3c8b975f71030135f1a66e9e23164d54ff455",
-        "slots": 26,
     },
 }
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
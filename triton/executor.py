@@ -0,0 +1,64 @@
+"""Executor Module
+This module runs blocking per-service work concurrently, off the event loop."""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+from triton.constants import SERVICE_CONCURRENCY, SERVICE_TIMEOUT
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executor = ThreadPoolExecutor(
+    max_workers=SERVICE_CONCURRENCY, thread_name_prefix="triton"
+)
+
+
+async def run_blocking(
+    func: Callable[..., R],
+    *args: Any,
+    timeout: Optional[float] = SERVICE_TIMEOUT,
+) -> R:
+    """Run a blocking function in the worker pool"""
+    # On timeout the worker thread keeps running, only the caller stops waiting for it
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, functools.partial(func, *args))
+    return await asyncio.wait_for(future, timeout)
+
+
+def map_blocking(func: Callable[[T], R], items: Sequence[T]) -> List[Any]:
+    """Run a blocking function over several items in the worker pool, outside of the event loop"""
+    # Same contract as map_concurrently, for the startup work done before the bot runs
+    futures = [_executor.submit(func, item) for item in items]
+    results: List[Any] = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:  # pylint: disable=broad-except
+            results.append(e)
+    return results
+
+
+async def map_concurrently(
+    func: Callable[[T], R],
+    items: Sequence[T],
+    timeout: Optional[float] = SERVICE_TIMEOUT,
+) -> List[Any]:
+    """Run a blocking function over several items with bounded concurrency"""
+    # Results keep the order of the items. Failures and timeouts are returned as exceptions
+    semaphore = asyncio.Semaphore(SERVICE_CONCURRENCY)
+
+    async def _run(item: T) -> R:
+        async with semaphore:
+            return await run_blocking(func, item, timeout=timeout)
+
+    return await asyncio.gather(*(_run(item) for item in items), return_exceptions=True)
@@ -0,0 +1,236 @@
+"""History Module
+This module keeps a local time series of the monitored balances."""
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from triton.cache import JsonRecord, SqliteStore
+from triton.constants import (
+    BALANCE_HISTORY_FULL_RESOLUTION_DAYS,
+    BALANCE_HISTORY_RETENTION_DAYS,
+    BURN_RATE_HALF_LIFE,
+    TRITON_DATA_DIR,
+)
+
+logger = logging.getLogger("history")
+
+DAY = 86400  # seconds
+
+# Balance returned by check_balances -> (monitored address, asset)
+BALANCE_KEYS = {
+    "agent_eoa_native_balance": ("agent_eoa", "xDAI"),
+    "service_safe_native_balance": ("service_safe", "xDAI"),
+    "service_safe_olas_balance": ("service_safe", "OLAS"),
+    "master_eoa_native_balance": ("master_eoa", "xDAI"),
+    "master_safe_native_balance": ("master_safe", "xDAI"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    address TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    balance REAL NOT NULL,
+    PRIMARY KEY (address, asset, ts)
+) WITHOUT ROWID;
+"""
+
+
+class BalanceSample(NamedTuple):
+    """Balance of an address at a point in time"""
+
+    address: str
+    asset: str
+    ts: int
+    balance: float
+
+
+class BalanceTrend(NamedTuple):
+    """Summary of a balance over a time window"""
+
+    balance: float
+    change_per_day: float
+    burn_per_day: float
+    days: float
+
+    @property
+    def days_to_empty(self) -> Optional[float]:
+        """Days until the balance runs out at the current burn rate"""
+        if self.burn_per_day <= 0:
+            return None
+        return self.balance / self.burn_per_day
+
+
+def get_balance_samples(
+    addresses: Dict[str, str], balances: dict, ts: int
+) -> List[BalanceSample]:
+    """Get the samples of the balances checked for a service"""
+    return [
+        BalanceSample(addresses[role], asset, ts, float(balances[key]))
+        for key, (role, asset) in BALANCE_KEYS.items()
+        if key in balances
+    ]
+
+
+def get_balance_trend(points: List[Tuple[int, float]]) -> Optional[BalanceTrend]:
+    """Summarize a balance series. Returns None with less than two samples"""
+    if len(points) < 2:
+        return None
+
+    days = (points[-1][0] - points[0][0]) / DAY
+    if days <= 0:
+        return None
+
+    # Increases are top-ups or rewards, only the decreases are burnt
+    burnt = sum(
+        max(0.0, previous - current)
+        for (_, previous), (_, current) in zip(points, points[1:])
+    )
+    return BalanceTrend(
+        balance=points[-1][1],
+        change_per_day=(points[-1][1] - points[0][1]) / days,
+        burn_per_day=burnt / days,
+        days=days,
+    )
+
+
+class BalanceHistory(SqliteStore):
+    """Balance time series stored in SQLite"""
+
+    schema = SCHEMA
+
+    def __init__(self, path: Path) -> None:
+        """Constructor"""
+        super().__init__(path)
+        self._compacted_at: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def record(self, samples: Iterable[BalanceSample]) -> None:
+        """Append samples, then downsample the old ones once a day"""
+        samples = list(samples)
+        if not samples:
+            return
+
+        with self._lock, closing(self._connect()) as connection:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO balances (address, asset, ts, balance) "
+                    "VALUES (?, ?, ?, ?)",
+                    samples,
+                )
+
+            now = max(sample.ts for sample in samples)
+            if self._compacted_at is None or now - self._compacted_at >= DAY:
+                self._compact(connection, now)
+                self._compacted_at = now
+
+    @staticmethod
+    def _compact(connection: sqlite3.Connection, now: int) -> None:
+        """Keep one sample per day past the full resolution window, and drop expired ones"""
+        downsample_before = now - BALANCE_HISTORY_FULL_RESOLUTION_DAYS * DAY
+        with connection:
+            connection.execute(
+                "DELETE FROM balances WHERE ts < ?",
+                (now - BALANCE_HISTORY_RETENTION_DAYS * DAY,),
+            )
+            # The last sample of each day is kept
+            connection.execute(
+                "DELETE FROM balances WHERE ts < ? AND ts != ("
+                "SELECT MAX(day.ts) FROM balances AS day "
+                "WHERE day.address = balances.address "
+                "AND day.asset = balances.asset "
+                "AND day.ts / ? = balances.ts / ?)",
+                (downsample_before, DAY, DAY),
+            )
+
+    def get_samples(
+        self, address: str, asset: str, since: int, until: int
+    ) -> List[Tuple[int, float]]:
+        """Get the (timestamp, balance) samples of an address in a time range"""
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                "SELECT ts, balance FROM balances "
+                "WHERE address = ? AND asset = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (address, asset, since, until),
+            ).fetchall()
+
+    def get_trend(
+        self, address: str, asset: str, days: float, now: Optional[float] = None
+    ) -> Optional[BalanceTrend]:
+        """Summarize the balance of an address over the last days"""
+        now = time.time() if now is None else now
+        return get_balance_trend(
+            self.get_samples(address, asset, int(now - days * DAY), int(now))
+        )
+
+
+class BurnRate(NamedTuple):
+    """Latest balance of an address and its estimated burn rate"""
+
+    balance: float
+    burn_per_day: Optional[float]
+
+    def days_to(self, threshold: float) -> Optional[float]:
+        """Days until the balance drops below a threshold at the estimated burn rate"""
+        if not self.burn_per_day or self.burn_per_day <= 0:
+            return None
+        return max(0.0, self.balance - threshold) / self.burn_per_day
+
+
+class BurnRateEstimator:
+    """Exponentially weighted burn rate of each address"""
+
+    def __init__(self, record: JsonRecord, half_life: float) -> None:
+        """Constructor"""
+        self.record = record
+        self.half_life = half_life  # seconds
+
+    def update(self, address: str, ts: float, balance: float) -> BurnRate:
+        """Update the estimate of an address with a new balance sample"""
+        return self.update_all([(address, ts, balance)])[0]
+
+    def update_all(self, samples: Sequence[Tuple[str, float, float]]) -> List[BurnRate]:
+        """Update the estimates of several (address, ts, balance) samples, persisted at once"""
+        # Only the last sample and the estimate are kept, so updates are O(1)
+        states: Dict[str, list] = {}
+        estimates = []
+        for address, ts, balance in samples:
+            state = states.get(address) or self.record.get(address)
+            burn_per_day = None
+            if state is not None:
+                last_ts, last_balance, burn_per_day = state
+                elapsed = ts - last_ts
+                if elapsed <= 0:
+                    # Already sampled, e.g. a master wallet shared by several services
+                    estimates.append(
+                        BurnRate(balance=last_balance, burn_per_day=burn_per_day)
+                    )
+                    continue
+
+                # A higher balance is a top-up, which says nothing about the burn rate
+                if balance <= last_balance:
+                    sample = (last_balance - balance) / elapsed * DAY
+                    if burn_per_day is None:
+                        burn_per_day = sample
+                    else:
+                        # Older samples lose half of their weight every half-life
+                        weight = 1 - 0.5 ** (elapsed / self.half_life)
+                        burn_per_day += weight * (sample - burn_per_day)
+
+            states[address] = [ts, balance, burn_per_day]
+            estimates.append(BurnRate(balance=balance, burn_per_day=burn_per_day))
+
+        self.record.update(states)
+        return estimates
+
+
+balance_history = BalanceHistory(Path(TRITON_DATA_DIR) / "balances.db")
+burn_rates = BurnRateEstimator(
+    JsonRecord(Path(TRITON_DATA_DIR) / "burn_rates.json"),
+    half_life=BURN_RATE_HALF_LIFE * 3600,
+)
@@ -0,0 +1,291 @@
+"""Indexer Module
+This module indexes the events of the staking contracts in a local SQLite database."""
+
+import functools
+import json
+import logging
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, cast
+
+from eth_utils.abi import event_abi_to_log_topic
+from web3.types import FilterParams, LogReceipt
+
+from triton.cache import SqliteStore
+from triton.chain import (
+    SLOT_EVENTS,
+    get_staking_contract_addresses,
+    invalidate_slots,
+    invalidate_staking_program,
+    load_abi,
+    load_contract,
+    web3,
+)
+from triton.constants import (
+    EVENT_INDEXER_CHUNK_SIZE,
+    EVENT_INDEXER_LOOKBACK,
+    TRITON_DATA_DIR,
+)
+from triton.service import invalidate_staking_resolutions
+
+logger = logging.getLogger("indexer")
+
+INDEXED_EVENTS = (
+    "Checkpoint",
+    "RewardClaimed",
+    "ServiceStaked",
+    "ServiceUnstaked",
+    "ServicesEvicted",
+    "ServiceInactivityWarning",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    address TEXT PRIMARY KEY,
+    block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    address TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    event TEXT NOT NULL,
+    args TEXT NOT NULL,
+    UNIQUE (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS event_services (
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    service_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_name ON events (event, address, block);
+CREATE INDEX IF NOT EXISTS event_services_by_service
+    ON event_services (service_id, event_id);
+"""
+
+
+class IndexedEvent(NamedTuple):
+    """Decoded staking contract event"""
+
+    address: str
+    block: int
+    log_index: int
+    tx_hash: str
+    event: str
+    args: Dict[str, Any]
+
+    @property
+    def service_ids(self) -> List[int]:
+        """Services the event is about"""
+        if "serviceId" in self.args:
+            return [self.args["serviceId"]]
+        return list(self.args.get("serviceIds", []))
+
+
+@functools.lru_cache(maxsize=None)
+def get_event_topics() -> Dict[str, str]:
+    """Get the indexed event names by their log topic"""
+    return {
+        web3.to_hex(event_abi_to_log_topic(item)): item["name"]
+        for item in load_abi("staking_token")
+        if item["type"] == "event" and item["name"] in INDEXED_EVENTS
+    }
+
+
+def decode_log(log: LogReceipt) -> IndexedEvent:
+    """Decode a staking contract log"""
+    name = get_event_topics()[web3.to_hex(log["topics"][0])]
+    contract = load_contract(log["address"], "staking_token")
+    event_data = getattr(contract.events, name)().process_log(log)
+    return IndexedEvent(
+        address=log["address"],
+        block=log["blockNumber"],
+        log_index=log["logIndex"],
+        tx_hash=web3.to_hex(log["transactionHash"]),
+        event=name,
+        args=dict(event_data["args"]),
+    )
+
+
+def _row_to_event(row: Tuple[Any, ...]) -> IndexedEvent:
+    """Build an event from a database row"""
+    address, block, log_index, tx_hash, event, args = row
+    return IndexedEvent(address, block, log_index, tx_hash, event, json.loads(args))
+
+
+class EventIndexer(SqliteStore):
+    """Incremental indexer of the staking contract events"""
+
+    schema = SCHEMA
+
+    def __init__(self, path: Path, chunk_size: int = EVENT_INDEXER_CHUNK_SIZE) -> None:
+        """Constructor"""
+        super().__init__(path)
+        self.max_chunk_size = max(1, chunk_size)
+        self.chunk_size = self.max_chunk_size
+        self._lock = threading.Lock()
+
+    def get_cursors(self, addresses: Sequence[str]) -> Dict[str, int]:
+        """Get the last indexed block of each staking contract"""
+        with closing(self._connect()) as connection:
+            rows = connection.execute("SELECT address, block FROM cursors").fetchall()
+        cursors = dict(rows)
+        return {
+            address: cursors[address] for address in addresses if address in cursors
+        }
+
+    def _get_logs(
+        self, addresses: Sequence[str], from_block: int, to_block: int
+    ) -> Tuple[int, List[LogReceipt]]:
+        """Get the logs from a block on, shrinking the block range until the RPC accepts it"""
+        while True:
+            end = min(to_block, from_block + self.chunk_size - 1)
+            log_filter = {
+                "address": list(addresses),
+                "fromBlock": from_block,
+                "toBlock": end,
+                "topics": [list(get_event_topics())],
+            }
+            try:
+                logs = web3.eth.get_logs(cast(FilterParams, log_filter))
+            except ValueError as e:
+                # Too many blocks or results for the RPC
+                if self.chunk_size == 1:
+                    raise
+                self.chunk_size = max(1, self.chunk_size // 2)
+                logger.info("Reading %s blocks at a time: %s", self.chunk_size, e)
+                continue
+
+            # Grow back slowly, so that a range limit is not hit on every read
+            self.chunk_size = min(
+                self.max_chunk_size,
+                self.chunk_size + max(1, self.max_chunk_size // 10),
+            )
+            return end, list(logs)
+
+    def _store(
+        self, events: Sequence[IndexedEvent], addresses: Sequence[str], block: int
+    ) -> None:
+        """Store events and move the cursors forward, in a single transaction"""
+        with closing(self._connect()) as connection:
+            with connection:
+                for event in events:
+                    cursor = connection.execute(
+                        "INSERT OR IGNORE INTO events "
+                        "(address, block, log_index, tx_hash, event, args) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            event.address,
+                            event.block,
+                            event.log_index,
+                            event.tx_hash,
+                            event.event,
+                            json.dumps(event.args),
+                        ),
+                    )
+                    if cursor.rowcount:
+                        connection.executemany(
+                            "INSERT INTO event_services (event_id, service_id) VALUES (?, ?)",
+                            [
+                                (cursor.lastrowid, service_id)
+                                for service_id in event.service_ids
+                            ],
+                        )
+                connection.executemany(
+                    "INSERT INTO cursors (address, block) VALUES (?, ?) "
+                    "ON CONFLICT (address) DO UPDATE SET block = excluded.block",
+                    [(address, block) for address in addresses],
+                )
+
+    def index(self, addresses: Optional[Sequence[str]] = None) -> List[IndexedEvent]:
+        """Index the events emitted since the last run, and return them"""
+        with self._lock:
+            addresses = list(addresses or get_staking_contract_addresses())
+            latest = web3.eth.block_number
+            cursors = self.get_cursors(addresses)
+            # Contracts seen for the first time are only indexed from a recent block
+            starts = {
+                address: cursors.get(address, max(0, latest - EVENT_INDEXER_LOOKBACK))
+                for address in addresses
+            }
+            from_block = min(starts.values(), default=latest) + 1
+
+            new_events: List[IndexedEvent] = []
+            while from_block <= latest:
+                to_block, logs = self._get_logs(addresses, from_block, latest)
+                events = [
+                    decode_log(log)
+                    for log in logs
+                    if log["blockNumber"] > starts.get(log["address"], latest)
+                ]
+                self._store(events, addresses, to_block)
+                new_events.extend(events)
+                from_block = to_block + 1
+
+        self._invalidate_caches(new_events)
+        return new_events
+
+    @staticmethod
+    def _invalidate_caches(events: Sequence[IndexedEvent]) -> None:
+        """Drop the cached chain reads that the events made stale"""
+        for address in {
+            event.address for event in events if event.event == "Checkpoint"
+        }:
+            invalidate_staking_program(address)
+        moves = [event for event in events if event.event in SLOT_EVENTS]
+        if moves:
+            invalidate_slots()
+            invalidate_staking_resolutions(
+                [service_id for event in moves for service_id in event.service_ids]
+            )
+
+    def get_events(
+        self,
+        *,
+        event: Optional[str] = None,
+        address: Optional[str] = None,
+        service_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[IndexedEvent]:
+        """Get indexed events, newest first"""
+        query = "SELECT address, block, log_index, tx_hash, event, args FROM events"
+        conditions = []
+        parameters: List[Any] = []
+        if service_id is not None:
+            conditions.append(
+                "id IN (SELECT event_id FROM event_services WHERE service_id = ?)"
+            )
+            parameters.append(service_id)
+        if event is not None:
+            conditions.append("event = ?")
+            parameters.append(event)
+        if address is not None:
+            conditions.append("address = ?")
+            parameters.append(web3.to_checksum_address(address))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY block DESC, log_index DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+
+        with closing(self._connect()) as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [_row_to_event(row) for row in rows]
+
+    def get_last_event(
+        self,
+        event: str,
+        *,
+        address: Optional[str] = None,
+        service_id: Optional[int] = None,
+    ) -> Optional[IndexedEvent]:
+        """Get the most recent indexed event of a kind"""
+        events = self.get_events(
+            event=event, address=address, service_id=service_id, limit=1
+        )
+        return events[0] if events else None
+
+
+event_indexer = EventIndexer(Path(TRITON_DATA_DIR) / "events.db")
@@ -0,0 +1,112 @@
+"""Monitor Module
+This module projects whether the services will reach their mech request target by the epoch end.
+"""
+
+from typing import Dict, NamedTuple, Optional
+
+from triton.constants import POLL_MIN_INTERVAL, USE_MULTICALL
+from triton.scheduler import get_poll_interval
+
+# RPC requests made to sample the staking status of a service. Through Multicall3 a
+# whole batch of services costs a few requests, one per service is conservative
+SAMPLE_COST = 1 if USE_MULTICALL else 8
+
+# Older request counts lose half of their weight in the velocity after this time
+VELOCITY_HALF_LIFE = 2 * 3600  # seconds
+
+
+class EpochProjection(NamedTuple):
+    """Projected mech requests of a service at the end of its epoch"""
+
+    requests: int
+    required: int
+    projected: float
+    velocity: float  # requests per second
+    epoch_end: int
+    seconds_left: float
+
+    @property
+    def reached(self) -> bool:
+        """Whether the service already made the required requests"""
+        return self.requests >= self.required
+
+    @property
+    def at_risk(self) -> bool:
+        """Whether the service is projected to miss the required requests"""
+        return (
+            not self.reached
+            and self.seconds_left > 0
+            and self.projected < self.required
+        )
+
+    @property
+    def required_velocity(self) -> float:
+        """Requests per second needed to reach the target in time"""
+        if self.reached or self.seconds_left <= 0:
+            return 0.0
+        return (self.required - self.requests) / self.seconds_left
+
+
+class _EpochSample(NamedTuple):
+    """Last mech request count seen for a service"""
+
+    epoch_end: int
+    ts: float
+    requests: int
+    velocity: float
+
+
+class EpochMonitor:
+    """Request velocity of each service over its epoch"""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._samples: Dict[str, _EpochSample] = {}
+
+    def update(self, name: str, status: dict, now: float) -> EpochProjection:
+        """Project the requests of a service at the end of the epoch from its staking status"""
+        requests = int(status["mech_requests_this_epoch"])
+        epoch_end = int(status["epoch_end_ts"])
+        elapsed = now - int(status["checkpoint_ts"])
+
+        previous = self._samples.get(name)
+        if (
+            previous is not None
+            and previous.epoch_end == epoch_end
+            and now > previous.ts
+        ):
+            # Weighted towards the recent requests, so that a stalled trader shows
+            # up before the epoch average catches up
+            recent = max(0, requests - previous.requests) / (now - previous.ts)
+            weight = 1 - 0.5 ** ((now - previous.ts) / VELOCITY_HALF_LIFE)
+            velocity = previous.velocity + weight * (recent - previous.velocity)
+        else:
+            velocity = requests / elapsed if elapsed > 0 else 0.0
+        self._samples[name] = _EpochSample(
+            epoch_end=epoch_end, ts=now, requests=requests, velocity=velocity
+        )
+
+        seconds_left = epoch_end - now
+        return EpochProjection(
+            requests=requests,
+            required=int(status["required_mech_requests"]),
+            projected=requests + velocity * max(0.0, seconds_left),
+            velocity=velocity,
+            epoch_end=epoch_end,
+            seconds_left=seconds_left,
+        )
+
+    def forget(self, name: str) -> None:
+        """Drop the samples of a service"""
+        self._samples.pop(name, None)
+
+
+def get_sample_interval(projection: Optional[EpochProjection]) -> float:
+    """Get the interval until the next sample of a service, denser towards the epoch end"""
+    if projection is None or projection.seconds_left <= 0:
+        # Until the checkpoint is called, or the status can be read again
+        return POLL_MIN_INTERVAL
+    if projection.reached:
+        # Nothing to watch before the next epoch
+        return max(POLL_MIN_INTERVAL, projection.seconds_left)
+    return get_poll_interval(seconds_to_epoch_end=projection.seconds_left)
@@ -0,0 +1,186 @@
+"""Receipts Module
+This module follows up the transactions reported in Telegram messages, until they are mined or dropped.
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from hexbytes import HexBytes
+from telegram import Bot
+from telegram.error import BadRequest, TelegramError
+from web3.types import TxReceipt
+
+from triton.cache import JsonRecord
+from triton.chain import web3
+from triton.constants import (
+    OLAS_TOKEN_ADDRESS_GNOSIS,
+    TRITON_DATA_DIR,
+    TX_RECEIPT_TIMEOUT,
+)
+from triton.executor import run_blocking
+from triton.tools import wei_to_olas
+from triton.transactions import get_receipts
+
+logger = logging.getLogger("receipts")
+
+TRANSFER_TOPIC = HexBytes(web3.keccak(text="Transfer(address,address,uint256)"))
+
+
+class TrackedTransaction(NamedTuple):
+    """Transaction reported in one line of a message"""
+
+    tx_hash: str
+    line: int
+    # OLAS transferred to this address are reported as moved
+    recipient: str
+    sent_at: float  # unix time
+
+
+class TrackedMessage(NamedTuple):
+    """Message whose lines are updated as their transactions are mined"""
+
+    chat_id: int
+    message_id: int
+    lines: List[str]
+    separator: str
+    parse_mode: Optional[str]
+    transactions: List[TrackedTransaction]
+
+    @property
+    def key(self) -> str:
+        """Key of the message in the record"""
+        return f"{self.chat_id}:{self.message_id}"
+
+    @property
+    def text(self) -> str:
+        """Text of the message"""
+        return self.separator.join(self.lines)
+
+
+def message_to_json(message: TrackedMessage) -> dict:
+    """Convert a tracked message to a JSON object"""
+    return {
+        **message._asdict(),
+        "transactions": [tx._asdict() for tx in message.transactions],
+    }
+
+
+def message_from_json(value: dict) -> TrackedMessage:
+    """Load a tracked message from a JSON object"""
+    return TrackedMessage(
+        **{
+            **value,
+            "transactions": [TrackedTransaction(**tx) for tx in value["transactions"]],
+        }
+    )
+
+
+def get_olas_moved(receipt: TxReceipt, recipient: str) -> int:
+    """Get the OLAS transferred to an address by a transaction"""
+    recipient = web3.to_checksum_address(recipient)
+    moved = 0
+    for log in receipt["logs"]:
+        topics = [HexBytes(topic) for topic in log["topics"]]
+        if (
+            web3.to_checksum_address(log["address"]) == OLAS_TOKEN_ADDRESS_GNOSIS
+            and len(topics) == 3
+            and topics[0] == TRANSFER_TOPIC
+            and web3.to_checksum_address(topics[2][-20:]) == recipient
+        ):
+            moved += int.from_bytes(HexBytes(log["data"])[:32], "big")
+    return moved
+
+
+def format_receipt(receipt: TxReceipt, recipient: str) -> str:
+    """Describe the outcome of a mined transaction"""
+    if receipt["status"] != 1:
+        return f"Reverted, {receipt['gasUsed']:,} gas used."
+    return (
+        f"Mined, {receipt['gasUsed']:,} gas used, "
+        f"{wei_to_olas(get_olas_moved(receipt, recipient))} moved."
+    )
+
+
+def resolve_message(
+    message: TrackedMessage,
+    receipts: Dict[str, TxReceipt],
+    now: float,
+    timeout: float,
+) -> TrackedMessage:
+    """Report the mined and dropped transactions of a message in their lines"""
+    lines = list(message.lines)
+    pending = []
+    for tx in message.transactions:
+        receipt = receipts.get(tx.tx_hash)
+        if receipt is not None:
+            status = format_receipt(receipt, tx.recipient)
+        elif now - tx.sent_at >= timeout:
+            status = f"Not mined within {timeout:g} seconds, it may have been dropped."
+        else:
+            pending.append(tx)
+            continue
+        lines[tx.line] = f"{lines[tx.line]} {status}"
+    return message._replace(lines=lines, transactions=pending)
+
+
+class ReceiptTracker:
+    """Pending transactions of the sent messages, persisted until they are mined or dropped"""
+
+    def __init__(self, record: JsonRecord, timeout: float) -> None:
+        """Constructor"""
+        self.record = record
+        self.timeout = timeout  # seconds
+
+    def track(self, message: TrackedMessage) -> None:
+        """Follow up the transactions of a sent message"""
+        if message.transactions:
+            self.record.set(message.key, message_to_json(message))
+
+    def pending(self) -> List[TrackedMessage]:
+        """Get the messages with pending transactions"""
+        return [message_from_json(value) for _, value in self.record.items()]
+
+    async def poll(self, bot: Bot, now: Optional[float] = None) -> None:
+        """Read the receipts of every pending transaction at once, and edit their messages"""
+        messages = self.pending()
+        tx_hashes = [tx.tx_hash for message in messages for tx in message.transactions]
+        if not tx_hashes:
+            return
+
+        receipts = await run_blocking(get_receipts, tx_hashes)
+        now = time.time() if now is None else now
+        for message in messages:
+            resolved = resolve_message(message, receipts, now, self.timeout)
+            if resolved.transactions == message.transactions:
+                continue
+
+            try:
+                await bot.edit_message_text(
+                    chat_id=message.chat_id,
+                    message_id=message.message_id,
+                    text=resolved.text,
+                    parse_mode=resolved.parse_mode,
+                    disable_web_page_preview=True,
+                )
+            except BadRequest as e:
+                # The message was deleted, or cannot be edited any more
+                logger.warning("Cannot edit message %s: %s", message.key, e)
+                self.record.delete(message.key)
+                continue
+            except TelegramError as e:
+                # Edited at the next poll
+                logger.warning("Failed to edit message %s: %s", message.key, e)
+                continue
+
+            if resolved.transactions:
+                self.record.set(message.key, message_to_json(resolved))
+            else:
+                self.record.delete(message.key)
+
+
+receipt_tracker = ReceiptTracker(
+    JsonRecord(Path(TRITON_DATA_DIR) / "pending_transactions.json"),
+    timeout=TX_RECEIPT_TIMEOUT,
+)
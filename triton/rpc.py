@@ -0,0 +1,512 @@
+"""RPC Module
+This module spreads the RPC requests over several endpoints, ranked by their recent health, within a rate limit.
+"""
+
+import asyncio
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from eth_typing import URI
+from web3 import AsyncHTTPProvider
+from web3._utils.encoding import FriendlyJsonSerde
+from web3._utils.request import make_post_request
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from triton.constants import (
+    RPC_HEDGE,
+    RPC_RATE_BURST,
+    RPC_RATE_LIMIT,
+    RPC_THROTTLE_RETRIES,
+    SERVICE_CONCURRENCY,
+)
+
+logger = logging.getLogger("rpc")
+
+DEFAULT_ENDPOINT = "http://localhost:8545"
+
+# Requests older than this do not count towards the health of an endpoint, so a
+# failing endpoint is tried again once its errors have expired
+HEALTH_WINDOW = 300  # seconds
+HEALTH_SAMPLES = 200
+# Seconds added to the expected latency of an endpoint that fails every request
+ERROR_PENALTY = 5.0
+# A read slower than this latency quantile of its endpoint is sent to the next one too
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+# A signer moves to another endpoint, between two batches, once its own fails this often
+UNHEALTHY_ERROR_RATE = 0.5
+
+# Jittered exponential backoff of the requests rejected with HTTP 429
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_MAX = 30  # seconds
+
+# Sending a transaction twice through different endpoints is not retried nor hedged
+WRITE_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+
+RPC_ERRORS = (requests.RequestException,)
+ASYNC_RPC_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+# Hedged reads run their requests here, while the calling thread waits for the first answer
+_executor = ThreadPoolExecutor(
+    max_workers=2 * SERVICE_CONCURRENCY, thread_name_prefix="triton-rpc"
+)
+
+
+def parse_endpoints(value: Optional[str]) -> List[str]:
+    """Get the endpoints of a comma separated list of RPC URLs"""
+    endpoints = [url.strip() for url in (value or "").split(",") if url.strip()]
+    return endpoints or [DEFAULT_ENDPOINT]
+
+
+def is_throttled(error: Exception) -> bool:
+    """Check whether a request was rejected by the rate limit of its endpoint"""
+    # requests errors hold their response, aiohttp ones its status and headers
+    response = getattr(error, "response", None)
+    status = (
+        getattr(error, "status", None) if response is None else response.status_code
+    )
+    return status == HTTPStatus.TOO_MANY_REQUESTS
+
+
+def get_backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """Get the time to wait before sending a throttled request again"""
+    # Full jitter, so the requests throttled together do not come back together
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+    response = getattr(error, "response", None)
+    headers = getattr(response if response is not None else error, "headers", None)
+    retry_after = headers.get("Retry-After") if headers else None
+    if retry_after is not None and retry_after.strip().isdigit():
+        delay += min(BACKOFF_MAX, float(retry_after))
+    return delay
+
+
+class LimiterStats(NamedTuple):
+    """Requests let through by a rate limiter, and how long they waited"""
+
+    requests: int
+    waited: int
+    total_wait: float  # seconds
+    max_wait: float  # seconds
+    queue_depth: int
+    max_queue_depth: int
+
+
+class TokenBucket:
+    """Rate limiter letting a burst of requests through, then a steady number per second"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Constructor"""
+        self.rate = rate  # requests per second, 0 is unlimited
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._stats = LimiterStats(0, 0, 0.0, 0.0, 0, 0)
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a token"""
+        return self._stats.queue_depth
+
+    def stats(self) -> LimiterStats:
+        """Get the requests let through since the start, and their waits"""
+        return self._stats
+
+    def _reserve(self) -> float:
+        """Take a token, returning the time until it is actually available"""
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+        # Tokens are reserved up front, so the waiting requests are served in order
+        self._tokens -= 1
+        return max(0.0, -self._tokens / self.rate)
+
+    def _take(self) -> float:
+        """Take a token and count the request, returning the time to wait for it"""
+        with self._lock:
+            delay = self._reserve() if self.rate > 0 else 0.0
+            stats = self._stats._replace(requests=self._stats.requests + 1)
+            if delay:
+                stats = stats._replace(
+                    waited=stats.waited + 1,
+                    total_wait=stats.total_wait + delay,
+                    max_wait=max(stats.max_wait, delay),
+                    queue_depth=stats.queue_depth + 1,
+                    max_queue_depth=max(stats.max_queue_depth, stats.queue_depth + 1),
+                )
+            self._stats = stats
+        return delay
+
+    def _leave_queue(self) -> None:
+        """Count a request as no longer waiting"""
+        with self._lock:
+            self._stats = self._stats._replace(queue_depth=self._stats.queue_depth - 1)
+
+    def acquire(self) -> float:
+        """Wait for a token, returning the seconds waited"""
+        delay = self._take()
+        if delay:
+            try:
+                time.sleep(delay)
+            finally:
+                self._leave_queue()
+        return delay
+
+    async def acquire_async(self) -> float:
+        """Wait for a token without blocking the event loop, returning the seconds waited"""
+        delay = self._take()
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._leave_queue()
+        return delay
+
+
+class RequestCoalescer:  # pylint: disable=too-few-public-methods
+    """Identical requests made while one of them is in flight share its response"""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.coalesced = 0
+        self._in_flight: Dict[str, "Future[bytes]"] = {}
+        self._lock = threading.Lock()
+
+    def send(self, key: str, send: Callable[[], bytes]) -> bytes:
+        """Send a request, unless an identical one is in flight"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if owner:
+            try:
+                future.set_result(send())
+            except BaseException as e:  # pylint: disable=broad-except
+                future.set_exception(e)
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+
+class RpcStats(NamedTuple):
+    """Rate limiting of an RPC pool since the start"""
+
+    limiter: LimiterStats
+    # Reads answered by an identical read already in flight
+    coalesced: int
+    # Responses with HTTP 429
+    throttled: int
+
+
+class EndpointHealth:
+    """Rolling latency and error rate of an RPC endpoint"""
+
+    def __init__(
+        self, url: str, window: float = HEALTH_WINDOW, samples: int = HEALTH_SAMPLES
+    ) -> None:
+        """Constructor"""
+        self.url = url
+        self.window = window  # seconds
+        self.throttled = 0  # responses with HTTP 429
+        # (time, latency, succeeded) of the latest requests
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool, now: Optional[float] = None) -> None:
+        """Record the outcome of a request"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._samples.append((now, latency, ok))
+
+    def _recent(self, now: Optional[float]) -> List[Tuple[float, float, bool]]:
+        """Get the samples within the window"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [sample for sample in self._samples if now - sample[0] < self.window]
+
+    def error_rate(self, now: Optional[float] = None) -> float:
+        """Get the share of the recent requests that failed"""
+        samples = self._recent(now)
+        if not samples:
+            return 0.0
+        return sum(not ok for _, _, ok in samples) / len(samples)
+
+    def latency(
+        self, quantile: float, min_samples: int = 1, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Get a quantile of the latency of the recent successful requests, or None without enough of them"""
+        latencies = sorted(latency for _, latency, ok in self._recent(now) if ok)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+    def score(self, now: Optional[float] = None) -> float:
+        """Get the expected cost of a request in seconds, lower is healthier"""
+        samples = self._recent(now)
+        if not samples:
+            # Untried endpoints, and the ones whose errors expired, are tried first
+            return 0.0
+        latencies = [latency for _, latency, ok in samples if ok]
+        error_rate = sum(not ok for _, _, ok in samples) / len(samples)
+        return (
+            statistics.median(latencies) if latencies else 0.0
+        ) + ERROR_PENALTY * error_rate
+
+
+class RpcPool:  # pylint: disable=too-many-instance-attributes
+    """RPC endpoints with failover and hedged reads, whose writes stay on one endpoint per signer"""
+
+    def __init__(
+        self,
+        urls: List[str],
+        *,
+        hedge: bool = RPC_HEDGE,
+        limiter: Optional[TokenBucket] = None,
+        retries: int = RPC_THROTTLE_RETRIES,
+    ) -> None:
+        """Constructor"""
+        self.endpoints = [EndpointHealth(url) for url in urls]
+        self.hedge = hedge
+        # Shared by every request to every endpoint, hedged and failed over ones included
+        self.limiter = limiter or TokenBucket(RPC_RATE_LIMIT, RPC_RATE_BURST)
+        self.retries = retries
+        self.coalescer = RequestCoalescer()
+        self._pins: Dict[str, EndpointHealth] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stats(self) -> RpcStats:
+        """Get the rate limiting of the pool since the start"""
+        return RpcStats(
+            limiter=self.limiter.stats(),
+            coalesced=self.coalescer.coalesced,
+            throttled=sum(endpoint.throttled for endpoint in self.endpoints),
+        )
+
+    def ranked(self) -> List[EndpointHealth]:
+        """Get the endpoints from the healthiest to the least healthy"""
+        now = time.monotonic()
+        # Ties keep the configured order
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.score(now))
+
+    @contextmanager
+    def pinned(self, key: str) -> Iterator[EndpointHealth]:
+        """Send every request of the current thread to the endpoint of a signer"""
+        # The nonces read and the transactions sent must reach the same mempool
+        with self._lock:
+            endpoint = self._pins.get(key)
+            if endpoint is None or endpoint.error_rate() >= UNHEALTHY_ERROR_RATE:
+                endpoint = self.ranked()[0]
+                self._pins[key] = endpoint
+        previous = getattr(self._local, "endpoint", None)
+        self._local.endpoint = endpoint
+        try:
+            yield endpoint
+        finally:
+            self._local.endpoint = previous
+
+    def post(
+        self, data: bytes, write: bool = False, key: Optional[str] = None
+    ) -> bytes:
+        """Send a JSON-RPC request, or a batch of them, and get the raw response"""
+        # Reads with the same key while one is in flight get its response
+        pinned = getattr(self._local, "endpoint", None)
+        if key is None or write or pinned is not None:
+            return self._send(data, write)
+        return self.coalescer.send(key, lambda: self._send(data, write))
+
+    def _send(self, data: bytes, write: bool) -> bytes:
+        """Send a request, backing off while it is throttled"""
+        attempt = 0
+        while True:
+            try:
+                pinned = getattr(self._local, "endpoint", None)
+                if pinned is not None:
+                    return self._post(pinned, data)
+                if write:
+                    return self._post(self.ranked()[0], data)
+                return self._read(data)
+            except RPC_ERRORS as e:
+                if not is_throttled(e) or attempt >= self.retries:
+                    raise
+                delay = get_backoff_delay(attempt, e)
+                logger.warning(
+                    "RPC rate limit reached, sending again in %.1f seconds", delay
+                )
+                time.sleep(delay)
+                attempt += 1
+
+    def _post(self, endpoint: EndpointHealth, data: bytes) -> bytes:
+        """Send a request to an endpoint, recording its latency and outcome"""
+        self.limiter.acquire()
+        started_at = time.monotonic()
+        try:
+            response = make_post_request(
+                URI(endpoint.url), data, headers={"Content-Type": "application/json"}
+            )
+        except RPC_ERRORS as e:
+            self.record(endpoint, time.monotonic() - started_at, e)
+            raise
+        self.record(endpoint, time.monotonic() - started_at)
+        return response
+
+    def record(
+        self,
+        endpoint: EndpointHealth,
+        latency: float,
+        error: Optional[Exception] = None,
+    ) -> None:
+        """Record the latency and outcome of a request to an endpoint"""
+        endpoint.record(latency, ok=error is None)
+        if error is not None and is_throttled(error):
+            with self._lock:
+                endpoint.throttled += 1
+
+    def _hedge_delay(self, endpoint: EndpointHealth) -> Optional[float]:
+        """Get the time after which a read is sent to another endpoint too, or None"""
+        # Hedging while requests wait for the rate limiter would only queue more of them
+        if not self.hedge or self.limiter.queue_depth:
+            return None
+        return endpoint.latency(HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES)
+
+    def _read(self, data: bytes) -> bytes:
+        """Send a read to the healthiest endpoint, failing over to the next ones"""
+        remaining = self.ranked()
+        last_error: Optional[Exception] = None
+        while remaining:
+            endpoint = remaining.pop(0)
+            delay = self._hedge_delay(endpoint) if remaining else None
+            if delay is None:
+                try:
+                    return self._post(endpoint, data)
+                except RPC_ERRORS as e:
+                    logger.warning("RPC request to %s failed: %s", endpoint.url, e)
+                    last_error = e
+                    continue
+
+            futures = {_executor.submit(self._post, endpoint, data): endpoint}
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                # Slower than usual: the next endpoint gets the same read, and the first answer wins
+                backup = remaining.pop(0)
+                futures[_executor.submit(self._post, backup, data)] = backup
+            for future in as_completed(futures):
+                try:
+                    return future.result()
+                except RPC_ERRORS as e:
+                    logger.warning(
+                        "RPC request to %s failed: %s", futures[future].url, e
+                    )
+                    last_error = e
+        raise last_error or RuntimeError("No RPC endpoint is configured")
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Web3 provider sending its requests through an RPC pool"""
+
+    def __init__(self, pool: RpcPool) -> None:
+        """Constructor"""
+        super().__init__()
+        self.pool = pool
+
+    def __str__(self) -> str:
+        """RPC connection name"""
+        return f"RPC pool {[endpoint.url for endpoint in self.pool.endpoints]}"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        """Send a JSON-RPC request"""
+        # The block tag is one of the params, so only reads of the same block are coalesced
+        response = self.pool.post(
+            self.encode_rpc_request(method, params),
+            write=method in WRITE_METHODS,
+            key=FriendlyJsonSerde().json_encode(
+                {"method": method, "params": params or []}
+            ),
+        )
+        return self.decode_rpc_response(response)
+
+
+class PooledAsyncHTTPProvider(AsyncHTTPProvider):
+    """Asyncio web3 provider on the first endpoint of an RPC pool, within the rate limit of the pool"""
+
+    def __init__(self, pool: RpcPool) -> None:
+        """Constructor"""
+        # The reads are neither failed over, hedged nor coalesced
+        super().__init__(pool.endpoints[0].url)
+        self.pool = pool
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        """Send a JSON-RPC request, backing off while it is throttled"""
+        endpoint = self.pool.endpoints[0]
+        attempt = 0
+        while True:
+            await self.pool.limiter.acquire_async()
+            started_at = time.monotonic()
+            try:
+                response = await super().make_request(method, params)
+            except ASYNC_RPC_ERRORS as e:
+                self.pool.record(endpoint, time.monotonic() - started_at, e)
+                if not is_throttled(e) or attempt >= self.pool.retries:
+                    raise
+                delay = get_backoff_delay(attempt, e)
+                logger.warning(
+                    "RPC rate limit reached, sending again in %.1f seconds", delay
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.pool.record(endpoint, time.monotonic() - started_at)
+            return response
+
+
+def format_rpc_stats(pool: RpcPool) -> str:
+    """Describe the health of the endpoints of a pool, and its rate limiting"""
+    lines = ["RPC endpoints:"]
+    for endpoint in pool.endpoints:
+        # Paths and queries are left out, they often hold API keys
+        p95 = endpoint.latency(0.95)
+        latency = f"{p95 * 1000:.0f} ms p95" if p95 is not None else "no recent reads"
+        lines.append(
+            f"• {urlparse(endpoint.url).hostname}: {latency}, "
+            f"{endpoint.error_rate():.0%} errors, {endpoint.throttled} throttled"
+        )
+
+    stats = pool.stats()
+    limiter = stats.limiter
+    rate = f"{pool.limiter.rate:g} requests/s" if pool.limiter.rate > 0 else "none"
+    average_wait = limiter.total_wait / limiter.waited if limiter.waited else 0.0
+    lines += [
+        f"Rate limit: {rate}",
+        f"• {limiter.requests:,} requests, {limiter.waited:,} waited "
+        f"{average_wait:.1f} s on average, at most {limiter.max_wait:.1f} s",
+        f"• {limiter.queue_depth} waiting now, at most {limiter.max_queue_depth}",
+        f"• {stats.coalesced:,} coalesced",
+    ]
+    return "\n".join(lines)
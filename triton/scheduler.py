@@ -0,0 +1,143 @@
+"""Scheduler Module
+This module decides when each service is polled next."""
+
+import heapq
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from triton.constants import (
+    POLL_INTERVAL,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+    RPC_BUDGET_PER_MINUTE,
+    USE_MULTICALL,
+)
+
+DAY = 86400  # seconds
+
+# RPC requests made to check the balances of a service. Through Multicall3 a
+# whole batch of services costs about one request, one per service is conservative
+POLL_COST = 1 if USE_MULTICALL else 5
+
+# Checks made before a balance is projected to reach its threshold, or before
+# the epoch ends
+CHECKS_PER_DEADLINE = 4
+
+
+class ServiceSchedule(NamedTuple):
+    """Next check of a service"""
+
+    name: str
+    next_check: float
+    interval: float
+
+
+def get_poll_interval(
+    *,
+    below_threshold: bool = False,
+    days_to_threshold: Optional[float] = None,
+    seconds_to_epoch_end: Optional[float] = None,
+) -> float:
+    """Get the interval until the next check of a service"""
+    if below_threshold:
+        # Already alerted on every check, polling faster would only repeat the alert
+        return POLL_INTERVAL
+
+    interval = POLL_MAX_INTERVAL
+    if days_to_threshold is not None:
+        interval = min(interval, days_to_threshold * DAY / CHECKS_PER_DEADLINE)
+    if seconds_to_epoch_end is not None and seconds_to_epoch_end > 0:
+        interval = min(interval, seconds_to_epoch_end / CHECKS_PER_DEADLINE)
+    return max(POLL_MIN_INTERVAL, interval)
+
+
+class PollBudget:
+    """RPC requests per minute shared by the background polls"""
+
+    def __init__(self, budget_per_minute: float = RPC_BUDGET_PER_MINUTE) -> None:
+        """Constructor"""
+        self.budget_per_minute = budget_per_minute
+        self._tokens = float(budget_per_minute)
+        self._refilled_at: Optional[float] = None
+
+    def refill(self, now: float) -> None:
+        """Add the tokens earned since the last refill"""
+        if self._refilled_at is not None:
+            earned = (now - self._refilled_at) * self.budget_per_minute / 60
+            self._tokens = min(float(self.budget_per_minute), self._tokens + earned)
+        self._refilled_at = now
+
+    def spend(self, cost: float) -> bool:
+        """Take the tokens of a poll, returning False if the budget cannot afford it"""
+        if self._tokens < cost:
+            return False
+        self._tokens -= cost
+        return True
+
+
+class PollScheduler:
+    """Priority queue of the next check of each service, within an RPC budget"""
+
+    def __init__(
+        self,
+        budget: Optional[PollBudget] = None,
+        cost: float = POLL_COST,
+    ) -> None:
+        """Constructor"""
+        # Schedulers given the same budget share its requests per minute
+        self.budget = budget if budget is not None else PollBudget()
+        self.cost = cost
+        self._queue: List[Tuple[float, str]] = []
+        self._schedules: Dict[str, ServiceSchedule] = {}
+        self._epoch_deadlines: Dict[str, float] = {}
+
+    def reschedule(self, name: str, interval: float, now: float) -> None:
+        """Schedule the next check of a service"""
+        schedule = ServiceSchedule(
+            name=name, next_check=now + interval, interval=interval
+        )
+        self._schedules[name] = schedule
+        # Replaced entries stay in the heap and are skipped when popped
+        heapq.heappush(self._queue, (schedule.next_check, name))
+
+    def add(self, name: str) -> None:
+        """Add a service, due at the next tick"""
+        self.reschedule(name, 0, 0)
+
+    def remove(self, name: str) -> None:
+        """Stop scheduling a service"""
+        self._schedules.pop(name, None)
+        self._epoch_deadlines.pop(name, None)
+
+    def set_epoch_deadline(self, name: str, epoch_end: Optional[float]) -> None:
+        """Set the end of the epoch of a service that is behind on mech requests, or None"""
+        if epoch_end is None:
+            self._epoch_deadlines.pop(name, None)
+        else:
+            self._epoch_deadlines[name] = epoch_end
+
+    def get_epoch_deadline(self, name: str) -> Optional[float]:
+        """Get the end of the epoch of a service that is behind on mech requests"""
+        return self._epoch_deadlines.get(name)
+
+    def pop_due(self, now: float) -> List[str]:
+        """Get the services due for a check, as far as the RPC budget allows"""
+        self.budget.refill(now)
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            next_check, name = self._queue[0]
+            schedule = self._schedules.get(name)
+            if schedule is None or schedule.next_check != next_check:
+                heapq.heappop(self._queue)
+                continue
+            if not self.budget.spend(self.cost):
+                # The rest waits for the budget to refill
+                break
+            heapq.heappop(self._queue)
+            due.append(name)
+        return due
+
+    def schedules(self) -> List[ServiceSchedule]:
+        """Get the schedule of every service, soonest first"""
+        return sorted(
+            self._schedules.values(), key=lambda schedule: schedule.next_check
+        )
@@ -2,40 +2,182 @@
 This module defines the TritonService class, which handles the operations of the Triton bot service.
 """
 
+import functools
 import logging
 import os
-import tempfile
-import traceback
-from typing import Optional, Tuple, cast
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+    cast,
+)
 
 import dotenv
+from aea.crypto.base import Crypto
 from aea_ledger_ethereum import EthereumCrypto
+from eth_account import Account
+from eth_keys import keys
 from operate.cli import OperateApp
-from operate.data import DATA_DIR
-from operate.data.contracts.mech_activity.contract import MechActivityContract
-from operate.data.contracts.requester_activity_checker.contract import (
-    RequesterActivityCheckerContract,
-)
-from operate.ledger.profiles import OLAS, get_staking_contract
+from operate.constants import OPERATE
+from operate.ledger.profiles import CONTRACTS, OLAS, STAKING, get_staking_contract
 from operate.operate_types import Chain, LedgerType
-from operate.utils.gnosis import transfer_erc20_from_safe
+from operate.services.protocol import StakingState
+from operate.services.service import NON_EXISTENT_TOKEN, Service
+from operate.wallet.master import EthereumMasterWallet
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+
+from triton import async_chain
+from triton.chain import (
+    get_balances,
+    get_mech_request_count_method,
+    get_staking_program,
+    get_staking_status,
+    load_contract,
+    web3,
+)
+from triton.claims import ClaimRequest
+from triton.constants import (
+    OPERATE_USER_PASSWORD,
+    STAKING_RESOLUTION_TTL,
+    WITHDRAWAL_GAS_LIMIT,
+)
+from triton.executor import map_blocking, run_blocking
+from triton.transactions import SafeTransaction, send_transactions
 
-from triton.chain import get_native_balance, get_olas_balance, get_staking_status
+logger = logging.getLogger("service")
 
 dotenv.load_dotenv(override=True)
 
+DEFAULT_MECH_ADDRESS = "0x77af31De935740567Cf4fF1986D04B2c964A786a"
 
-class TritonService:
-    """Trader"""
 
-    def __init__(self, operate: OperateApp, service_config_id: str) -> None:
+class KeyCrypto(EthereumCrypto):
+    """EthereumCrypto of a private key held in memory, without a key file"""
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self, private_key: str
+    ) -> None:
         """Constructor"""
+        # EthereumCrypto only loads keys from files, its base class takes the account
+        Crypto.__init__(  # pylint: disable=non-parent-init-called
+            self,
+            entity=Account.from_key(  # pylint: disable=no-value-for-parameter
+                private_key
+            ),
+        )
+        self._public_key = str(keys.PrivateKey(bytes(self.entity.key)).public_key)
+        self._address = self.entity.address
+
+
+# When each service was last seen staked or unstaked, by service id
+_staking_moves: Dict[int, float] = {}
+
+
+def invalidate_staking_resolutions(service_ids: Sequence[int]) -> None:
+    """Resolve the staking of services again, e.g. on a ServiceStaked or ServiceUnstaked event"""
+    now = time.monotonic()
+    for service_id in service_ids:
+        _staking_moves[service_id] = now
+
+
+def _get_staking_state(staking_contract: str, service_id: int) -> StakingState:
+    """Get the staking state of a service in a staking contract"""
+    return StakingState(
+        load_contract(staking_contract, "staking_token")
+        .functions.getStakingState(service_id)
+        .call()
+    )
+
+
+def get_current_staking_program(service_id: int, chain: Chain) -> Optional[str]:
+    """Get the id of the staking program a service is staked in, or None"""
+    # Read like operate's service manager does, through triton's rate limited web3
+    if service_id == NON_EXISTENT_TOKEN:
+        return None
+
+    # A staked service is owned by its staking contract
+    service_owner = (
+        load_contract(CONTRACTS[chain]["service_registry"], "service_registry")
+        .functions.ownerOf(service_id)
+        .call()
+    )
+    try:
+        state = _get_staking_state(service_owner, service_id)
+    except (ContractLogicError, BadFunctionCallOutput):
+        # The owner is not a staking contract. Other errors, like an RPC rate
+        # limit, say nothing about the service
+        return None
+    if state == StakingState.UNSTAKED:
+        return None
+
+    staking_programs = STAKING[chain]
+    for staking_program, staking_contract in staking_programs.items():
+        if staking_contract == service_owner:
+            return staking_program
+
+    # Inner staking contracts, e.g. of a DualStakingToken, hold the service themselves
+    for staking_program, staking_contract in staking_programs.items():
+        if _get_staking_state(staking_contract, service_id) in (
+            StakingState.STAKED,
+            StakingState.EVICTED,
+        ):
+            return staking_program
+
+    # Staked in a staking contract without a known program id
+    return service_owner
+
+
+class StakingResolution(NamedTuple):
+    """Staking contract and mech a service reports its activity to"""
+
+    staking_program: Optional[str]
+    staking_contract: str
+    activity_checker: str
+    mech: str
+
+
+class OperatorContext:  # pylint: disable=too-few-public-methods
+    """Service manager and master wallet shared by the services of an operator"""
+
+    def __init__(self, operate: OperateApp) -> None:
+        """Constructor"""
+        self.operate = operate
         self.service_manager = operate.service_manager()
-        self.master_wallet = operate.wallet_manager.load(
-            ledger_type=LedgerType.ETHEREUM
+        # The master key is only decrypted when the first transaction is signed,
+        # balance checks only use the address stored with the wallet
+        self.master_wallet = cast(
+            EthereumMasterWallet,
+            operate.wallet_manager.load(ledger_type=LedgerType.ETHEREUM),
+        )
+
+
+class TritonService:  # pylint: disable=too-many-instance-attributes
+    """Trader"""
+
+    def __init__(
+        self,
+        operator: OperatorContext,
+        service_config_id: str,
+        *,
+        service: Optional[Service] = None,
+    ) -> None:
+        """Constructor"""
+        self.operator = operator
+        self.service_manager = operator.service_manager
+        self.master_wallet = operator.master_wallet
+        # The service already loaded by the discovery is not read from disk again
+        self.service = service or self.service_manager.load(
+            service_config_id=service_config_id
         )
-        self.service = self.service_manager.load(service_config_id=service_config_id)
         self.logger = logging.getLogger(self.service.name)
+        self._staking_resolution: Optional[StakingResolution] = None
+        self._resolved_at = 0.0
         self.withdrawal_address = os.getenv("WITHDRAWAL_ADDRESS", None)
 
     @property
@@ -62,87 +204,119 @@ class TritonService:
         """Get the service safe address"""
         return self.service.chain_configs[self.service.home_chain].chain_data.multisig
 
+    @functools.cached_property
+    def agent_crypto(self) -> EthereumCrypto:
+        """Get the signer of the agent EOA, which owns the service Safe"""
+        return KeyCrypto(self.service.keys[0].private_key)
+
     @property
-    def staking_contract_address(self) -> str:
-        """Get the staking contract address"""
-        try:
-            current_staking_program = self.service_manager._get_current_staking_program(  # pylint: disable=protected-access  # noqa: E501
-                service=self.service, chain=self.service.home_chain
-            )
-            staking_contract_address = get_staking_contract(
-                chain=self.service.home_chain,
-                staking_program_id=current_staking_program,
+    def current_staking_program(self) -> Optional[str]:
+        """Get the id of the staking program the service is staked in"""
+        return get_current_staking_program(
+            self.service_id,
+            Chain.from_string(self.service.home_chain),  # type: ignore[attr-defined]
+        )
+
+    def _get_staking_contract_address(self, staking_program: Optional[str]) -> str:
+        """Get the staking contract address of a staking program"""
+        staking_contract_address = get_staking_contract(
+            chain=self.service.home_chain,
+            staking_program_id=staking_program,
+        )
+        if not staking_contract_address:
+            raise ValueError(
+                f"Staking contract address not found for {staking_program=}."
             )
-            if not staking_contract_address:
-                raise ValueError(
-                    f"Staking contract address not found for {current_staking_program=}."
-                )
 
-            return staking_contract_address
-        except KeyError as e:
-            raise ValueError("Failed to get staking contract address.") from e
+        return staking_contract_address
 
-    def get_staking_status(self) -> dict:
-        """Get the staking status"""
-        self.logger.info("Checking staking status")
+    @property
+    def staking_contract_address(self) -> str:
+        """Get the staking contract address"""
         try:
-            staking_contract_address = self.staking_contract_address
-            sftxb = self.service_manager.get_eth_safe_tx_builder(
-                ledger_config=self.service.chain_configs[
-                    self.service.home_chain
-                ].ledger_config,
-            )
-            staking_params = sftxb.get_staking_params(
-                staking_contract=staking_contract_address
-            )
-            activity_checker_contract_address = staking_params["activity_checker"]
+            return self._get_staking_contract_address(self.current_staking_program)
         except KeyError as e:
-            raise ValueError("Failed to get staking status.") from e
+            raise ValueError("Failed to get staking contract address.") from e
 
-        try:
-            requester_activity_checker = cast(
-                RequesterActivityCheckerContract,
-                RequesterActivityCheckerContract.from_dir(
-                    directory=str(DATA_DIR / "contracts" / "requester_activity_checker")
-                ),
-            )
-            mech = (
-                requester_activity_checker.get_instance(
-                    ledger_api=sftxb.ledger_api,
-                    contract_address=activity_checker_contract_address,
-                )
-                .functions.mechMarketplace()
-                .call()
-            )
-        except Exception:  # pylint: disable=broad-except
+    def _get_mech(self, activity_checker_address: str) -> Optional[str]:
+        """Get the mech the activity checker counts requests for"""
+        # Newer activity checkers count the requests to the mech marketplace
+        for abi_file, getter in (
+            ("requester_activity_checker", "mechMarketplace"),
+            ("mech_activity", "agentMech"),
+        ):
             try:
-                mech_activity_contract = cast(
-                    MechActivityContract,
-                    MechActivityContract.from_dir(
-                        directory=str(DATA_DIR / "contracts" / "mech_activity")
-                    ),
-                )
-                mech = (
-                    mech_activity_contract.get_instance(
-                        ledger_api=sftxb.ledger_api,
-                        contract_address=activity_checker_contract_address,
-                    )
-                    .functions.agentMech()
+                return (
+                    load_contract(activity_checker_address, abi_file)
+                    .get_function_by_name(getter)()
                     .call()
                 )
             except Exception:  # pylint: disable=broad-except
-                mech = "0x77af31De935740567Cf4fF1986D04B2c964A786a"
+                continue
+        return None
 
-        return get_staking_status(
-            mech_contract_address=mech,
-            staking_token_address=staking_contract_address,
-            activity_checker_address=activity_checker_contract_address,
-            service_id=self.service_id,
-            safe_address=self.service_safe,
+    def resolve_staking(self) -> StakingResolution:
+        """Resolve the staking contract and mech of the service"""
+        # Memoized until the service is staked or unstaked, and checked again once stale
+        now = time.monotonic()
+        resolution = self._staking_resolution
+        if (
+            resolution is not None
+            and self._resolved_at > _staking_moves.get(self.service_id, -1.0)
+            and now - self._resolved_at < STAKING_RESOLUTION_TTL
+        ):
+            return resolution
+
+        try:
+            staking_program = self.current_staking_program
+            if resolution is not None and resolution.staking_program == staking_program:
+                self._resolved_at = now
+                return resolution
+
+            staking_contract_address = self._get_staking_contract_address(
+                staking_program
+            )
+            # Read from the cached staking program, which only changes at checkpoints
+            activity_checker_address = get_staking_program(
+                staking_contract_address
+            ).activity_checker
+        except KeyError as e:
+            raise ValueError("Failed to get staking status.") from e
+
+        mech = self._get_mech(activity_checker_address)
+        resolution = StakingResolution(
+            staking_program=staking_program,
+            staking_contract=staking_contract_address,
+            activity_checker=activity_checker_address,
+            mech=mech or DEFAULT_MECH_ADDRESS,
         )
+        if mech is not None:
+            # The fallback mech may come from a transient failure, so it is not kept
+            self._staking_resolution = resolution
+            self._resolved_at = now
+        return resolution
+
+    def get_staking_params(self) -> dict:
+        """Get the parameters needed to read the staking status"""
+        resolution = self.resolve_staking()
+        return {
+            "mech_contract_address": resolution.mech,
+            "staking_token_address": resolution.staking_contract,
+            "service_id": self.service_id,
+            "safe_address": self.service_safe,
+            # Looked up on every read, as it is probed again once it reverts
+            "mech_request_count_method": get_mech_request_count_method(
+                resolution.mech, self.service_safe
+            ),
+        }
+
+    def get_staking_status(self) -> dict:
+        """Get the staking status"""
+        self.logger.info("Checking staking status")
+        return get_staking_status(**self.get_staking_params())
 
-    def check_balance(self) -> dict:
-        """Check the native balance"""
+    def balance_addresses(self) -> Dict[str, str]:
+        """Get the addresses whose balances are monitored"""
         chain_config = self.service.chain_configs[self.service.home_chain]
         if len(chain_config.chain_data.instances) == 0:
             raise ValueError("No agent instances found in the chain configuration")
@@ -150,16 +324,24 @@ class TritonService:
         if self.master_wallet.safes is None:
             raise ValueError("Master wallet safes not found")
 
-        agent_eoa_native_balance = get_native_balance(self.agent_address)
-        service_safe_native_balance = get_native_balance(self.service_safe)
-        master_eoa_native_balance = get_native_balance(
-            self.master_wallet.crypto.address
-        )
-        master_safe_native_balance = get_native_balance(
-            self.master_wallet.safes[Chain.from_string(self.service.home_chain)]  # type: ignore[attr-defined]
-        )
-        service_safe_olas_balance = get_olas_balance(self.service_safe) / 1e18
+        home_chain = Chain.from_string(self.service.home_chain)  # type: ignore[attr-defined]
+        return {
+            "agent_eoa": self.agent_address,
+            "service_safe": self.service_safe,
+            "master_eoa": self.master_wallet.address,
+            "master_safe": self.master_wallet.safes[home_chain],
+        }
 
+    def format_balances(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        agent_eoa_native_balance: float,
+        service_safe_native_balance: float,
+        master_eoa_native_balance: float,
+        master_safe_native_balance: float,
+        service_safe_olas_balance: float,
+    ) -> dict:
+        """Log and build the balances dictionary"""
         self.logger.info(
             "Agent EOA balance = %.2f xDAI "
             "| Service Safe balance: %.2f xDAI  %.2f OLAS "
@@ -180,62 +362,184 @@ class TritonService:
             "service_safe_olas_balance": service_safe_olas_balance,
         }
 
-    def claim_rewards(self) -> Optional[str]:
-        """Claim staking rewards"""
+    def get_claim_request(self) -> ClaimRequest:
+        """Get the claim of the staking rewards, executed by the master Safe"""
+        if self.master_wallet.safes is None:
+            raise ValueError("Master wallet safes not found")
 
-        self.logger.info("Claiming rewards")
-        try:
-            tx_hash = self.service_manager.claim_on_chain_from_safe(
-                service_config_id=self.service.service_config_id,
-                chain=self.service.home_chain,
+        home_chain = Chain.from_string(self.service.home_chain)  # type: ignore[attr-defined]
+        return ClaimRequest(
+            name=str(self.service.name),
+            service_id=self.service_id,
+            staking_contract=self.resolve_staking().staking_contract,
+            safe=self.master_wallet.safes[home_chain],
+            crypto=self.master_wallet.crypto,
+        )
+
+    def get_withdrawal_transaction(self, amount: int) -> SafeTransaction:
+        """Get the transfer of OLAS from the service Safe to the withdrawal address"""
+        if not self.withdrawal_address:
+            raise ValueError("Withdrawal address not set")
+
+        home_chain = Chain.from_string(self.service.home_chain)  # type: ignore[attr-defined]
+        data = load_contract(OLAS[home_chain], "olas", False).encodeABI(
+            fn_name="transfer",
+            args=[web3.to_checksum_address(self.withdrawal_address), amount],
+        )
+        return SafeTransaction(
+            name=str(self.service.name),
+            safe=self.service_safe,
+            to=OLAS[home_chain],
+            data=data,
+            crypto=self.agent_crypto,
+            gas=WITHDRAWAL_GAS_LIMIT,
+        )
+
+
+def load_operator_services(
+    operator_name: str, operate_path: str
+) -> Dict[str, TritonService]:
+    """Load the services of an operator, sharing its service manager and master wallet"""
+    operate = OperateApp(Path(operate_path) / OPERATE)
+    operate.password = OPERATE_USER_PASSWORD
+    operator = OperatorContext(operate)
+    return {
+        f"{operator_name}-{service.name}": TritonService(
+            operator, service.service_config_id, service=service
+        )
+        for service in operator.service_manager._get_all_services()  # pylint: disable=protected-access
+    }
+
+
+def discover_operators(
+    operators: Dict[str, str],
+) -> Dict[str, Dict[str, TritonService]]:
+    """Load the services of several operators concurrently, grouped by operator"""
+    operator_services: Dict[str, Dict[str, TritonService]] = {}
+    operator_items = list(operators.items())
+    for (operator_name, operate_path), result in zip(
+        operator_items,
+        map_blocking(lambda item: load_operator_services(*item), operator_items),
+    ):
+        if isinstance(result, Exception):
+            # The other operators are still monitored
+            logger.error(
+                "Failed to load the services of %s at %s: %s",
+                operator_name,
+                operate_path,
+                result,
             )
-            return tx_hash.hex()  # type: ignore[attr-defined]
-        except Exception:  # pylint: disable=broad-except
-            self.logger.error("Failed to claim rewards. %s", traceback.format_exc())
+            continue
+        operator_services[operator_name] = result
+    return operator_services
 
-        return None
 
-    def withdraw_rewards(self) -> Tuple[Optional[str], float]:
-        """Withdraw staking rewards"""
+def flatten_services(
+    operator_services: Dict[str, Dict[str, TritonService]],
+) -> Dict[str, TritonService]:
+    """Get the services of every operator, in the order of the operators"""
+    return {
+        service_name: service
+        for services in operator_services.values()
+        for service_name, service in services.items()
+    }
 
-        if not self.withdrawal_address:
-            return None, 0
 
+def _all_balance_addresses(
+    services: Sequence[TritonService],
+) -> List[Union[Dict[str, str], Exception]]:
+    """Get the monitored addresses of every service, or the error that prevented it"""
+    all_addresses: List[Union[Dict[str, str], Exception]] = []
+    for service in services:
         try:
-            service_safe_olas_balance = get_olas_balance(self.service_safe)
-        except Exception:  # pylint: disable=broad-except
-            self.logger.error("Failed to get OLAS balance. %s", traceback.format_exc())
-            return None, 0
+            all_addresses.append(service.balance_addresses())
+        except Exception as e:  # pylint: disable=broad-except
+            all_addresses.append(e)
+    return all_addresses
 
-        if not service_safe_olas_balance:
-            self.logger.info("No OLAS to withdraw")
-            return None, 0
 
-        self.logger.info(
-            "Withdrawing %.2f OLAS rewards", service_safe_olas_balance / 1e18
-        )
-        home_chain = Chain.from_string(self.service.home_chain)  # type: ignore[attr-defined]
-        olas_address = OLAS[home_chain]
-        agent_eoa_key = self.service.keys[0]
-        with tempfile.NamedTemporaryFile() as agent_eoa_private_key:
-            agent_eoa_private_key.write(agent_eoa_key.private_key.encode())
-            agent_eoa_private_key.flush()
-            agent_eoa_crypto = EthereumCrypto(
-                private_key_path=agent_eoa_private_key.name
+def _build_balances(
+    services: Sequence[TritonService],
+    all_addresses: List[Union[Dict[str, str], Exception]],
+    native_balances: Dict[str, Any],
+    olas_balances: Dict[str, int],
+) -> List[Any]:
+    """Split the batched balance reads back into per-service balances"""
+    results: List[Any] = []
+    for service, addresses in zip(services, all_addresses):
+        if isinstance(addresses, Exception):
+            results.append(addresses)
+            continue
+        results.append(
+            service.format_balances(
+                agent_eoa_native_balance=native_balances[addresses["agent_eoa"]],
+                service_safe_native_balance=native_balances[addresses["service_safe"]],
+                master_eoa_native_balance=native_balances[addresses["master_eoa"]],
+                master_safe_native_balance=native_balances[addresses["master_safe"]],
+                service_safe_olas_balance=olas_balances[addresses["service_safe"]]
+                / 1e18,
             )
+        )
+    return results
+
 
+def check_balances(services: Sequence[TritonService]) -> List[Any]:
+    """Check the balances of several services with one batched read"""
+    # Results keep the order of the services. Failures are returned as exceptions
+    all_addresses = _all_balance_addresses(services)
+    valid_addresses = [a for a in all_addresses if not isinstance(a, Exception)]
+    native_balances, olas_balances = get_balances(
+        (address for addresses in valid_addresses for address in addresses.values()),
+        (addresses["service_safe"] for addresses in valid_addresses),
+    )
+    return _build_balances(services, all_addresses, native_balances, olas_balances)
+
+
+async def check_balances_async(services: Sequence[TritonService]) -> List[Any]:
+    """Check the balances of several services with one batched async read"""
+    all_addresses = _all_balance_addresses(services)
+    valid_addresses = [a for a in all_addresses if not isinstance(a, Exception)]
+    native_balances, olas_balances = await async_chain.get_balances(
+        (address for addresses in valid_addresses for address in addresses.values()),
+        (addresses["service_safe"] for addresses in valid_addresses),
+    )
+    return _build_balances(services, all_addresses, native_balances, olas_balances)
+
+
+async def withdraw_all(services: Sequence[TritonService]) -> List[Any]:
+    """Withdraw the OLAS of several service Safes, reading their balances in one batch"""
+    # Results are (tx hash, OLAS) pairs, or exceptions
+    results: List[Any] = [(None, 0)] * len(services)
+    withdrawing = [
+        index for index, service in enumerate(services) if service.withdrawal_address
+    ]
+    if not withdrawing:
+        return results
+
+    _, olas_balances = await run_blocking(
+        get_balances, [], [services[index].service_safe for index in withdrawing]
+    )
+    transactions: Dict[int, SafeTransaction] = {}
+    for index in withdrawing:
+        service = services[index]
+        amount = olas_balances[service.service_safe]
+        if not amount:
+            service.logger.info("No OLAS to withdraw")
+            continue
         try:
-            service_safe_olas_balance = get_olas_balance(self.service_safe)
-            tx_hash = transfer_erc20_from_safe(
-                ledger_api=self.master_wallet.ledger_api(chain=home_chain),
-                crypto=agent_eoa_crypto,
-                safe=self.service_safe,
-                token=olas_address,
-                to=self.withdrawal_address,
-                amount=service_safe_olas_balance,
-            )
-        except Exception:  # pylint: disable=broad-except
-            self.logger.error("Failed to withdraw OLAS. %s", traceback.format_exc())
-            return None, 0
+            transactions[index] = service.get_withdrawal_transaction(amount)
+        except Exception as e:  # pylint: disable=broad-except
+            results[index] = e
+            continue
+        service.logger.info("Withdrawing %.2f OLAS rewards", amount / 1e18)
 
-        return tx_hash, service_safe_olas_balance / 1e18
+    # Safes sharing an owner have their transfers sent back to back. They are not
+    # waited for, the receipt tracker follows them up
+    tx_hashes = await send_transactions(list(transactions.values()))
+    for index, tx_hash in zip(transactions, tx_hashes):
+        results[index] = (
+            tx_hash
+            if isinstance(tx_hash, BaseException)
+            else (tx_hash, olas_balances[services[index].service_safe] / 1e18)
+        )
+    return results
@@ -0,0 +1,311 @@
+"""Transactions Module
+This module sends Safe transactions back to back, with locally assigned nonces, and reads their receipts.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, cast
+
+import requests
+from aea.crypto.base import Crypto
+from eth_typing import HexStr
+from web3._utils.method_formatters import receipt_formatter
+from web3.exceptions import ContractLogicError, TransactionNotFound
+from web3.types import TxParams, TxReceipt
+
+from triton.chain import load_contract, rpc_pool, web3
+from triton.constants import TX_RECEIPT_TIMEOUT, TX_RETRIES
+from triton.executor import map_concurrently, run_blocking
+
+logger = logging.getLogger("transactions")
+
+NULL_ADDRESS = "0x" + "0" * 40
+SAFE_CALL_OPERATION = 0
+
+# About one Gnosis block
+RECEIPT_POLL_INTERVAL = 5  # seconds
+
+
+class SafeTransaction(NamedTuple):
+    """Call made by a Safe, signed by one of its owners"""
+
+    name: str
+    safe: str
+    to: str
+    data: str
+    crypto: Crypto
+    # The gas is not estimated, as the Safe nonce check fails until the previous
+    # transactions of the Safe are mined
+    gas: int
+
+    @property
+    def signer(self) -> str:
+        """Address of the owner that signs the transaction"""
+        return self.crypto.address
+
+
+class TransactionFailed(Exception):
+    """A transaction was not mined, or was reverted"""
+
+
+def build_safe_transaction(
+    transaction: SafeTransaction,
+    *,
+    nonce: int,
+    safe_nonce: int,
+    gas_price: int,
+    chain_id: int,
+) -> str:
+    """Build and sign a Safe transaction for the given nonces"""
+    safe = load_contract(transaction.safe, "gnosis_safe")
+    safe_tx_args = (
+        web3.to_checksum_address(transaction.to),
+        0,  # value
+        web3.to_bytes(hexstr=cast(HexStr, transaction.data)),
+        SAFE_CALL_OPERATION,
+        0,  # safeTxGas
+        0,  # baseGas
+        0,  # gasPrice
+        NULL_ADDRESS,  # gasToken
+        NULL_ADDRESS,  # refundReceiver
+    )
+    # The Safe nonce is given explicitly, since the previous transactions are not mined yet
+    safe_tx_hash = safe.functions.getTransactionHash(*safe_tx_args, safe_nonce).call()
+    signature = transaction.crypto.sign_message(
+        message=safe_tx_hash, is_deprecated_mode=True
+    )
+    tx = safe.functions.execTransaction(
+        *safe_tx_args, web3.to_bytes(hexstr=cast(HexStr, signature))
+    ).build_transaction(
+        cast(
+            TxParams,
+            {
+                "from": transaction.signer,
+                "nonce": nonce,
+                "gas": transaction.gas,
+                "gasPrice": gas_price,
+                "chainId": chain_id,
+            },
+        )
+    )
+    signed = transaction.crypto.sign_transaction(transaction=cast(dict, tx))
+    return cast(str, signed["raw_transaction"])
+
+
+def simulate_safe_transaction(transaction: SafeTransaction) -> None:
+    """Run the call of a Safe transaction on the latest block, raising ContractLogicError if it reverts"""
+    # The Safe nonce is not checked, so the transactions of a batch can be simulated before any is mined
+    web3.eth.call(
+        cast(
+            TxParams,
+            {
+                "from": web3.to_checksum_address(transaction.safe),
+                "to": web3.to_checksum_address(transaction.to),
+                "data": cast(HexStr, transaction.data),
+                "gas": transaction.gas,
+            },
+        )
+    )
+
+
+def send_safe_transactions(transactions: Sequence[SafeTransaction]) -> List[Any]:
+    """Send the transactions of a single signer back to back, returning the tx hash or the error of each"""
+    signer = transactions[0].signer
+    # Nonces are read from, and transactions sent to, the same endpoint
+    with rpc_pool.pinned(signer):
+        nonce = int(
+            web3.eth.get_transaction_count(web3.to_checksum_address(signer), "pending")
+        )
+        gas_price = web3.eth.gas_price
+        chain_id = web3.eth.chain_id
+        safe_nonces: Dict[str, int] = {}
+
+        results: List[Any] = []
+        for transaction in transactions:
+            try:
+                simulate_safe_transaction(transaction)
+                if transaction.safe not in safe_nonces:
+                    safe_nonces[transaction.safe] = (
+                        load_contract(transaction.safe, "gnosis_safe")
+                        .functions.nonce()
+                        .call()
+                    )
+                raw_transaction = build_safe_transaction(
+                    transaction,
+                    nonce=nonce,
+                    safe_nonce=safe_nonces[transaction.safe],
+                    gas_price=gas_price,
+                    chain_id=chain_id,
+                )
+                tx_hash = web3.to_hex(
+                    web3.eth.send_raw_transaction(cast(HexStr, raw_transaction))
+                )
+            except ContractLogicError as e:
+                # Nothing was sent, so the nonces stay free for the next transactions
+                logger.error(
+                    "[%s] The transaction would revert: %s", transaction.name, e
+                )
+                results.append(TransactionFailed(f"Transaction would revert: {e}"))
+                continue
+            except Exception as e:  # pylint: disable=broad-except
+                # A gap in the nonces would hold back every later transaction, so they are not sent
+                logger.error(
+                    "[%s] Failed to send the transaction: %s", transaction.name, e
+                )
+                results.extend([e] * (len(transactions) - len(results)))
+                break
+
+            logger.info("[%s] Sent %s (nonce %s)", transaction.name, tx_hash, nonce)
+            results.append(tx_hash)
+            nonce += 1
+            safe_nonces[transaction.safe] += 1
+        return results
+
+
+def _get_receipt(tx_hash: str) -> Optional[TxReceipt]:
+    """Get the receipt of a transaction, or None if it is not mined yet"""
+    try:
+        return web3.eth.get_transaction_receipt(cast(HexStr, tx_hash))
+    except TransactionNotFound:
+        return None
+
+
+def get_receipts(tx_hashes: Sequence[str]) -> Dict[str, TxReceipt]:
+    """Get the receipts of several transactions with one batched JSON-RPC request"""
+    # Transactions not mined yet are left out
+    if not tx_hashes:
+        return {}
+
+    results: List[Optional[Any]] = [None] * len(tx_hashes)
+    try:
+        response = rpc_pool.post(
+            json.dumps(
+                [
+                    {
+                        "jsonrpc": "2.0",
+                        "id": index,
+                        "method": "eth_getTransactionReceipt",
+                        "params": [tx_hash],
+                    }
+                    for index, tx_hash in enumerate(tx_hashes)
+                ]
+            ).encode()
+        )
+        for item in json.loads(response):
+            if "error" not in item:
+                results[item["id"]] = item["result"] or {}
+    except (requests.RequestException, ValueError, TypeError, KeyError) as e:
+        logger.warning(
+            "Batched receipt read failed, falling back to sequential reads: %s", e
+        )
+
+    # An empty result is a transaction not mined yet. Failed reads are made one by one
+    receipts: Dict[str, TxReceipt] = {}
+    for tx_hash, result in zip(tx_hashes, results):
+        if result is None:
+            result = _get_receipt(tx_hash)
+        elif result:
+            result = receipt_formatter(result)
+        if result:
+            receipts[tx_hash] = cast(TxReceipt, result)
+    return receipts
+
+
+async def wait_for_receipts(
+    tx_hashes: Sequence[str], timeout: float = TX_RECEIPT_TIMEOUT
+) -> Dict[str, TxReceipt]:
+    """Wait for the receipts of several transactions in a single polling loop"""
+    # Transactions still not mined at the timeout are left out
+    deadline = time.monotonic() + timeout
+    receipts: Dict[str, TxReceipt] = {}
+    while True:
+        pending = [tx_hash for tx_hash in tx_hashes if tx_hash not in receipts]
+        if pending:
+            receipts.update(await run_blocking(get_receipts, pending))
+        if len(receipts) == len(set(tx_hashes)) or time.monotonic() >= deadline:
+            return receipts
+        await asyncio.sleep(RECEIPT_POLL_INTERVAL)
+
+
+async def _send_by_signer(
+    transactions: Sequence[SafeTransaction], indexes: Sequence[int]
+) -> Tuple[Dict[int, str], Dict[int, BaseException]]:
+    """Send some of the transactions, each signer concurrently, and split the sent ones from the failures"""
+    groups: Dict[str, List[int]] = {}
+    for index in indexes:
+        groups.setdefault(transactions[index].signer, []).append(index)
+    group_indexes = list(groups.values())
+    group_results = await map_concurrently(
+        lambda group: send_safe_transactions([transactions[index] for index in group]),
+        group_indexes,
+        timeout=None,
+    )
+
+    sent: Dict[int, str] = {}
+    errors: Dict[int, BaseException] = {}
+    for group, group_result in zip(group_indexes, group_results):
+        for position, index in enumerate(group):
+            result = (
+                group_result
+                if isinstance(group_result, BaseException)
+                else group_result[position]
+            )
+            if isinstance(result, BaseException):
+                errors[index] = result
+            else:
+                sent[index] = result
+    return sent, errors
+
+
+async def send_transactions(transactions: Sequence[SafeTransaction]) -> List[Any]:
+    """Send several Safe transactions without waiting for them, returning the tx hash or the error of each"""
+    sent, errors = await _send_by_signer(transactions, range(len(transactions)))
+    return [
+        sent[index] if index in sent else errors[index]
+        for index in range(len(transactions))
+    ]
+
+
+async def send_all(
+    transactions: Sequence[SafeTransaction],
+    *,
+    retries: int = TX_RETRIES,
+    timeout: float = TX_RECEIPT_TIMEOUT,
+) -> List[Any]:
+    """Send several Safe transactions and wait for them, returning the tx hash or the error of each"""
+    # Signers send concurrently, each one back to back with local nonces
+    results: Dict[int, Any] = {}
+    pending = list(range(len(transactions)))
+    for attempt in range(retries + 1):
+        sent, errors = await _send_by_signer(transactions, pending)
+        results.update(errors)
+
+        receipts = await wait_for_receipts(list(sent.values()), timeout)
+        pending = []
+        # The first reverted transaction of a Safe failed on its own, and did not use its Safe
+        # nonce, so the later ones of the Safe were reverted for their nonce and are sent again
+        reverted_safes = set()
+        for index, tx_hash in sorted(sent.items()):
+            receipt = receipts.get(tx_hash)
+            if receipt is None:
+                # Sending it again with a later nonce would wait behind this one anyway
+                results[index] = TransactionFailed(
+                    f"Transaction {tx_hash} was not mined within {timeout:g} seconds"
+                )
+            elif receipt["status"] == 1:
+                results[index] = tx_hash
+            else:
+                results[index] = TransactionFailed(
+                    f"Transaction {tx_hash} was reverted"
+                )
+                safe = (transactions[index].signer, transactions[index].safe)
+                if safe in reverted_safes:
+                    pending.append(index)
+                reverted_safes.add(safe)
+
+        if not pending or attempt == retries:
+            break
+        logger.warning("Sending %s reverted transactions again", len(pending))
+    return [results[index] for index in range(len(transactions))]
@@ -1,37 +1,60 @@
 """ "Triton Telegram bot"""
 
+import asyncio
 import datetime
 import logging
+import time
 import typing as t
-from pathlib import Path
 
 import dotenv
-import pytz
-import yaml
-from operate.cli import OperateApp
-from operate.constants import OPERATE
-from operate.operate_types import Chain
-from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import Application, CommandHandler, ContextTypes
 
-from triton.chain import get_olas_price, get_slots
+from triton import async_chain
+from triton.chain import olas_price, preload_contracts
+from triton.commands import (
+    Commands,
+    TransactionReport,
+    claim_rewards,
+    gather_balances,
+    gather_staking_statuses,
+    markdown_prefix,
+    withdraw_rewards,
+)
+from triton.config import ConfigWatcher, diff_operators
 from triton.constants import (
     AGENT_BALANCE_THRESHOLD,
     AUTOCLAIM,
     AUTOCLAIM_DAY,
     AUTOCLAIM_HOUR_UTC,
+    BALANCE_ALERT_HORIZON,
+    BALANCE_HISTORY,
     CHAT_ID,
+    CLAIM_MIN_REWARD,
+    CONFIG_RELOAD_INTERVAL,
+    EPOCH_MONITOR,
+    EPOCH_RISK_HORIZON,
+    EVENT_INDEXER,
+    EVENT_INDEXER_INTERVAL,
     GNOSISSCAN_ADDRESS_URL,
-    GNOSISSCAN_TX_URL,
-    LOCAL_TIMEZONE,
-    MANUAL_CLAIM,
-    OPERATE_USER_PASSWORD,
+    OLAS_PRICE_TTL,
+    POLL_INTERVAL,
+    POLL_TICK,
     SAFE_BALANCE_THRESHOLD,
     TELEGRAM_TOKEN,
 )
-from triton.service import TritonService
-from triton.tools import escape_markdown_v2
+from triton.executor import run_blocking
+from triton.history import BurnRate, balance_history, burn_rates, get_balance_samples
+from triton.indexer import event_indexer
+from triton.monitor import SAMPLE_COST, EpochMonitor, get_sample_interval
+from triton.receipts import receipt_tracker
+from triton.scheduler import PollBudget, PollScheduler, get_poll_interval
+from triton.service import (
+    TritonService,
+    discover_operators,
+    flatten_services,
+)
+from triton.transactions import RECEIPT_POLL_INTERVAL
 
 logger = logging.getLogger("telegram_bot")
 
@@ -39,199 +62,167 @@ logger = logging.getLogger("telegram_bot")
 dotenv.load_dotenv(override=True)
 
 
-def run_triton() -> None:  # pylint: disable=too-many-statements,too-many-locals
-    """Main"""
-
-    # Load configuration
-    with open("config.yaml", "r", encoding="utf-8") as config_file:
-        config = yaml.safe_load(config_file)
-
-    # Instantiate the services
-    services: t.Dict[str, TritonService] = {}
-    for operator_name, operate_path in config["operators"].items():
-        operate = OperateApp(Path(operate_path) / OPERATE)
-        operate.password = OPERATE_USER_PASSWORD
-        for (
-            service
-        ) in (
-            operate.service_manager()._get_all_services()  # pylint: disable=protected-access
-        ):
-            services[f"{operator_name}-{service.name}"] = TritonService(
-                operate=operate,
-                service_config_id=service.service_config_id,
-            )
+def _record_balances(
+    service_balances: t.List[t.Tuple[TritonService, dict]],
+) -> None:
+    """Append checked balances to the balance history"""
+    now = int(time.time())
+    samples = []
+    for service, balances in service_balances:
+        samples.extend(get_balance_samples(service.balance_addresses(), balances, now))
+    balance_history.record(samples)
+
+
+class BalanceForecast(t.NamedTuple):
+    """Projection of a balance that runs low"""
+
+    service_name: str
+    label: str
+    address: str
+    threshold: float
+    burn_rate: BurnRate
+    days: t.Optional[float]
+
+
+def _forecast_balances(
+    service_balances: t.List[t.Tuple[str, TritonService, dict]],
+) -> t.List[BalanceForecast]:
+    """Update the burn rates and project when each balance reaches its threshold"""
+    now = time.time()
+    # (service name, label, address, balance, threshold)
+    balances_to_forecast = []
+    for service_name, service, balances in service_balances:
+        balances_to_forecast += [
+            (
+                service_name,
+                "Agent EOA",
+                service.agent_address,
+                balances["agent_eoa_native_balance"],
+                AGENT_BALANCE_THRESHOLD,
+            ),
+            (
+                service_name,
+                "Service Safe",
+                service.service_safe,
+                balances["service_safe_native_balance"],
+                SAFE_BALANCE_THRESHOLD,
+            ),
+        ]
 
-    # Commands
-    async def staking_status(
-        update: Update,
-        context: ContextTypes.DEFAULT_TYPE,  # pylint: disable=unused-argument
-    ) -> None:
-        messages = []
-        total_rewards = 0.0
-        for service_name, service in services.items():
-            status = service.get_staking_status()
-            total_rewards += float(status["accrued_rewards"].split(" ")[0])
-            messages.append(
-                f"[{service_name}] {status['accrued_rewards']} "
-                f"""[{status['mech_requests_this_epoch']}/{status['required_mech_requests']}]
-Staking program: {status['metadata']['name']}
-Next epoch: {status['epoch_end']}"""
-            )
+    # The burn rates of a check are persisted at once
+    all_burn_rates = burn_rates.update_all(
+        [(address, now, balance) for _, _, address, balance, _ in balances_to_forecast]
+    )
+    return [
+        BalanceForecast(
+            service_name=service_name,
+            label=label,
+            address=address,
+            threshold=threshold,
+            burn_rate=burn_rate,
+            days=burn_rate.days_to(threshold),
+        )
+        for (service_name, label, address, _, threshold), burn_rate in zip(
+            balances_to_forecast, all_burn_rates
+        )
+    ]
 
-        olas_price = get_olas_price()
-        rewards_value = total_rewards * olas_price if olas_price else None
-        message = f"Total rewards = {total_rewards:g} OLAS"
-        if rewards_value:
-            message += f" [${rewards_value:g}]"
-        messages.append(message)
 
-        if update.message is None:
-            logger.error("Cannot send message, update.message is None")
-            return
+def run_triton() -> None:  # pylint: disable=too-many-statements,too-many-locals
+    """Main"""
 
-        await update.message.reply_text(text=("\n\n").join(messages))
+    # Load configuration
+    config_watcher = ConfigWatcher("config.yaml")
+    operators = config_watcher.load()
+
+    # Instantiate the services, loading the operators concurrently
+    started_at = time.monotonic()
+    operator_services = discover_operators(operators)
+    # Operators whose services were loaded, and their paths
+    loaded_operators = {name: operators[name] for name in operator_services}
+    services: t.Dict[str, TritonService] = flatten_services(operator_services)
+    logger.info(
+        "Loaded %s services in %.1f seconds",
+        len(services),
+        time.monotonic() - started_at,
+    )
+    # Balance checks and mech request samples share the RPC budget
+    poll_budget = PollBudget()
+    # Next balance check of each service
+    poll_scheduler = PollScheduler(poll_budget)
+    # Next mech request sample of each service, and its projections
+    epoch_scheduler = PollScheduler(poll_budget, cost=SAMPLE_COST)
+    epoch_monitor = EpochMonitor()
+    # (service, epoch end) already warned about by the epoch risk monitor
+    epoch_warnings: t.Set[t.Tuple[str, int]] = set()
+    # Addresses already warned about by the low balance forecast
+    forecasted_addresses: t.Set[str] = set()
+    # Commands read the services of the latest configuration
+    commands = Commands(lambda: services, poll_scheduler)
 
-    async def balance(
-        update: Update, context: ContextTypes.DEFAULT_TYPE
+    # Tasks
+    async def refresh_olas_price(
+        context: ContextTypes.DEFAULT_TYPE,
     ):  # pylint: disable=unused-argument
-        messages = []
-        for service_name, service in services.items():
-            balances = service.check_balance()
-            agent_native_balance = balances["agent_eoa_native_balance"]
-            safe_native_balance = balances["service_safe_native_balance"]
-            safe_olas_balance = balances["service_safe_olas_balance"]
-            master_eoa_native_balance = balances["master_eoa_native_balance"]
-            master_safe_native_balance = balances["master_safe_native_balance"]
-
-            if service.master_wallet.safes is None:
-                raise ValueError("Master wallet safes not found")
-
-            message = (
-                r"\["
-                + escape_markdown_v2(service_name)
-                + r"]"
-                + f"\n[Agent EOA]({GNOSISSCAN_ADDRESS_URL.format(address=service.agent_address)}) = {agent_native_balance:g} xDAI"  # noqa: E501
-                + f"\n[Service Safe]({GNOSISSCAN_ADDRESS_URL.format(address=service.service_safe)}) = {safe_native_balance:g} xDAI  {safe_olas_balance:g} OLAS"  # noqa: E501
-                + f"\n[Master EOA]({GNOSISSCAN_ADDRESS_URL.format(address=service.master_wallet.crypto.address)}) = {master_eoa_native_balance:g} xDAI"  # noqa: E501
-                + f"\n[Master Safe]({GNOSISSCAN_ADDRESS_URL.format(address=service.master_wallet.safes[Chain.from_string(service.service.home_chain)])}) = {master_safe_native_balance:g} xDAI"  # type: ignore[attr-defined]  # noqa: E501
-            )
-
-            messages.append(message)
+        """Keep the cached OLAS price fresh"""
+        await run_blocking(olas_price.refresh)
 
-        if update.message is None:
-            logger.error("Cannot send message, update.message is None")
-            return
-
-        await update.message.reply_text(
-            text=("\n\n").join(messages),
-            parse_mode=ParseMode.MARKDOWN,
-            disable_web_page_preview=True,
-        )
-
-    async def claim(
-        update: Update, context: ContextTypes.DEFAULT_TYPE
+    async def index_events(
+        context: ContextTypes.DEFAULT_TYPE,
     ):  # pylint: disable=unused-argument
-        """Claim rewards"""
-
-        if not update.message:
-            logger.error("Cannot send message, update.message is None")
+        """Index the new staking contract events"""
+        events = await run_blocking(event_indexer.index, timeout=None)
+        logger.info("Indexed %s new staking events", len(events))
+
+    async def epoch_risk_check(context: ContextTypes.DEFAULT_TYPE):
+        """Warn about the services projected to miss their mech request target"""
+        now = time.time()
+        due = [name for name in epoch_scheduler.pop_due(now) if name in services]
+        if not due:
             return
 
-        if not MANUAL_CLAIM:
-            await update.message.reply_text(text="Manual claim is disabled")
-            return
+        for service_name in due:
+            epoch_scheduler.reschedule(service_name, get_sample_interval(None), now)
+        statuses = await gather_staking_statuses(
+            [services[service_name] for service_name in due]
+        )
 
-        messages = []
-        for service_name, service in services.items():
-            tx_hash = service.claim_rewards()
-            if not tx_hash:
+        epoch_warnings.difference_update(
+            [key for key in epoch_warnings if key[1] < now]
+        )
+        for service_name, status in zip(due, statuses):
+            if isinstance(status, BaseException):
+                logger.error(
+                    "[%s] Failed to get the staking status: %s", service_name, status
+                )
                 continue
 
-            messages.append(
-                f"[{service_name}] Sent the [claim transaction]({GNOSISSCAN_TX_URL.format(tx_hash=tx_hash)}). "
-                "Rewards will be sent to the Service Safe."
+            projection = epoch_monitor.update(service_name, status, now)
+            epoch_scheduler.reschedule(
+                service_name, get_sample_interval(projection), now
             )
-
-        await update.message.reply_text(
-            text=("\n").join(messages),
-        )
-
-    async def withdraw(
-        update: Update, context: ContextTypes.DEFAULT_TYPE
-    ):  # pylint: disable=unused-argument
-        """Withdraw rewards"""
-        if not update.message:
-            logger.error("Cannot send message, update.message is None")
-            return
-
-        messages = []
-        for service_name, service in services.items():
-            tx_hash, value = service.withdraw_rewards()
-            message = (
-                r"\["
-                + escape_markdown_v2(service_name)
-                + r"] "
-                + f"Sent the [withdrawal transaction]({GNOSISSCAN_TX_URL.format(tx_hash=tx_hash)}). "
-                + f"{value:g} OLAS sent from the Service Safe to [{service.withdrawal_address}]"
-                + f"({GNOSISSCAN_ADDRESS_URL.format(address=service.withdrawal_address)}) #withdraw"
-                if tx_hash
-                else r"\["
-                + escape_markdown_v2(service_name)
-                + r"] "
-                + "Cannot withdraw rewards"
+            poll_scheduler.set_epoch_deadline(
+                service_name, None if projection.reached else projection.epoch_end
             )
+            if (
+                not projection.at_risk
+                or projection.seconds_left > EPOCH_RISK_HORIZON * 3600
+                or (service_name, projection.epoch_end) in epoch_warnings
+            ):
+                continue
 
-            messages.append(message)
-
-        await update.message.reply_text(
-            text=("\n\n").join(messages),
-            parse_mode=ParseMode.MARKDOWN,
-            disable_web_page_preview=True,
-        )
-
-    async def slots(
-        update: Update, context: ContextTypes.DEFAULT_TYPE
-    ):  # pylint: disable=unused-argument
-        if not update.message:
-            logger.error("Cannot send message, update.message is None")
-            return
-
-        slots = get_slots()
-
-        messages = [
-            f"[{contract_name}] {n_slots} available slots"
-            for contract_name, n_slots in slots.items()
-        ]
-
-        await update.message.reply_text(
-            text=("\n").join(messages),
-        )
-
-    async def scheduled_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not update.message:
-            logger.error("Cannot send message, update.message is None")
-            return
-
-        jobs = context.job_queue.jobs() if context.job_queue else []
-
-        if not jobs:
-            await update.message.reply_text("No scheduled jobs")
-            return
-
-        message = ""
-        for job in jobs:
-            next_execution = (
-                job.next_t.astimezone(pytz.timezone(LOCAL_TIMEZONE)).strftime(
-                    "%Y-%m-%d %H:%M:%S %Z"
-                )
-                if job.next_t
-                else "N/A"
+            epoch_warnings.add((service_name, projection.epoch_end))
+            await context.bot.send_message(
+                chat_id=CHAT_ID,
+                text=(
+                    f"[{service_name}] {projection.requests}/{projection.required} "
+                    f"mech requests, projected to reach {projection.projected:.0f} "
+                    f"by the end of the epoch ({status['epoch_end']}). "
+                    f"It needs {projection.required_velocity * 3600:.1f} requests/h "
+                    f"and makes {projection.velocity * 3600:.1f} requests/h"
+                ),
             )
-            message += f"• {job.name}: {next_execution}\n"
-
-        await update.message.reply_text(message)
 
-    # Tasks
     async def start(context: ContextTypes.DEFAULT_TYPE):
         """Start"""
         await context.bot.send_message(
@@ -240,9 +231,38 @@ Next epoch: {status['epoch_end']}"""
         )
 
     async def balance_check(context: ContextTypes.DEFAULT_TYPE):
-        logger.info("Running balance check task")
-        for service_name, triton_service in services.items():
-            balances = triton_service.check_balance()
+        now = time.time()
+        due = [name for name in poll_scheduler.pop_due(now) if name in services]
+        if not due:
+            return
+
+        logger.info("Running balance check task for %s services", len(due))
+        for service_name in due:
+            # Checked again at the default interval, unless the results tell otherwise
+            poll_scheduler.reschedule(service_name, POLL_INTERVAL, now)
+        service_items = [(service_name, services[service_name]) for service_name in due]
+        all_balances = await gather_balances([service for _, service in service_items])
+        if BALANCE_HISTORY:
+            try:
+                await run_blocking(
+                    _record_balances,
+                    [
+                        (service, balances)
+                        for (_, service), balances in zip(service_items, all_balances)
+                        if not isinstance(balances, BaseException)
+                    ],
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Failed to record the balance history: %s", e)
+        for (service_name, triton_service), balances in zip(
+            service_items, all_balances
+        ):
+            if isinstance(balances, BaseException):
+                logger.error(
+                    "[%s] Failed to check the balances: %s", service_name, balances
+                )
+                continue
+
             agent_native_balance = balances["agent_eoa_native_balance"]
             safe_native_balance = balances["service_safe_native_balance"]
 
@@ -264,7 +284,80 @@ Next epoch: {status['epoch_end']}"""
                     disable_web_page_preview=True,
                 )
 
+        try:
+            forecasts = await run_blocking(
+                _forecast_balances,
+                [
+                    (service_name, service, balances)
+                    for (service_name, service), balances in zip(
+                        service_items, all_balances
+                    )
+                    if not isinstance(balances, BaseException)
+                ],
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to forecast the balances: %s", e)
+            return
+
+        if BALANCE_ALERT_HORIZON > 0:
+            await warn_low_balances(context, forecasts)
+        schedule_next_checks(forecasts, now)
+
+    def schedule_next_checks(forecasts: t.List[BalanceForecast], now: float) -> None:
+        """Poll services sooner as they run low or fall behind near the epoch end"""
+        forecasts_by_service: t.Dict[str, t.List[BalanceForecast]] = {}
+        for forecast in forecasts:
+            forecasts_by_service.setdefault(forecast.service_name, []).append(forecast)
+
+        for service_name, service_forecasts in forecasts_by_service.items():
+            days = [
+                forecast.days
+                for forecast in service_forecasts
+                if forecast.days is not None
+            ]
+            epoch_end = poll_scheduler.get_epoch_deadline(service_name)
+            poll_scheduler.reschedule(
+                service_name,
+                get_poll_interval(
+                    below_threshold=any(
+                        forecast.burn_rate.balance < forecast.threshold
+                        for forecast in service_forecasts
+                    ),
+                    days_to_threshold=min(days, default=None),
+                    seconds_to_epoch_end=epoch_end - now if epoch_end else None,
+                ),
+                now,
+            )
+
+    async def warn_low_balances(
+        context: ContextTypes.DEFAULT_TYPE, forecasts: t.List[BalanceForecast]
+    ) -> None:
+        """Warn about the balances that will drop below their threshold within the horizon"""
+        for forecast in forecasts:
+            # Balances already under the threshold get the regular alert
+            if (
+                forecast.days is None
+                or forecast.burn_rate.balance < forecast.threshold
+                or forecast.days * 24 > BALANCE_ALERT_HORIZON
+            ):
+                forecasted_addresses.discard(forecast.address)
+                continue
+
+            # Warn once, until a top-up or a lower burn rate clears the forecast
+            if forecast.address in forecasted_addresses:
+                continue
+            forecasted_addresses.add(forecast.address)
+
+            message = f"[{forecast.service_name}] [{forecast.label}]({GNOSISSCAN_ADDRESS_URL.format(address=forecast.address)}) balance of {forecast.burn_rate.balance:g} xDAI will drop below {forecast.threshold:g} xDAI in about {forecast.days * 24:.0f} h, at {forecast.burn_rate.burn_per_day:.4g} xDAI/day"  # noqa: E501
+            await context.bot.send_message(
+                chat_id=CHAT_ID,
+                text=message,
+                parse_mode=ParseMode.MARKDOWN,
+                disable_web_page_preview=True,
+            )
+
     async def post_init(app):
+        preload_contracts()
         # await app.bot.set_my_name("Triton")
         await app.bot.set_my_description("A bot to manage Olas staked services")
         await app.bot.set_my_short_description("A bot to manage Olas staked services")
@@ -275,10 +368,15 @@ Next epoch: {status['epoch_end']}"""
                 ("claim", "Claim rewards"),
                 ("withdraw", "Withdraw rewards"),
                 ("slots", "Check available staking slots"),
+                ("history", "Balance trends"),
                 ("jobs", "Check the scheduled jobs"),
+                ("rpc", "Check the RPC endpoints and their usage"),
             ]
         )
 
+    async def post_shutdown(app):  # pylint: disable=unused-argument
+        await async_chain.close_session()
+
     async def autoclaim(context: ContextTypes.DEFAULT_TYPE):
         logger.info("Running autoclaim task")
 
@@ -286,64 +384,150 @@ Next epoch: {status['epoch_end']}"""
             logger.info("Autoclaim task is disabled")
             return
 
-        messages = []
+        report = TransactionReport()
+        prefix = markdown_prefix("(Autoclaim) ")
+
+        service_items = list(services.items())
 
         # Claim
-        for service in services.values():
-            service.claim_rewards()
+        outcomes = await claim_rewards(
+            [service for _, service in service_items], min_reward=CLAIM_MIN_REWARD
+        )
+        report.add_claims(service_items, outcomes, prefix, min_reward=CLAIM_MIN_REWARD)
 
         # Withdraw
-        for service_name, service in services.items():
-            tx_hash, value = service.withdraw_rewards()
-            message = (
-                r"\["
-                + escape_markdown_v2(service_name)
-                + r"] "
-                + f"(Autoclaim) Sent the [withdrawal transaction]({GNOSISSCAN_TX_URL.format(tx_hash=tx_hash)}). "
-                + f"{value:g} OLAS sent from the Safe to [{service.withdrawal_address}]"
-                + f"({GNOSISSCAN_ADDRESS_URL.format(address=service.withdrawal_address)}) #withdraw"
-                if tx_hash
-                else r"\["
-                + escape_markdown_v2(service_name)
-                + r"] "
-                + "(Autoclaim) Cannot withdraw rewards"
-            )
+        withdrawals = await withdraw_rewards([service for _, service in service_items])
+        report.add_withdrawals(service_items, withdrawals, prefix, safe_label="Safe")
 
-            messages.append(message)
-
-        if not messages:
+        if not report.lines:
             logger.info("No rewards to withdraw")
             return
 
-        await context.bot.send_message(
+        sent = await context.bot.send_message(
             chat_id=CHAT_ID,
-            text=("\n\n").join(messages),
+            text=("\n\n").join(report.lines),
             parse_mode=ParseMode.MARKDOWN,
             disable_web_page_preview=True,
         )
+        report.track(sent, "\n\n", ParseMode.MARKDOWN)
+
+    async def track_receipts(context: ContextTypes.DEFAULT_TYPE):
+        """Edit the messages of the transactions that were mined or dropped"""
+        await receipt_tracker.poll(context.bot)
+
+    async def reload_config(
+        context: ContextTypes.DEFAULT_TYPE,
+    ):  # pylint: disable=unused-argument
+        """Load the operators added to the configuration, and drop the removed ones"""
+        nonlocal services, operator_services, loaded_operators
+        operators = config_watcher.poll()
+        if operators is None:
+            return
+
+        diff = diff_operators(loaded_operators, operators)
+        if not diff.added and not diff.removed:
+            return
+
+        logger.info(
+            "Reloading configuration: adding %s, removing %s",
+            list(diff.added),
+            diff.removed,
+        )
+        # On its own thread: discover_operators waits on the worker pool itself
+        added = await asyncio.to_thread(discover_operators, diff.added)
+
+        # The new view is built aside and swapped in at once, so commands see either
+        # the previous services or the new ones. Commands already running keep theirs.
+        updated = {
+            **{
+                name: group
+                for name, group in operator_services.items()
+                if name not in diff.removed
+            },
+            **added,
+        }
+        previous = services
+        operator_services = {
+            name: updated[name] for name in operators if name in updated
+        }
+        loaded_operators = {name: operators[name] for name in operator_services}
+        services = flatten_services(operator_services)
+
+        for service_name in previous.keys() - services.keys():
+            poll_scheduler.remove(service_name)
+            epoch_scheduler.remove(service_name)
+            epoch_monitor.forget(service_name)
+            epoch_warnings.difference_update(
+                [key for key in epoch_warnings if key[0] == service_name]
+            )
+        for service_name in services.keys() - previous.keys():
+            poll_scheduler.add(service_name)
+            epoch_scheduler.add(service_name)
+        logger.info("Monitoring %s services", len(services))
 
     # Create bot
-    app = Application.builder().token(TELEGRAM_TOKEN).post_init(post_init).build()
+    app = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     if app.job_queue is None:
         raise RuntimeError("Job queue is not available")
 
     job_queue = app.job_queue
 
     # Add commands
-    app.add_handler(CommandHandler("staking_status", staking_status))
-    app.add_handler(CommandHandler("balance", balance))
-    app.add_handler(CommandHandler("claim", claim))
-    app.add_handler(CommandHandler("withdraw", withdraw))
-    app.add_handler(CommandHandler("slots", slots))
-    app.add_handler(CommandHandler("jobs", scheduled_jobs))
+    app.add_handler(CommandHandler("staking_status", commands.staking_status))
+    app.add_handler(CommandHandler("balance", commands.balance))
+    # Claims wait for their receipts, so other updates are handled meanwhile
+    app.add_handler(CommandHandler("claim", commands.claim, block=False))
+    app.add_handler(CommandHandler("withdraw", commands.withdraw))
+    app.add_handler(CommandHandler("slots", commands.slots))
+    app.add_handler(CommandHandler("history", commands.history))
+    app.add_handler(CommandHandler("jobs", commands.scheduled_jobs))
+    app.add_handler(CommandHandler("rpc", commands.rpc_stats))
 
     # Add tasks
     job_queue.run_once(start, when=3)  # in 3 seconds
+    job_queue.run_repeating(
+        refresh_olas_price,
+        interval=datetime.timedelta(seconds=OLAS_PRICE_TTL),
+        first=1,  # in 1 second
+    )
+    if EVENT_INDEXER:
+        job_queue.run_repeating(
+            index_events,
+            interval=datetime.timedelta(seconds=EVENT_INDEXER_INTERVAL),
+            first=10,  # in 10 seconds
+        )
+    for service_name in services:
+        poll_scheduler.add(service_name)
+        epoch_scheduler.add(service_name)
     job_queue.run_repeating(
         balance_check,
-        interval=datetime.timedelta(hours=1),
+        interval=datetime.timedelta(seconds=POLL_TICK),
         first=5,  # in 5 seconds
     )
+    if EPOCH_MONITOR:
+        job_queue.run_repeating(
+            epoch_risk_check,
+            interval=datetime.timedelta(seconds=POLL_TICK),
+            first=15,  # in 15 seconds
+        )
+    if CONFIG_RELOAD_INTERVAL > 0:
+        job_queue.run_repeating(
+            reload_config,
+            interval=datetime.timedelta(seconds=CONFIG_RELOAD_INTERVAL),
+            first=CONFIG_RELOAD_INTERVAL,
+        )
+    # Pending transactions persisted before a restart are followed up as well
+    job_queue.run_repeating(
+        track_receipts,
+        interval=datetime.timedelta(seconds=RECEIPT_POLL_INTERVAL),
+        first=RECEIPT_POLL_INTERVAL,
+    )
     job_queue.run_monthly(
         autoclaim,
         day=AUTOCLAIM_DAY,